@@ -1,7 +1,6 @@
-from typing import Dict, Tuple, Callable
+from typing import BinaryIO, Dict, List, Optional, Tuple, Callable
 
 import os
-import uuid
 import json
 import time
 import tempfile
@@ -24,6 +23,7 @@ from UM.Logger import Logger
 from UM.Message import Message
 from UM.PluginRegistry import PluginRegistry
 from UM.Qt.Duration import Duration, DurationFormat
+from UM.Scene.SceneNode import SceneNode
 
 from UM.Signal import Signal
 
@@ -39,6 +39,12 @@ from .select_tool.SmartSliceSelectTool import SmartSliceSelectTool
 from .utils import getPrintableNodes
 from .utils import getModifierMeshes
 from .utils import getNodeActiveExtruder
+from .utils import getJobFingerprint
+from .utils.StreamingPackage import StreamingPackage
+from .utils import CompactEncoding
+from .utils.MeshBlobs import MeshBlobStore
+from .utils.RetryPolicy import RetryPolicy
+from .utils.ConnectivityState import ConnectivityState
 
 i18n_catalog = i18nCatalog("smartslice")
 
@@ -47,6 +53,9 @@ class SmartSliceCloudJob(Job):
     # This job is responsible for uploading the backup file to cloud storage.
     # As it can take longer than some other tasks, we schedule this using a Cura Job.
 
+    # 3MF packages up to this size (in bytes) are built in memory, larger ones in a temporary file
+    PACKAGE_MEMORY_LIMIT = 64 * 1024 * 1024
+
     class JobException(Exception):
         def __init__(self, problem: str):
             super().__init__(problem)
@@ -60,6 +69,9 @@ class SmartSliceCloudJob(Job):
         self._saved = False
         self.api_job_id = None
 
+        # Content hash of the meshes and the job, see JobFingerprint
+        self.fingerprint = None
+
         self.canceled = False
 
         self._job_status = None
@@ -91,41 +103,12 @@ class SmartSliceCloudJob(Job):
         if self._saved != value:
             self._saved = value
 
-    def determineTempDirectory(self):
-        temporary_directory = tempfile.gettempdir()
-        base_subdirectory_name = "smartslice"
-        private_subdirectory_name = base_subdirectory_name
-        abs_private_subdirectory_name = os.path.join(temporary_directory,
-                                                     private_subdirectory_name)
-        private_subdirectory_suffix_num = 1
-        while os.path.exists(abs_private_subdirectory_name) and not os.path.isdir(abs_private_subdirectory_name):
-            private_subdirectory_name = "{}_{}".format(base_subdirectory_name,
-                                                       private_subdirectory_suffix_num)
-            abs_private_subdirectory_name = os.path.join(temporary_directory,
-                                                         private_subdirectory_name)
-            private_subdirectory_suffix_num += 1
-
-        if not os.path.exists(abs_private_subdirectory_name):
-            os.makedirs(abs_private_subdirectory_name)
-
-        return abs_private_subdirectory_name
-
     # Sending jobs to AWS
     # - job_type: Job type to be sent. Can be either:
     #             > pywim.smartslice.job.JobType.validation
     #             > pywim.smartslice.job.JobType.optimization
-    def prepareJob(self, filename=None, filedir=None):
-        # Using tempfile module to probe for a temporary file path
-        # TODO: We can do this more elegant of course, too.
-
-        # Setting up file output
-        if not filename:
-            filename = "{}.3mf".format(uuid.uuid1())
-        if not filedir:
-            filedir = self.determineTempDirectory()
-        filepath = os.path.join(filedir, filename)
-
-        Logger.log("d", "Saving temporary (and custom!) 3MF file at: {}".format(filepath))
+    def prepareJob(self) -> Optional[Tuple[List[SceneNode], pywim.smartslice.job.Job]]:
+        # Returns the nodes and the Smart Slice job to write to the 3MF package
 
         # Checking whether count of models == 1
         mesh_nodes = getPrintableNodes()
@@ -139,7 +122,6 @@ class SmartSliceCloudJob(Job):
             Logger.log("d", "Adding modifier mesh {} to validation".format(node.getName()))
             mesh_nodes.append(node)
 
-        Logger.log("d", "Writing 3MF file")
         job = self.connector.smartSliceJobHandle.buildJobFor3mf()
         if not job:
             Logger.log("d", "Error building the Smart Slice job for 3MF")
@@ -147,21 +129,53 @@ class SmartSliceCloudJob(Job):
 
         job.type = self.job_type
 
-        if not SmartSliceJobHandler.write3mf(filepath, mesh_nodes, job):
-            raise SmartSliceCloudJob.JobException(
-                "The Smart Slice job cannot be submitted because\nthe 3MFWriter Plugin is disabled."
-            )
+        self.fingerprint = getJobFingerprint().fingerprint(
+            job.to_dict(), mesh_nodes, self.connector.smartSliceJobHandle.stable_gcode
+        )
+        Logger.log("i", "Smart Slice job fingerprint: {}".format(self.fingerprint))
+
+        identical_jobs = self.connector.jobsWithFingerprint(self.fingerprint)
+        if identical_jobs:
+            Logger.log("i", "Smart Slice job is identical to job(s) {}".format(", ".join(str(j._id) for j in identical_jobs)))
+
+        return mesh_nodes, job
+
+    # Writes the 3MF package, including the Smart Slice job.json, to the binary stream
+    def writePackage(self, package: BinaryIO, mesh_nodes: List[SceneNode], job: pywim.smartslice.job.Job, blob_store=None):
+        Logger.log("d", "Writing 3MF file")
+
+        binary = self.connector.app_preferences.getValue(self.connector.binary_job_encoding_preference)
+        if binary and not self.connector.api_connection.acceptsBinaryJobs():
+            Logger.log("d", "The server doesn't accept the binary job encoding, writing job.json instead")
+            binary = False
+
+        SmartSliceJobHandler.write3mf(package, mesh_nodes, job, blob_store, binary)
 
-        if not os.path.exists(filepath):
+    # Uploads the meshes the server doesn't have yet as blobs, so the job only has to refer to them.
+    # Returns the blob store, or None if the meshes have to be sent with the job.
+    def uploadMeshBlobs(self, mesh_nodes: List[SceneNode]) -> Optional[MeshBlobStore]:
+        blob_store = self._client.meshBlobStore()
+
+        try:
+            uploaded = blob_store.ensure(SmartSliceJobHandler.threeMFObjects(mesh_nodes))
+        except Exception as exc:
+            Logger.log("w", "Unable to upload the mesh blobs, sending the meshes with the job: {}".format(exc))
             return None
 
-        return filepath
+        Logger.log("d", "Uploaded {} of {} mesh blobs ({} bytes uploaded in total)".format(
+            len(uploaded), len(mesh_nodes), blob_store.uploaded_bytes
+        ))
 
-    def processCloudJob(self, filepath):
-        # Read the 3MF file into bytes
-        threemf_fd = open(filepath, 'rb')
-        threemf_data = threemf_fd.read()
-        threemf_fd.close()
+        return blob_store
+
+    def processCloudJob(self, package):
+        if isinstance(package, StreamingPackage):
+            # The package is written while it is uploaded
+            threemf_data = package
+        else:
+            # Read the 3MF package into bytes
+            package.seek(0)
+            threemf_data = package.read()
 
         # Submit the 3MF data for a new task
         job = self._client.submitSmartSliceJob(self, threemf_data)
@@ -178,7 +192,9 @@ class SmartSliceCloudJob(Job):
         Job.yieldThread()  # Should allow the UI to update earlier
 
         try:
-            job = self.prepareJob()
+            prepared = self.prepareJob()
+            if not prepared:
+                raise SmartSliceCloudJob.JobException("The Smart Slice job could not be prepared.")
             Logger.log("i", "Smart Slice job prepared")
         except SmartSliceCloudJob.JobException as exc:
             Logger.log("w", "Smart Slice job cannot be prepared: {}".format(exc.problem))
@@ -186,12 +202,24 @@ class SmartSliceCloudJob(Job):
             self.setError(exc)
             return
 
-        task = self.processCloudJob(job)
+        blob_store = None
+        if self.connector.app_preferences.getValue(self.connector.mesh_blobs_preference):
+            blob_store = self.uploadMeshBlobs(prepared[0])
 
-        try:
-            os.remove(job)
-        except:
-            Logger.log("w", "Unable to remove temporary 3MF {}".format(job))
+        if self.connector.app_preferences.getValue(self.connector.stream_upload_preference):
+            package = StreamingPackage(lambda stream: self.writePackage(stream, *prepared, blob_store))
+
+            task = self.processCloudJob(package)
+
+            Logger.log("d", "Smart Slice 3MF package size: {} bytes (streamed)".format(package.size))
+        else:
+            # The package is kept in memory, unless it grows too large
+            with tempfile.SpooledTemporaryFile(max_size=self.PACKAGE_MEMORY_LIMIT) as package:
+                self.writePackage(package, *prepared, blob_store)
+
+                Logger.log("d", "Smart Slice 3MF package size: {} bytes".format(package.tell()))
+
+                task = self.processCloudJob(package)
 
         if task and task.result:
             self._result = task.result
@@ -247,9 +275,25 @@ class SmartSliceAPIClient(QObject):
         self.extension = connector.extension
         self._token = None
         self._error_message = None
+        self._mesh_blob_store = None
+        self._accepts_binary_jobs = None
+
+        # How API calls are retried when they fail to connect, by the name of the endpoint.
+        #  Waiting on a job is cheap to retry, submitting a job is not. The deadlines count from the first failure,
+        #  so the minutes a job wait polls for (or a submission uploads for) don't use them up.
+        self.retry_policies = {
+            "default": RetryPolicy("default", max_attempts=10, initial_delay=0.5, max_delay=8., deadline=60.),
+            "smartslice_job_wait": RetryPolicy(
+                "smartslice_job_wait", max_attempts=20, initial_delay=0.1, max_delay=3., deadline=60.
+            ),
+            "new_smartslice_job": RetryPolicy(
+                "new_smartslice_job", max_attempts=4, initial_delay=2., max_delay=30., deadline=120.
+            )
+        }
 
-        self._number_of_timeouts = 20
-        self._timeout_sleep = 3
+        # Whether the API can be reached. The outcomes of API calls keep it up to date,
+        #  so the API is only asked for its info when nothing went through for a while.
+        self.connectivity = ConnectivityState(self._probeConnection, ttl=5., failure_ttl=1.)
 
         self._username_preference = "smartslice/username"
         self._app_preferences = Application.getInstance().getPreferences()
@@ -305,6 +349,8 @@ class SmartSliceAPIClient(QObject):
             port=port,
             cluster=self._plugin_metadata.cluster
         )
+        self.connectivity.invalidate()
+        self._accepts_binary_jobs = None
 
         # To ensure that the user is tracked and has a proper subscription, we let them login and then use the token we recieve
         # to track them and their login status.
@@ -325,41 +371,86 @@ class SmartSliceAPIClient(QObject):
         Logger.log("d", "SmartSlice HTTP Client: {}".format(self._client.address))
 
     def _connectionCheck(self):
+        if not self.connectivity.check():
+            return (self.ConnectionErrorCodes.genericInternetConnectionError)
+
+        return None
+
+    def _probeConnection(self) -> bool:
         try:
             self._client.info()
         except Exception as error:
             Logger.log("e", "An error has occured checking the internet connection: {}".format(error))
-            return (self.ConnectionErrorCodes.genericInternetConnectionError)
+            return False
 
-        return None
+        return True
 
     # API calls need to be executed through this function using a lambda passed in, as well as a failure code.
     #  This prevents a fatal crash of Cura in some circumstances, as well as allows for a timeout/retry system.
     #  The failure codes give us better control over the messages that come from an internet disconnect issue.
-    def executeApiCall(self, endpoint: Callable[[], Tuple[int, object]], failure_code):
+    #  The call is retried with the backoff of the retry policy of the endpoint, given by its name.
+    def executeApiCall(self, endpoint: Callable[[], Tuple[int, object]], failure_code, endpoint_name: str = "default"):
         api_code = self._connectionCheck()
-        timeout_counter = 0
         self.clearErrorMessage()
 
         if api_code is not None:
             return api_code, None
 
-        while api_code is None and timeout_counter < self._number_of_timeouts:
+        policy = self.retry_policies.get(endpoint_name, self.retry_policies["default"])
+        backoff = policy.backoff()
+
+        while api_code is None:
             try:
                 api_code, api_result = endpoint()
             except Exception as error:
                 # If this error occurs, there was a connection issue
                 Logger.log("e", "An error has occured with an API call: {}".format(error))
-                timeout_counter += 1
-                time.sleep(self._timeout_sleep)
+                self.connectivity.reportFailure()
+
+                delay = backoff.nextDelay()
+                if delay is None:
+                    self._logRetries(endpoint_name, backoff, True)
+                    return failure_code, None
 
-            if timeout_counter == self._number_of_timeouts:
-                return failure_code, None
+                time.sleep(delay)
+
+        self.connectivity.reportSuccess()
+
+        backoff.succeeded()
+        if backoff.retries > 0:
+            self._logRetries(endpoint_name, backoff, False)
 
         self.clearErrorMessage()
 
         return api_code, api_result
 
+    def _logRetries(self, endpoint_name: str, backoff, failed: bool):
+        Logger.log("w" if failed else "d", "API call {} {} after {} retries and {:.1f}s of backoff, in total: {}".format(
+            endpoint_name, "failed" if failed else "succeeded", backoff.retries, backoff.waited, backoff.policy.stats()
+        ))
+
+    # Whether the server accepts jobs with the compact binary encoding (job.bin), as listed in its info.
+    #  The server is asked once per connection; if it can't be asked, the job is sent as JSON.
+    def acceptsBinaryJobs(self) -> bool:
+        if self._accepts_binary_jobs is None:
+            try:
+                info = self._client.info()
+            except Exception as error:
+                Logger.log("w", "Unable to ask the server for the job encodings it accepts: {}".format(error))
+                return False
+
+            self._accepts_binary_jobs = CompactEncoding.acceptedBy(info)
+
+        return self._accepts_binary_jobs
+
+    # The store for mesh blobs on the server we are connected to, with the current token.
+    #  The store is kept as long as they don't change, so it remembers which blobs the server has.
+    def meshBlobStore(self) -> MeshBlobStore:
+        if self._mesh_blob_store is None or self._mesh_blob_store[0] != (self._client.address, self._token):
+            self._mesh_blob_store = ((self._client.address, self._token), MeshBlobStore(self._client.address, self._token))
+
+        return self._mesh_blob_store[1]
+
     def clearErrorMessage(self):
         if self._error_message is not None:
             self._error_message.hide()
@@ -377,7 +468,8 @@ class SmartSliceAPIClient(QObject):
         if password != "":
             api_code, user_auth = self.executeApiCall(
                 lambda: self._client.basic_auth_login(username, password),
-                self.ConnectionErrorCodes.loginCredentialsError
+                self.ConnectionErrorCodes.loginCredentialsError,
+                "basic_auth_login"
             )
 
             if api_code != 200:
@@ -430,7 +522,8 @@ class SmartSliceAPIClient(QObject):
         self._client.set_token(self._token)
         api_code, api_result = self.executeApiCall(
             lambda: self._client.whoami(),
-            self.ConnectionErrorCodes.loginCredentialsError
+            self.ConnectionErrorCodes.loginCredentialsError,
+            "whoami"
         )
 
         if api_code != 200:
@@ -445,7 +538,8 @@ class SmartSliceAPIClient(QObject):
     def getSubscription(self):
         api_code, api_result = self.executeApiCall(
             lambda: self._client.smartslice_subscription(),
-            self.ConnectionErrorCodes.genericInternetConnectionError
+            self.ConnectionErrorCodes.genericInternetConnectionError,
+            "smartslice_subscription"
         )
 
         if api_code != 200:
@@ -457,7 +551,8 @@ class SmartSliceAPIClient(QObject):
     def cancelJob(self, job_id):
         api_code, api_result = self.executeApiCall(
             lambda: self._client.smartslice_job_abort(job_id),
-            self.ConnectionErrorCodes.genericInternetConnectionError
+            self.ConnectionErrorCodes.genericInternetConnectionError,
+            "smartslice_job_abort"
         )
 
         if api_code != 200:
@@ -468,7 +563,8 @@ class SmartSliceAPIClient(QObject):
     def submitSmartSliceJob(self, cloud_job, threemf_data):
         thor_status_code, task = self.executeApiCall(
             lambda: self._client.new_smartslice_job(threemf_data),
-            self.ConnectionErrorCodes.genericInternetConnectionError
+            self.ConnectionErrorCodes.genericInternetConnectionError,
+            "new_smartslice_job"
         )
 
         job_status_tracker = JobStatusTracker(self.connector, self.connector.status)
@@ -497,13 +593,15 @@ class SmartSliceAPIClient(QObject):
 
             thor_status_code, task = self.executeApiCall(
                 lambda: self._client.smartslice_job_wait(task.id, callback=job_status_tracker),
-                self.ConnectionErrorCodes.genericInternetConnectionError
+                self.ConnectionErrorCodes.genericInternetConnectionError,
+                "smartslice_job_wait"
             )
 
             if thor_status_code == 200:
                 thor_status_code, task = self.executeApiCall(
                     lambda: self._client.smartslice_job_wait(task.id, callback=job_status_tracker),
-                    self.ConnectionErrorCodes.genericInternetConnectionError
+                    self.ConnectionErrorCodes.genericInternetConnectionError,
+                    "smartslice_job_wait"
                 )
 
             if thor_status_code not in (200, None):
@@ -638,6 +736,16 @@ class SmartSliceCloudConnector(QObject):
     debug_save_smartslice_package_preference = "smartslice/debug_save_smartslice_package"
     debug_save_smartslice_package_location = "smartslice/debug_save_smartslice_package_location"
 
+    # Upload the 3MF package with chunked transfer encoding while it is written
+    stream_upload_preference = "smartslice/stream_upload"
+
+    # Upload meshes as content addressed blobs, and submit jobs which only refer to them
+    mesh_blobs_preference = "smartslice/mesh_blobs"
+
+    # Submit the job with the compact binary encoding (job.bin) instead of as JSON, if the server accepts it,
+    #  and store the job and results in workspaces with it (which earlier versions can't load)
+    binary_job_encoding_preference = "smartslice/binary_job_encoding"
+
     class SubscriptionTypes(Enum):
         subscriptionExpired = 0
         trialExpired = 1
@@ -666,6 +774,10 @@ class SmartSliceCloudConnector(QObject):
         self.app_preferences.addPreference(self.debug_save_smartslice_package_location, default_save_smartslice_package_location)
         self.debug_save_smartslice_package_message = None
 
+        self.app_preferences.addPreference(self.stream_upload_preference, False)
+        self.app_preferences.addPreference(self.mesh_blobs_preference, False)
+        self.app_preferences.addPreference(self.binary_job_encoding_preference, False)
+
         # Executing a set of function when some activitiy has changed
         Application.getInstance().activityChanged.connect(self._onApplicationActivityChanged)
 
@@ -705,6 +817,12 @@ class SmartSliceCloudConnector(QObject):
         self._jobs[self._current_job]._id = self._current_job
         self._jobs[self._current_job].finished.connect(self._onJobFinished)
 
+    def jobsWithFingerprint(self, fingerprint: str) -> List[SmartSliceCloudJob]:
+        return [
+            job for job in self._jobs.values()
+            if job and job.fingerprint == fingerprint and job is not self.cloudJob
+        ]
+
     def cancelCurrentJob(self):
         if self._jobs[self._current_job] and not self._jobs[self._current_job].canceled:
 
@@ -745,7 +863,16 @@ class SmartSliceCloudConnector(QObject):
         jobname = Application.getInstance().getPrintInformation().jobName
         debug_filename = "{}_smartslice.3mf".format(jobname)
         debug_filedir = self.app_preferences.getValue(self.debug_save_smartslice_package_location)
-        dummy_job = dummy_job.prepareJob(filename=debug_filename, filedir=debug_filedir)
+        debug_filepath = os.path.join(debug_filedir, debug_filename)
+
+        Logger.log("d", "Saving Smart Slice debug package at: {}".format(debug_filepath))
+
+        prepared = dummy_job.prepareJob()
+        if not prepared:
+            return
+
+        with open(debug_filepath, "wb") as debug_package:
+            dummy_job.writePackage(debug_package, *prepared)
 
     def getProxy(self, engine=None, script_engine=None):
         return self._proxy
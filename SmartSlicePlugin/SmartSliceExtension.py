@@ -21,6 +21,7 @@ from .SmartSliceCloudConnector import SmartSliceCloudConnector
 from .SmartSliceCloudProxy import SmartSliceCloudProxy
 from .SmartSliceCloudStatus import SmartSliceCloudStatus
 from .utils import getPrintableNodes, getModifierMeshes, intersectingNodes
+from .utils import CompactEncoding
 
 import pywim
 
@@ -202,14 +203,25 @@ class SmartSliceExtension(Extension):
             else:
                 status = self.cloud.getProxy().optimizationStatus()
 
+        # The job and results are stored with the compact encoding only if it is enabled, as the
+        # meshes in them take up a lot of space as JSON, but earlier versions can only read JSON
+        if self.cloud.app_preferences.getValue(self.cloud.binary_job_encoding_preference):
+            encode = CompactEncoding.encodeForStorage
+        else:
+            encode = lambda data: data
+
         # Place the job in the metadata under our plugin ID
-        self._storage.setEntryToStore(plugin_id=self.metadata.id, key='job', data=job.to_dict())
+        self._storage.setEntryToStore(plugin_id=self.metadata.id, key='job', data=encode(job.to_dict()))
         self._storage.setEntryToStore(plugin_id=self.metadata.id, key='version', data=self.metadata.version)
         self._storage.setEntryToStore(plugin_id=self.metadata.id, key='status', data=status.value)
 
         # Need to do some checks to see if we've stored the results for the active job
         if cloudJob and cloudJob.getResult():
-            self._storage.setEntryToStore(plugin_id=self.metadata.id, key='results', data=cloudJob.getResult().to_dict())
+            self._storage.setEntryToStore(
+                plugin_id=self.metadata.id,
+                key='results',
+                data=encode(cloudJob.getResult().to_dict())
+            )
             self._storage.setEntryToStore(
                 plugin_id=self.metadata.id,
                 key='selectedResult',
@@ -234,9 +246,9 @@ class SmartSliceExtension(Extension):
         if controller.getActiveStage() and controller.getActiveStage().getPluginId() == self.metadata.id:
             controller.setActiveStage("PrepareStage")
 
-        job_dict = all_data['job']
+        job_dict = CompactEncoding.decodeFromStorage(all_data['job'])
         status = all_data['status']
-        results_dict = all_data.get('results', None)
+        results_dict = CompactEncoding.decodeFromStorage(all_data.get('results', None))
         row = all_data.get('selectedResult', None) # The row is stored as the order of the results
 
         job = pywim.smartslice.job.Job.from_dict(job_dict) if job_dict else None
@@ -4,9 +4,11 @@ import time
 import json
 import zipfile
 import re
+import threading
 from string import Formatter
-from typing import Dict, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 
+import numpy
 import pywim
 import threemf
 
@@ -18,6 +20,7 @@ from UM.PluginRegistry import PluginRegistry
 from UM.Application import Application
 from UM.Logger import Logger
 from UM.Message import Message
+from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Settings.SettingFunction import SettingFunction
 from UM.Signal import Signal
 
@@ -32,7 +35,12 @@ from .utils import getPrintableNodes
 from .utils import getModifierMeshes
 from .utils import getNodeActiveExtruder
 from .utils import findChildSceneNode
-from .stage.SmartSliceScene import Root
+from .utils import getMaterialDatabase
+from .utils import CompactEncoding
+from .utils import MeshBlobs
+from .utils import ThreeMFWriter
+from .utils.DefinitionDefaults import DefinitionDefaults
+from .stage.SmartSliceScene import Root, HighlightFace, LoadFace
 
 i18n_catalog = i18nCatalog("smartslice")
 
@@ -55,12 +63,34 @@ class SmartSliceJobHandler:
 
     INFILL_DIRECTION = 45
 
+    # Path of the smartslice job in the 3MF archive, as JSON or with the compact binary encoding
+    JOB_PATH = "SmartSlice/job.json"
+    JOB_BINARY_PATH = "SmartSlice/job.bin"
+
+    # Only send the settings which differ from the machine and extruder definitions
+    compact_settings_preference = "smartslice/compact_settings"
+
+    # Settings which are always sent, as the job handler changes or adds them
+    ALWAYS_SENT_SETTINGS = (
+        "machine_start_gcode", "machine_end_gcode",
+        "machine_extruder_start_code", "machine_extruder_end_code",
+        "infill_angles", "material_guid",
+        "material_bed_temp_prepend", "material_print_temp_prepend"
+    )
+
+    # G-code tokens whose values change on every build
+    VOLATILE_TOKENS = ("time", "date", "day")
+
     materialWarning = Signal()
 
     def __init__(self, handler: SmartSlicePropertyHandler):
         self._all_extruders_settings = None
         self._propertyHandler = handler
 
+        # The g-code expanded for the last built job, mapped to the same g-code with the volatile tokens
+        #  left in, so the fingerprint of the job doesn't change with the time of the build
+        self.stable_gcode = {}  # type: Dict[str, str]
+
         self._material_warning = Message(lifetime=0)
         self._material_warning.addAction(
             action_id="supported_materials_link",
@@ -72,16 +102,108 @@ class SmartSliceJobHandler:
         self._material_warning.actionTriggered.connect(self._openMaterialsPage)
         self.materialWarning.connect(handler.materialWarned)
 
+        # Sections of the last checked job, see checkJob
+        self._sections = {}
+        self._section_revisions = {"meshes": 0, "print_config": 0}
+        self._dirty_sections = set()
+        self._last_check = None
+        self._lock = threading.RLock()
+        self.checks_skipped = 0
+
+        self._stacks = []
+        self._node_signals = []
+
+        # Setting values of the global and extruder stacks for the g-code tokens, by id of the stack
+        self._snapshots = {}  # type: Dict[int, StackSnapshot]
+
+        self._definition_defaults = DefinitionDefaults()
+
+        application = Application.getInstance()
+        application.getPreferences().addPreference(self.compact_settings_preference, False)
+        application.getMachineManager().globalContainerChanged.connect(self._connectStacks)
+        application.getExtruderManager().activeExtruderChanged.connect(self._onSceneChanged)
+        application.getController().getScene().getRoot().childrenChanged.connect(self._onSceneChanged)
+        self._connectStacks()
+
 
     # Builds and checks a smart slice job for errors based on current setup defined by the property handler
     # Will return the job, and a dictionary of error keys and associated error resolutions
+    #
+    # The job is put together from sections which are only rebuilt when something they depend on changed:
+    #   meshes       - the meshes and their settings, and the extruder checks. Rebuilt on scene and setting changes
+    #   print_config - the global print config and the extruder. Rebuilt on global or extruder setting changes
+    #   material     - the material of the model, looked up again when its GUID changes
+    #   steps        - the use cases, created again when the faces, loads or orientation of the model change
+    # If no section changed, the last job and errors are returned again without validating the job.
     def checkJob(self, machine_name="printer", show_extruder_warnings=False) -> Tuple[pywim.smartslice.job.Job, Dict[str, str]]:
 
         if len(getPrintableNodes()) == 0:
             return None, {}
 
-        # Create a new instance of errors. We will use this to replace the old errors and
-        # emit a signal to replace them
+        # Jobs for the 3MF are built on a worker thread
+        with self._lock:
+            sections = self._updateSections()
+
+            req_tool = SmartSliceRequirements.getInstance()
+            key = (
+                machine_name,
+                self._section_revisions["meshes"],
+                self._section_revisions["print_config"],
+                sections["material"]["guid"],
+                sections["steps"]["key"],
+                req_tool.targetSafetyFactor,
+                req_tool.maxDisplacement
+            )
+
+            if self._last_check is not None and self._last_check[0] == key:
+                self.checks_skipped += 1
+                job, error_dict = self._last_check[1], self._last_check[2]
+            else:
+                job = self._assembleJob(machine_name, sections)
+
+                # Check the job and add the errors
+                errors = list(sections["meshes"]["errors"]) + list(sections["material"]["errors"]) + job.validate()
+
+                error_dict = {}
+                for err in errors:
+                    error_dict[err.error()] = err.resolution()
+
+                self._last_check = (key, job, error_dict)
+
+        # Turn the warnings off if we aren't on the right extruder
+        self._showMaterialWarning(sections["material"], show_extruder_warnings and sections["meshes"]["extruders_valid"])
+
+        return job, dict(error_dict)
+
+    # Marks sections of the job (or all of them) to be rebuilt by the next check
+    def invalidate(self, *sections):
+        self._dirty_sections.update(sections if sections else ("meshes", "print_config"))
+
+    def _updateSections(self) -> Dict[str, dict]:
+        normal_mesh = getPrintableNodes()[0]
+
+        for name, build in (("meshes", self._buildMeshesSection), ("print_config", self._buildPrintConfigSection)):
+            if name in self._dirty_sections or name not in self._sections:
+                self._dirty_sections.discard(name)
+                self._sections[name] = build()
+                self._section_revisions[name] += 1
+
+        machine_extruder = getNodeActiveExtruder(normal_mesh)
+        guid = machine_extruder.material.getMetaData().get("GUID", "")
+        if self._sections.get("material", {}).get("guid") != guid or "material" not in self._sections:
+            self._sections["material"] = self._buildMaterialSection(guid, machine_extruder.material.name)
+
+        smart_slice_node = findChildSceneNode(normal_mesh, Root)
+        steps_key = self._stepsKey(normal_mesh, smart_slice_node)
+        if self._sections.get("steps", {}).get("key") != steps_key:
+            self._sections["steps"] = {
+                "key": steps_key,
+                "steps": smart_slice_node.createSteps() if smart_slice_node else None
+            }
+
+        return self._sections
+
+    def _buildMeshesSection(self) -> dict:
         errors = []
 
         if len(getPrintableNodes()) != 1:
@@ -90,27 +212,24 @@ class SmartSliceJobHandler:
                 "Only 1 printable model is currently supported"
             ))
 
-        # We build a new job from scratch evertime - it's easier than trying to manage a whole bunch of changes
-        job = pywim.smartslice.job.Job()
-
         # Extruder Manager
         extruderManager = Application.getInstance().getExtruderManager()
         emActive = extruderManager._active_extruder_index
 
-        # Normal mesh
-        normal_mesh = getPrintableNodes()[0]
-
         # Get all nodes to cycle through
-        nodes = [normal_mesh] + getModifierMeshes()
+        nodes = [getPrintableNodes()[0]] + getModifierMeshes()
+
+        self._connectNodes(nodes)
+
+        meshes = []
+        extruders_valid = True
 
         # Cycle through all of the meshes and check extruder
         for node in nodes:
             active_extruder = getNodeActiveExtruder(node)
 
             # Build the data for Smart Slice error checking
-            mesh = pywim.chop.mesh.Mesh(node.getName())
-            mesh.print_config.auxiliary = self._getAuxDict(node.callDecoration("getStack"))
-            job.chop.meshes.add(mesh)
+            meshes.append((node.getName(), self._getAuxDict(node.callDecoration("getStack"))))
 
             # Check the active extruder
             any_individual_extruder = all(map(lambda k : (int(active_extruder.getProperty(k, "value")) <= 0), ExtruderProperty.EXTRUDER_KEYS))
@@ -119,107 +238,233 @@ class SmartSliceJobHandler:
                     "Invalid extruder selected for <i>{}</i>".format(node.getName()),
                     "Change active extruder to Extruder 1"
                 ))
-                show_extruder_warnings = False # Turn the warnings off - we aren't on the right extruder
-
-        # Check the material
-        machine_extruder = getNodeActiveExtruder(normal_mesh)
-        guid = machine_extruder.material.getMetaData().get("GUID", "")
-        material, tested = self.getMaterial(guid)
-
-        if not material:
-            errors.append(pywim.smartslice.val.InvalidSetup(
-                "Material <i>{}</i> is not currently supported for Smart Slice".format(machine_extruder.material.name),
-                "Please select a supported material."
-            ))
-        else:
-            if not tested and show_extruder_warnings:
-                self._material_warning.setText(i18n_catalog.i18nc(
-                    "@info:status", "Material <b>{}</b> has not been tested for Smart Slice. A generic equivalent will be used.".format(machine_extruder.material.name)
-                ))
-                self._material_warning.show()
-
-                self.materialWarning.emit(guid)
-            elif tested:
-                self._material_warning.hide()
-
-            job.bulk.add(
-                pywim.fea.model.Material.from_dict(material)
-            )
-
-        # Use Cases
-        smart_sliceScene_node = findChildSceneNode(getPrintableNodes()[0], Root)
-        if smart_sliceScene_node:
-            job.chop.steps = smart_sliceScene_node.createSteps()
+                extruders_valid = False
 
-        # Requirements
-        req_tool = SmartSliceRequirements.getInstance()
-        job.optimization.min_safety_factor = req_tool.targetSafetyFactor
-        job.optimization.max_displacement = req_tool.maxDisplacement
+        return {"meshes": meshes, "errors": errors, "extruders_valid": extruders_valid}
 
+    def _buildPrintConfigSection(self) -> dict:
         # Global print config -- assuming only 1 extruder is active for ALL meshes right now
-        print_config = pywim.am.Config()
-        print_config.layer_height = self._propertyHandler.getGlobalProperty("layer_height")
-        print_config.layer_width = self._propertyHandler.getExtruderProperty("line_width")
-        print_config.walls = self._propertyHandler.getExtruderProperty("wall_line_count")
-        print_config.bottom_layers = self._propertyHandler.getExtruderProperty("top_layers")
-        print_config.top_layers = self._propertyHandler.getExtruderProperty("bottom_layers")
+        config = {
+            "layer_height": self._propertyHandler.getGlobalProperty("layer_height"),
+            "layer_width": self._propertyHandler.getExtruderProperty("line_width"),
+            "walls": self._propertyHandler.getExtruderProperty("wall_line_count"),
+            "bottom_layers": self._propertyHandler.getExtruderProperty("top_layers"),
+            "top_layers": self._propertyHandler.getExtruderProperty("bottom_layers")
+        }
 
         # > https://github.com/Ultimaker/CuraEngine/blob/master/src/FffGcodeWriter.cpp#L402
         skin_angles = self._propertyHandler.getExtruderProperty("skin_angles")
         if type(skin_angles) is str:
             skin_angles = SettingFunction(skin_angles)(self._propertyHandler)
         if len(skin_angles) > 0:
-            print_config.skin_orientations.extend(tuple(skin_angles))
+            config["skin_orientations"] = tuple(skin_angles)
         else:
-            print_config.skin_orientations.extend((45, 135))
+            config["skin_orientations"] = (45, 135)
 
         infill_pattern = self._propertyHandler.getExtruderProperty("infill_pattern")
-        print_config.infill.density = self._propertyHandler.getExtruderProperty("infill_sparse_density")
+        config["infill_density"] = self._propertyHandler.getExtruderProperty("infill_sparse_density")
         if infill_pattern in self.INFILL_CURA_SMARTSLICE.keys():
-            print_config.infill.pattern = self.INFILL_CURA_SMARTSLICE[infill_pattern]
+            config["infill_pattern"] = self.INFILL_CURA_SMARTSLICE[infill_pattern]
         else:
-            print_config.infill.pattern = infill_pattern # The job validation will handle the error
+            config["infill_pattern"] = infill_pattern # The job validation will handle the error
 
         # > https://github.com/Ultimaker/CuraEngine/blob/master/src/FffGcodeWriter.cpp#L366
         infill_angles = self._propertyHandler.getExtruderProperty("infill_angles")
         if type(infill_angles) is str:
             infill_angles = SettingFunction(infill_angles)(self._propertyHandler)
         if len(infill_angles) == 0:
-            print_config.infill.orientation = self.INFILL_DIRECTION
+            config["infill_orientation"] = self.INFILL_DIRECTION
         else:
             if len(infill_angles) > 1:
                 Logger.log("w", "More than one infill angle is set! Only the first will be taken!")
                 Logger.log("d", "Ignoring the angles: {}".format(infill_angles[1:]))
-            print_config.infill.orientation = infill_angles[0]
+            config["infill_orientation"] = infill_angles[0]
 
-        print_config.auxiliary = self._getAuxDict(
+        config["auxiliary"] = self._getAuxDict(
             Application.getInstance().getGlobalContainerStack()
         )
 
         # Extruder config
-        extruders = ()
-        machine_extruder = getNodeActiveExtruder(normal_mesh)
+        extruders = []
+        machine_extruder = getNodeActiveExtruder(getPrintableNodes()[0])
         for extruder_stack in [machine_extruder]:
-            extruder = pywim.chop.machine.Extruder(diameter=extruder_stack.getProperty("machine_nozzle_size", "value"))
-            extruder.print_config.auxiliary = self._getAuxDict(extruder_stack)
+            extruders.append((extruder_stack.getProperty("machine_nozzle_size", "value"), self._getAuxDict(extruder_stack)))
+
+        config["extruders"] = extruders
+
+        return config
+
+    def _buildMaterialSection(self, guid: str, name: str) -> dict:
+        material, tested = self.getMaterial(guid)
+
+        errors = []
+        if not material:
+            errors.append(pywim.smartslice.val.InvalidSetup(
+                "Material <i>{}</i> is not currently supported for Smart Slice".format(name),
+                "Please select a supported material."
+            ))
+
+        return {"guid": guid, "name": name, "material": material, "tested": tested, "errors": errors}
+
+    def _showMaterialWarning(self, material: dict, show_warnings: bool):
+        if not material["material"]:
+            return
+
+        if not material["tested"] and show_warnings:
+            self._material_warning.setText(i18n_catalog.i18nc(
+                "@info:status", "Material <b>{}</b> has not been tested for Smart Slice. A generic equivalent will be used.".format(material["name"])
+            ))
+            self._material_warning.show()
+
+            self.materialWarning.emit(material["guid"])
+        elif material["tested"]:
+            self._material_warning.hide()
+
+    # Everything the use cases are created from
+    def _stepsKey(self, normal_mesh, smart_slice_node) -> tuple:
+        if smart_slice_node is None:
+            return ()
+
+        key = [normal_mesh.getLocalTransformation().getData().tobytes()]
+
+        for bc_node in DepthFirstIterator(smart_slice_node):
+            if isinstance(bc_node, HighlightFace):
+                key.append((type(bc_node), bc_node.getName(), bc_node.face, bc_node.surface_type))
+            if isinstance(bc_node, LoadFace):
+                key.append((
+                    bc_node.force.magnitude, bc_node.force.pull, bc_node.force.direction_type,
+                    tuple(bc_node.activeArrow.direction.getData().tolist())
+                ))
+
+        return tuple(key)
+
+    # Puts a new job together from the sections
+    def _assembleJob(self, machine_name: str, sections: Dict[str, dict]) -> pywim.smartslice.job.Job:
+        job = pywim.smartslice.job.Job()
+
+        for name, auxiliary in sections["meshes"]["meshes"]:
+            mesh = pywim.chop.mesh.Mesh(name)
+            mesh.print_config.auxiliary = dict(auxiliary)
+            job.chop.meshes.add(mesh)
+
+        material = sections["material"]["material"]
+        if material:
+            job.bulk.add(
+                pywim.fea.model.Material.from_dict(material)
+            )
+
+        # Use Cases
+        if sections["steps"]["steps"] is not None:
+            job.chop.steps = sections["steps"]["steps"]
+
+        # Requirements
+        req_tool = SmartSliceRequirements.getInstance()
+        job.optimization.min_safety_factor = req_tool.targetSafetyFactor
+        job.optimization.max_displacement = req_tool.maxDisplacement
+
+        config = sections["print_config"]
+
+        print_config = pywim.am.Config()
+        print_config.layer_height = config["layer_height"]
+        print_config.layer_width = config["layer_width"]
+        print_config.walls = config["walls"]
+        print_config.bottom_layers = config["bottom_layers"]
+        print_config.top_layers = config["top_layers"]
+        print_config.skin_orientations.extend(config["skin_orientations"])
+        print_config.infill.density = config["infill_density"]
+        print_config.infill.pattern = config["infill_pattern"]
+        print_config.infill.orientation = config["infill_orientation"]
+        print_config.auxiliary = dict(config["auxiliary"])
+
+        extruders = ()
+        for diameter, auxiliary in config["extruders"]:
+            extruder = pywim.chop.machine.Extruder(diameter=diameter)
+            extruder.print_config.auxiliary = dict(auxiliary)
             extruders += (extruder,)
 
         printer = pywim.chop.machine.Printer(name=machine_name, extruders=extruders)
         job.chop.slicer = pywim.chop.slicer.CuraEngine(config=print_config, printer=printer)
 
-        # Check the job and add the errors
-        errors = errors + job.validate()
+        return job
+
+    def _connectStacks(self):
+        for stack in self._stacks:
+            stack.propertyChanged.disconnect(self._onStackPropertyChanged)
+            stack.containersChanged.disconnect(self._onStackContainersChanged)
+
+        for snapshot in self._snapshots.values():
+            snapshot.disconnect()
+
+        self._stacks = []
+        self._snapshots = {}
+
+        global_stack = Application.getInstance().getGlobalContainerStack()
+        if global_stack:
+            self._stacks = [global_stack] + list(global_stack.extruderList)
+
+        for stack in self._stacks:
+            stack.propertyChanged.connect(self._onStackPropertyChanged)
+            stack.containersChanged.connect(self._onStackContainersChanged)
+
+        # Extruder stacks fall back to the global stack, and global settings can be resolved from the extruders
+        if global_stack:
+            global_snapshot = self._snapshot(global_stack)
+            for extruder_stack in global_stack.extruderList:
+                extruder_snapshot = self._snapshot(extruder_stack)
+                extruder_snapshot.dependents.append(global_snapshot)
+                global_snapshot.dependents.append(extruder_snapshot)
+
+        self.invalidate()
 
-        error_dict = {}
-        for err in errors:
-            error_dict[err.error()] = err.resolution()
+    def _snapshot(self, stack) -> "StackSnapshot":
+        snapshot = self._snapshots.get(id(stack))
+        if snapshot is None or snapshot.stack is not stack:
+            snapshot = StackSnapshot(stack)
+            self._snapshots[id(stack)] = snapshot
+        return snapshot
 
-        return job, error_dict
+    def _connectNodes(self, nodes):
+        for stack, extruder_changed in self._node_signals:
+            stack.propertyChanged.disconnect(self._onNodeStackPropertyChanged)
+            extruder_changed.disconnect(self._onSceneChanged)
+
+        self._node_signals = []
+
+        for node in nodes:
+            stack = node.callDecoration("getStack")
+            extruder_changed = node.callDecoration("getActiveExtruderChangedSignal")
+            if stack and extruder_changed:
+                stack.propertyChanged.connect(self._onNodeStackPropertyChanged)
+                extruder_changed.connect(self._onSceneChanged)
+                self._node_signals.append((stack, extruder_changed))
+
+    def _onStackPropertyChanged(self, key, property_name):
+        # Settings of the nodes inherit from the global and extruder stacks
+        if property_name == "value":
+            self.invalidate("meshes", "print_config")
+
+    def _onStackContainersChanged(self, container):
+        self.invalidate("meshes", "print_config")
+
+    def _onNodeStackPropertyChanged(self, key, property_name):
+        if property_name == "value":
+            self.invalidate("meshes")
+
+    def _onSceneChanged(self, *args):
+        self.invalidate("meshes", "print_config")
 
     # Builds a complete smart slice job to be written to a 3MF
     def buildJobFor3mf(self, machine_name="printer") -> pywim.smartslice.job.Job:
 
-        job, errors = self.checkJob(machine_name)
+        checked_job, errors = self.checkJob(machine_name)
+        if checked_job is None:
+            return None
+
+        self.stable_gcode = {}
+
+        # checkJob may return the same job again, so start from a new one as we change it below
+        with self._lock:
+            job = self._assembleJob(machine_name, self._sections)
 
         # Clear out the data we don't need or will override
         job.chop.meshes.clear()
@@ -237,6 +482,13 @@ class SmartSliceJobHandler:
         print_config = job.chop.slicer.print_config
         print_config.auxiliary = self._buildGlobalSettingsMessage()
 
+        compact = Application.getInstance().getPreferences().getValue(self.compact_settings_preference)
+        payload_sizes = []
+
+        if compact:
+            global_stack = Application.getInstance().getGlobalContainerStack()
+            print_config.auxiliary = self._compactSettings(print_config.auxiliary, global_stack, payload_sizes)
+
         # Setup the slicer configuration. See each class for more
         # information.
         extruders = ()
@@ -247,6 +499,10 @@ class SmartSliceJobHandler:
             pickled_info = self._buildExtruderMessage(extruder_stack)
             extruder_object.id = pickled_info["id"]
             extruder_object.print_config.auxiliary = pickled_info["settings"]
+            if compact:
+                extruder_object.print_config.auxiliary = self._compactSettings(
+                    pickled_info["settings"], extruder_stack, payload_sizes
+                )
             extruders += (extruder_object,)
 
             # Create the extruder object in the smart slice job that defines
@@ -262,6 +518,13 @@ class SmartSliceJobHandler:
         if len(extruders) == 0:
             Logger.log("e", "Did not find the extruder with position %i", machine_extruder.position)
 
+        if compact:
+            full_size = sum(size[0] for size in payload_sizes)
+            compact_size = sum(size[1] for size in payload_sizes)
+            Logger.log("d", "Compact settings: {} of {} bytes sent, {} bytes saved".format(
+                compact_size, full_size, full_size - compact_size
+            ))
+
         printer = pywim.chop.machine.Printer(name=machine_name, extruders=extruders)
 
         # And finally set the slicer to the Cura Engine with the config and printer defined above
@@ -269,25 +532,107 @@ class SmartSliceJobHandler:
 
         return job
 
-    # Writes a smartslice job to a 3MF file
+    # Writes a smartslice job to a 3MF file, given by its path or as a binary stream
+    #
+    # The meshes are written from their NumPy buffers (see utils/ThreeMFWriter), and job.json
+    # is added while the package is written. With a blob store, the package only refers to
+    # the mesh blobs, which have to be uploaded to the store first (see utils/MeshBlobs).
+    # With binary, the job is written as job.bin with the compact encoding (see utils/CompactEncoding).
+    @classmethod
+    def write3mf(self, threemf_path, mesh_nodes, job: pywim.smartslice.job.Job, blob_store=None, binary=False):
+        if isinstance(threemf_path, str):
+            with open(threemf_path, "wb") as threemf_stream:
+                return self.write3mf(threemf_stream, mesh_nodes, job, blob_store, binary)
+
+        objects = self.threeMFObjects(mesh_nodes)
+
+        if binary:
+            files = {self.JOB_BINARY_PATH: CompactEncoding.encode(job.to_dict())}
+        else:
+            files = {self.JOB_PATH: job.to_json()}
+
+        if blob_store is not None:
+            MeshBlobs.writeReferencePackage(threemf_path, objects, files)
+        else:
+            ThreeMFWriter.write3mf(threemf_path, objects, files)
+
+        return True
+
+    # Returns the meshes of the nodes for the 3MF, with their world transformation in 3MF
+    # coordinates and their per object settings, as Cura's 3MF writer stores them
+    @classmethod
+    def threeMFObjects(self, mesh_nodes) -> List[ThreeMFWriter.ThreeMFObject]:
+        global_stack = Application.getInstance().getGlobalContainerStack()
+
+        # Cura's Y axis points up, where the Z axis does in 3MF, and 3MF puts the origin in the
+        # front left corner of the build plate instead of its center
+        to_3mf = numpy.array([
+            [1., 0., 0., 0.],
+            [0., 0., -1., 0.],
+            [0., 1., 0., 0.],
+            [0., 0., 0., 1.]
+        ])
+        if global_stack:
+            to_3mf[0, 3] = global_stack.getProperty("machine_width", "value") / 2
+            to_3mf[1, 3] = global_stack.getProperty("machine_depth", "value") / 2
+
+        objects = []
+        for node in mesh_nodes:
+            mesh_data = node.getMeshData()
+            if mesh_data is None:
+                continue
+
+            settings = {}
+            stack = node.callDecoration("getStack")
+            if stack is not None:
+                keys = set(stack.getTop().getAllKeys())
+                if stack.getProperty("machine_extruder_count", "value") > 1:
+                    keys.add("extruder_nr")
+                settings = {key: str(stack.getProperty(key, "value")) for key in keys}
+
+            objects.append(ThreeMFWriter.ThreeMFObject(
+                node.getName(),
+                mesh_data.getVertices(),
+                mesh_data.getIndices(),
+                to_3mf.dot(node.getWorldTransformation().getData()),
+                settings
+            ))
+
+        return objects
+
+    # Reads the smartslice job of a 3MF file (a path or a binary stream), without the meshes
+    #
+    # Only the job.json (or job.bin) entry of the zip archive is read; the job is returned as the
+    # dictionary it was saved as, so it can be looked at without building the job. Returns None
+    # if the archive has neither.
     @classmethod
-    def write3mf(self, threemf_path, mesh_nodes, job: pywim.smartslice.job.Job):
-        # Getting 3MF writer and write our file
-        threeMF_Writer = Application.getInstance().getMeshFileHandler().getWriter("3MFWriter")
-        if threeMF_Writer is not None:
-            threeMF_Writer.write(threemf_path, mesh_nodes)
+    def readSmartSliceJobDict(self, file) -> Optional[dict]:
+        with zipfile.ZipFile(file) as threemf_file:
+            names = set(threemf_file.namelist())
 
-            threemf_file = zipfile.ZipFile(threemf_path, 'a')
-            threemf_file.writestr('SmartSlice/job.json', job.to_json() )
-            threemf_file.close()
+            if self.JOB_PATH in names:
+                return json.loads(threemf_file.read(self.JOB_PATH))
 
-            return True
+            if self.JOB_BINARY_PATH in names:
+                return CompactEncoding.decode(threemf_file.read(self.JOB_BINARY_PATH))
 
-        return False
+        return None
 
     # Reads a 3MF file into a smartslice job
     @classmethod
     def extractSmartSliceJobFrom3MF(self, file) -> pywim.smartslice.job.Job:
+        try:
+            job_dict = self.readSmartSliceJobDict(file)
+        except (zipfile.BadZipFile, ValueError) as exc:
+            Logger.log("w", "Unable to read the job from the 3MF, reading all of it: {}".format(exc))
+            job_dict = None
+        finally:
+            if hasattr(file, "seek"):
+                file.seek(0)
+
+        if job_dict is not None:
+            return pywim.smartslice.job.Job.from_dict(job_dict)
+
         tmf = threemf.ThreeMF()
 
         tmf_reader = threemf.io.Reader()
@@ -305,7 +650,7 @@ class SmartSliceJobHandler:
         )
 
         if len(job_assets) == 0:
-            raise SmartSliceCloudJob.JobException('Could not find smart slice information in 3MF')
+            raise Exception('Could not find smart slice information in 3MF')
 
         return job_assets[0].content
 
@@ -315,20 +660,7 @@ class SmartSliceJobHandler:
             Returns a dictionary of the material definition and whether the material is tested.
             Will return a None material if it is not supported
         '''
-        this_dir = os.path.split(__file__)[0]
-        database_location = os.path.join(this_dir, "data", "POC_material_database.json")
-        jdata = json.loads(open(database_location).read())
-
-        for material in jdata["materials"]:
-
-            if "cura-tested-guid" in material and guid in material["cura-tested-guid"]:
-                return material, True
-            elif "cura-generic-guid" in material and guid in material["cura-generic-guid"]:
-                return material, False
-            elif "cura-guid" in material and guid in material["cura-guid"]: # Backwards compatibility (don't think this should ever happen)
-                return material, True
-
-        return None, False
+        return getMaterialDatabase().lookup(guid)
 
     def _openMaterialsPage(self, msg, action):
         QDesktopServices.openUrl(QUrl("https://help.tetonsim.com/supported-materials"))
@@ -403,10 +735,7 @@ class SmartSliceJobHandler:
     #   replaced with.
     def _buildReplacementTokens(self, stack):
 
-        result = {}
-        for key in stack.getAllKeys():
-            value = stack.getProperty(key, "value")
-            result[key] = value
+        result = dict(self._snapshot(stack).values())
 
         result["print_bed_temperature"] = result["material_bed_temperature"]  # Renamed settings.
         result["print_temperature"] = result["material_print_temperature"]
@@ -428,17 +757,33 @@ class SmartSliceJobHandler:
         self._cacheAllExtruderSettings()
 
         try:
-            # any setting can be used as a token
-            fmt = GcodeStartEndFormatter(default_extruder_nr=default_extruder_nr)
             if self._all_extruders_settings is None:
                 return ""
-            settings = self._all_extruders_settings.copy()
-            settings["default_extruder_nr"] = default_extruder_nr
-            return str(fmt.format(value, **settings))
+            expanded, stable = self.expandGcode(value, self._all_extruders_settings, default_extruder_nr)
+            self.stable_gcode[expanded] = stable
+            return expanded
         except:
             Logger.logException("w", "Unable to do token replacement on start/end g-code")
             return str(value)
 
+    # #  Replace setting tokens in a piece of g-code with the settings of the stacks (by extruder nr, -1 for the global stack).
+    #   \return The expanded g-code, and the g-code expanded with the volatile tokens left in
+    @classmethod
+    def expandGcode(cls, value, all_extruders_settings: Dict[str, Dict[str, Any]], default_extruder_nr) -> Tuple[str, str]:
+        # any setting can be used as a token
+        fmt = GcodeStartEndFormatter(default_extruder_nr=default_extruder_nr)
+
+        settings = all_extruders_settings.copy()
+        settings["default_extruder_nr"] = default_extruder_nr
+
+        stable_settings = {
+            nr: dict(tokens, **{token: "<" + token + ">" for token in cls.VOLATILE_TOKENS if token in tokens})
+            for nr, tokens in all_extruders_settings.items()
+        }
+        stable_settings["default_extruder_nr"] = default_extruder_nr
+
+        return str(fmt.format(value, **settings)), str(fmt.format(value, **stable_settings))
+
     def _modifyInfillAnglesInSettingDict(self, settings):
         for key, value in settings.items():
             if key == "infill_angles":
@@ -543,6 +888,64 @@ class SmartSliceJobHandler:
 
         return extruder_message
 
+    # #  Leaves out the settings which have the same value as the definitions of the stack.
+    #
+    #   The definition id and a fingerprint of the definition defaults are added instead, so the
+    #   settings which were left out can be rebuilt. The sizes in bytes of the full and of the
+    #   compact settings are appended to payload_sizes.
+    def _compactSettings(self, settings: Dict[str, str], stack, payload_sizes: List[Tuple[int, int]]) -> Dict[str, str]:
+        defaults, fingerprint = self._definition_defaults.defaults(stack)
+
+        compact_settings = {
+            key: value for key, value in settings.items()
+            if key in self.ALWAYS_SENT_SETTINGS or defaults.get(key) != value
+        }
+
+        compact_settings["smartslice_settings_encoding"] = "non-default"
+        compact_settings["smartslice_definition_id"] = "/".join(self._definition_defaults.definitionIds(stack))
+        compact_settings["smartslice_definition_fingerprint"] = fingerprint
+
+        payload_sizes.append((len(json.dumps(settings)), len(json.dumps(compact_settings))))
+
+        return compact_settings
+
+# #  The values of all settings of a stack, read once and kept until a setting of the stack changes.
+#
+#   Snapshots of stacks which inherit from each other are linked with dependents, so a change
+#   in one stack also drops the snapshots which may have read the changed value.
+class StackSnapshot:
+    def __init__(self, stack):
+        self.stack = stack
+        self.dependents = []  # type: List[StackSnapshot]
+        self.builds = 0
+
+        self._values = None
+
+        stack.propertyChanged.connect(self._onPropertyChanged)
+        stack.containersChanged.connect(self.invalidate)
+
+    def values(self) -> Dict[str, Any]:
+        values = self._values
+        if values is None:
+            values = {key: self.stack.getProperty(key, "value") for key in self.stack.getAllKeys()}
+            self._values = values
+            self.builds += 1
+        return values
+
+    def invalidate(self, *args, propagate=True):
+        self._values = None
+        if propagate:
+            for snapshot in self.dependents:
+                snapshot.invalidate(propagate=False)
+
+    def disconnect(self):
+        self.stack.propertyChanged.disconnect(self._onPropertyChanged)
+        self.stack.containersChanged.disconnect(self.invalidate)
+
+    def _onPropertyChanged(self, key, property_name):
+        if property_name == "value":
+            self.invalidate()
+
 # #  Formatter class that handles token expansion in start/end gcode
 class GcodeStartEndFormatter(Formatter):
 
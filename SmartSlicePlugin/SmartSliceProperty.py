@@ -320,6 +320,10 @@ class SceneNode(TrackedProperty):
         self._extruder = SceneNodeExtruder(node)
         self._names = ExtruderProperty.NAMES
 
+    @property
+    def transform(self) -> Transform:
+        return self._transform
+
     def value(self):
         if self._node:
             stack = self._node.callDecoration("getStack").getTop()
@@ -467,7 +471,7 @@ class SmartSliceFace(TrackedProperty):
     def changed(self) -> bool:
         highlight_face = self.value()
 
-        return highlight_face.getTriangles() != self._properties.tri_face.triangles or \
+        return highlight_face.face != self._properties.tri_face or \
             highlight_face.axis != self._properties.axis or \
             highlight_face.surface_type != self._properties.surface_type or \
             highlight_face.selection != self._properties.selection
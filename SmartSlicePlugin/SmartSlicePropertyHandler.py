@@ -110,9 +110,9 @@ class SmartSlicePropertyHandler(QObject):
         self._confirmDialog = None
 
         #  Attune to scene changes and mesh changes
-        controller.getTool("ScaleTool").operationStopped.connect(self._onSceneNodeChanged)
-        controller.getTool("RotateTool").operationStopped.connect(self._onSceneNodeChanged)
-        controller.getTool("TranslateTool").operationStopped.connect(self._onSceneNodeChanged)
+        controller.getTool("ScaleTool").operationStopped.connect(self._onSceneNodeTransformed)
+        controller.getTool("RotateTool").operationStopped.connect(self._onSceneNodeTransformed)
+        controller.getTool("TranslateTool").operationStopped.connect(self._onSceneNodeTransformed)
 
         CuraApplication.getInstance().getExtruderManager().activeExtruderChanged.connect(self._onActiveExtruderChanged)
 
@@ -305,6 +305,13 @@ class SmartSlicePropertyHandler(QObject):
         tracked_nodes = list(filter(lambda p: isinstance(p, SmartSliceProperty.SceneNode), self._properties))
         self.confirmPendingChanges(tracked_nodes + [self._scene])
 
+    def _onSceneNodeTransformed(self, tool=None):
+        # The transform tools only change the transformation of the nodes. The scene, the node
+        # settings and the analyzed interactive mesh (which lives in local space) stay the same.
+        self.confirmPendingChanges([
+            p.transform for p in self._properties if isinstance(p, SmartSliceProperty.SceneNode)
+        ])
+
     def _onSceneNodePropertyChanged(self, key=None, property_name=None):
         if key not in SmartSliceProperty.ExtruderProperty.NAMES:
             return
@@ -354,14 +361,24 @@ class SmartSlicePropertyHandler(QObject):
         if not any(changes):
             return
 
+        if self.invalidateJob(revalidationRequired):
+            for p in props:
+                p.cache()
+
+    def invalidateJob(self, revalidationRequired=True) -> bool:
+        """
+        Invalidates the job after a change to it. Returns False if the user is asked to confirm
+        the change first, as it discards a running job or the results
+        """
+
         if self.connector.status in {SmartSliceCloudStatus.Queued, SmartSliceCloudStatus.BusyValidating, SmartSliceCloudStatus.BusyOptimizing, SmartSliceCloudStatus.Optimized}:
             if self._addProperties and not self._cancelChanges:
                 self.showConfirmDialog(revalidationRequired)
-        else:
-            self.connector.status = SmartSliceCloudStatus.Cancelling
-            self.connector.updateStatus()
-            for p in props:
-                p.cache()
+            return False
+
+        self.connector.status = SmartSliceCloudStatus.Cancelling
+        self.connector.updateStatus()
+        return True
 
     def showConfirmDialog(self, revalidationRequired : bool):
         if (self._confirmDialog and self._confirmDialog.visible) or self.connector.cloudJob is None:
@@ -9,6 +9,8 @@ from UM.Application import Application
 from cura.BuildVolume import BuildVolume
 from cura.Scene.ConvexHullNode import ConvexHullNode
 
+from .select_tool.SmartSliceSelectTool import SmartSliceSelectTool
+
 import math
 
 
@@ -37,6 +39,10 @@ class SmartSliceView(View):
 
         self._checkSetup()
 
+        # The face under the mouse while selecting faces is highlighted
+        select_tool = SmartSliceSelectTool.getInstance()
+        hovered_face = select_tool.getHoveredFace() if select_tool else None
+
         for node in DepthFirstIterator(scene.getRoot()):
             if isinstance(node, (BuildVolume, ConvexHullNode, Platform)):
                 continue
@@ -59,6 +65,8 @@ class SmartSliceView(View):
                     elif per_mesh_stack and per_mesh_stack.getProperty("support_mesh", "value"):
                         pass
                     else:
+                        uniforms["hover_face"] = hovered_face[1] if hovered_face and hovered_face[0] is node else -1
+
                         if overlay:
                             renderer.queueNode(node, shader = self._shader, uniforms = uniforms, overlay = True)
                         else:
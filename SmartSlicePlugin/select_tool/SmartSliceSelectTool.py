@@ -1,4 +1,4 @@
-from typing import Tuple, List, cast
+from typing import Tuple, List, Optional, cast
 
 import numpy
 import time
@@ -17,6 +17,7 @@ from UM.Math.Quaternion import Quaternion
 from UM.Signal import Signal
 from UM.Tool import Tool
 from UM.Scene.SceneNode import SceneNode
+from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Scene.Selection import Selection
 from UM.Scene.ToolHandle import ToolHandle
 from UM.PluginRegistry import PluginRegistry
@@ -25,7 +26,9 @@ from UM.View.SelectionPass import SelectionPass
 from ..stage import SmartSliceScene
 from ..utils import getPrintableNodes
 from ..utils import findChildSceneNode
+from ..utils import getScenePicker
 from ..utils import angleBetweenVectors
+from ..utils.CompactMesh import CompactFace
 from .BoundaryConditionList import BoundaryConditionListModel
 
 i18n_catalog = i18nCatalog("smartslice")
@@ -64,10 +67,14 @@ class SmartSliceSelectTool(Tool):
         self._rotating = False
         self._select = True
         self._selected_face = None
+        self._hovered_face = None
 
     toolPropertyChanged = Signal()
     selectedFaceChanged = Signal()
 
+    # Emitted with the (node, face id) under the mouse, or None, when it changes. SmartSliceView highlights it.
+    hoveredFaceChanged = Signal()
+
     @staticmethod
     def getInstance():
         return Application.getInstance().getController().getTool(
@@ -142,7 +149,7 @@ class SmartSliceSelectTool(Tool):
         self,
         current_surface : Tuple[SceneNode, int],
         surface_type : SmartSliceScene.HighlightFace.SurfaceType
-    ) -> Tuple[pywim.geom.tri.Face, pywim.geom.Vector]:
+    ) -> Tuple[CompactFace, pywim.geom.Vector]:
 
         if current_surface is None:
             current_surface = Selection.getSelectedFace()
@@ -154,17 +161,10 @@ class SmartSliceSelectTool(Tool):
 
         smart_slice_node = findChildSceneNode(node, SmartSliceScene.Root)
 
-        interactive_mesh = smart_slice_node.getInteractiveMesh()
-
-        if interactive_mesh is None:
+        if smart_slice_node.getInteractiveMesh() is None:
             return None, None
 
-        if surface_type == SmartSliceScene.HighlightFace.SurfaceType.Flat:
-            selected_face = interactive_mesh.select_planar_face(face_id)
-        elif surface_type == SmartSliceScene.HighlightFace.SurfaceType.Concave:
-            selected_face = interactive_mesh.select_concave_face(face_id)
-        elif surface_type == SmartSliceScene.HighlightFace.SurfaceType.Convex:
-            selected_face = interactive_mesh.select_convex_face(face_id)
+        selected_face = smart_slice_node.selectFace(surface_type, face_id)
 
         axis = None
         if surface_type == SmartSliceScene.HighlightFace.SurfaceType.Flat:
@@ -258,6 +258,7 @@ class SmartSliceSelectTool(Tool):
         if event.type == Event.ToolDeactivateEvent:
             self._changeRenderMode(faces=False)
             self._active = False
+            self._updateHover(None)
             if self._bc_list and self._bc_list.getActiveNode():
                 self._controller.getScene().sceneChanged.emit(self._bc_list.getActiveNode())
                 self._bc_list = None
@@ -269,6 +270,10 @@ class SmartSliceSelectTool(Tool):
         # Not a load face - make sure we render faces
         if not self._bc_list or not self._bc_list.getActiveNode() or isinstance(self._bc_list.getActiveNode(), SmartSliceScene.AnchorFace):
             self._changeRenderMode(faces=True)
+            if event.type == Event.MousePressEvent and MouseEvent.LeftButton in event.buttons:
+                return self._pickFace(event.x, event.y)
+            if event.type == Event.MouseMoveEvent:
+                self._updateHover(event)
             return False
 
         active_node = self._bc_list.getActiveNode() # Load face
@@ -288,6 +293,8 @@ class SmartSliceSelectTool(Tool):
             if not pixel_color or not arrow.isAxis(pixel_color):
                 if Selection.hasSelection() and not Selection.getFaceSelectMode():
                     self._changeRenderMode(faces=True)
+                    if self._pickFace(event.x, event.y):
+                        return True
                     select_tool = PluginRegistry.getInstance().getPluginObject("SelectionTool")
                     return select_tool.event(event)
 
@@ -307,12 +314,13 @@ class SmartSliceSelectTool(Tool):
 
         if event.type == Event.MouseMoveEvent:
 
-            # Rotator isn't enabled - we don't need to do anything
+            event = cast(MouseEvent, event)
+
+            # Rotator isn't enabled - only the face under the mouse can change
             if not rotator.isEnabled():
+                self._updateHover(event)
                 return False
 
-            event = cast(MouseEvent, event)
-
             # Turn the shader on for the rotator and arrow if the mouse is hovered on them
             # in the above, pixel_color is the color of the solid mesh of the pixekl the mouse is on
             # For some reason, "ActiveAxis" means the color of the tool we are interested in
@@ -323,9 +331,11 @@ class SmartSliceSelectTool(Tool):
                 if rotator.isAxis(pixel_color):
                     rotator.setActiveAxis(pixel_color)
                     arrow.setActiveAxis(pixel_color)
+                    self._updateHover(None)
                 else:
                     rotator.setActiveAxis(None)
                     arrow.setActiveAxis(None)
+                    self._updateHover(event)
 
                 return False
 
@@ -376,6 +386,74 @@ class SmartSliceSelectTool(Tool):
 
         return False
 
+    def getHoveredFace(self) -> Optional[Tuple[SceneNode, int]]:
+        return self._hovered_face
+
+    def _pickFace(self, x: float, y: float) -> bool:
+        """
+        Selects the face of the selected model under the mouse by casting a ray against its
+        interactive mesh, instead of reading the face id back from the selection render pass.
+        Returns False if the ray misses the model or another model is in front of it, so the
+        event can be passed on.
+        """
+        face = self._faceAt(x, y)
+        if face is None:
+            return False
+
+        Selection.setFace(*face)
+        return True
+
+    def _updateHover(self, event: Optional[MouseEvent]):
+        # Moving the mouse never waits for a BVH, models without one don't hide the face until it is built
+        face = self._faceAt(event.x, event.y, build=False) if event is not None and self._active else None
+
+        if face == self._hovered_face:
+            return
+
+        previous, self._hovered_face = self._hovered_face, face
+        self.hoveredFaceChanged.emit(face)
+
+        # Render the highlight again, through our Root node so the backend doesn't take it for a change of the model
+        changed = face if face is not None else previous
+        smart_slice_node = findChildSceneNode(changed[0], SmartSliceScene.Root)
+        if smart_slice_node is not None:
+            self._controller.getScene().sceneChanged.emit(smart_slice_node)
+
+    def _faceAt(self, x: float, y: float, build: bool = True) -> Optional[Tuple[SceneNode, int]]:
+        """
+        Returns the selected model and the id of its triangle under the mouse, or None if the
+        ray misses it or hits another model first, the way the selection render pass sees it.
+        Unless build is set, other models are only tested once their BVH is built.
+        """
+        node = Selection.getSelectedObject(0)
+        if node is None:
+            return None
+
+        smart_slice_node = findChildSceneNode(node, SmartSliceScene.Root)
+        if smart_slice_node is None:
+            return None
+
+        camera = self._controller.getScene().getActiveCamera()
+        if camera is None:
+            return None
+
+        ray = camera.getRay(x, y)
+        triangle_id, distance = smart_slice_node.castRay(ray.origin, ray.direction)
+        if triangle_id is None:
+            return None
+
+        # Any other model the selection pass would draw in front of the face hides it
+        others = [
+            other for other in DepthFirstIterator(self._controller.getScene().getRoot())
+            if other is not node and other.isSelectable() and other.isVisible() and other.getMeshData() is not None
+        ]
+
+        occluder, _, _ = getScenePicker().nearestHit(others, ray.origin, ray.direction, distance, build)
+        if occluder is not None:
+            return None
+
+        return node, triangle_id
+
     def _changeRenderMode(self, faces=True):
         if Selection.hasSelection() and Selection.getFaceSelectMode() != faces:
             self._select = False
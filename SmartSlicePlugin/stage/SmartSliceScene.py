@@ -1,8 +1,7 @@
-from typing import List, Any, Union
+from typing import List, Any, Optional, Tuple, Union
 from enum import Enum
 
 import math
-import time
 
 from UM.Job import Job
 from UM.Logger import Logger
@@ -20,7 +19,10 @@ from UM.Application import Application
 
 from UM.i18n import i18nCatalog
 
-from ..utils import makeInteractiveMesh, getPrintableNodes, angleBetweenVectors
+from ..utils import makeInteractiveMesh, getPrintableNodes, getScenePicker, angleBetweenVectors
+from ..utils.CompactMesh import CompactMesh, CompactFace
+from ..utils.MeshAnalysisProcess import MeshAnalysisProcess
+from ..utils.ScenePicker import localRay
 from ..select_tool.LoadArrow import LoadArrow
 from .. select_tool.LoadRotator import LoadRotator
 from .. select_tool.LoadToolHandle import LoadToolHandle
@@ -105,7 +107,7 @@ class HighlightFace(SceneNode):
     def __init__(self, name: str = ""):
         super().__init__(name=name, visible=True)
 
-        self.face = pywim.geom.tri.Face()
+        self.face = CompactFace()
         self._surface_type = self.SurfaceType.Flat
         self.axis = None #pywim.geom.vector
         self.selection = None
@@ -137,22 +139,23 @@ class HighlightFace(SceneNode):
         pass
 
     def getTriangleIndices(self) -> List[int]:
-        return [t.id for t in self.face.triangles]
+        # Always the triangle ids of the model, even if the face was selected on a proxy mesh
+        return self.face.original_ids.tolist()
 
     def getTriangles(self):
         return self.face.triangles
 
     def clearSelection(self):
-        self.face = pywim.geom.tri.Face()
+        self.face = CompactFace()
         self.axis = None
         super().setMeshData(None)
 
     def setMeshDataFromPywimTriangles(
-        self, face: pywim.geom.tri.Face,
+        self, face: CompactFace,
         axis: pywim.geom.Vector = None
     ):
 
-        if len(face.triangles) == 0:
+        if len(face.triangle_ids) == 0:
             return
 
         self.face = face
@@ -160,8 +163,7 @@ class HighlightFace(SceneNode):
 
         mb = MeshBuilder()
 
-        for tri in self.face.triangles:
-            mb.addFace(tri.v1, tri.v2, tri.v3)
+        mb.setVertices(face.vertices().reshape(-1, 3))
 
         mb.calculateNormals()
 
@@ -197,7 +199,7 @@ class AnchorFace(HighlightFace):
         return anchor
 
     def setMeshDataFromPywimTriangles(
-        self, tris: List[pywim.geom.tri.Triangle],
+        self, tris: CompactFace,
         axis: pywim.geom.Vector = None
     ):
         axis = None
@@ -243,7 +245,7 @@ class LoadFace(HighlightFace):
             self.enableRotatorIfNeeded()
 
     def setMeshDataFromPywimTriangles(
-        self, tris: List[pywim.geom.tri.Triangle],
+        self, tris: CompactFace,
         axis: pywim.geom.Vector = None
     ):
 
@@ -442,11 +444,19 @@ class Root(SceneNode):
     faceRemoved = Signal()
     rootChanged = Signal()
 
+    # Models with more triangles than this are decimated to about this many triangles
+    # for face selection and highlighting. 0 turns the selection proxy off.
+    selection_proxy_preference = "smartslice/selection_proxy_triangles"
+
     def __init__(self):
         super().__init__(name='_SmartSlice', visible=True)
 
         self._interactive_mesh = None
+        self._mesh_data = None
         self._mesh_analyzing_message = None
+        self._analyze_mesh_job = None
+
+        self.parentChanged.connect(self._onAncestorChanged)
 
     def setOutsideBuildArea(self, new_value: bool) -> None:
         pass
@@ -457,21 +467,40 @@ class Root(SceneNode):
     def initialize(self, parent: SceneNode, step=None, callback=None):
         parent.addChild(self)
 
+        # Moving, rotating or scaling the parent doesn't touch its (local space) mesh data, so the
+        # analysis and the selected faces are only thrown away when the mesh data is replaced
+        parent.meshDataChanged.connect(self._onParentMeshDataChanged)
+
+        self._analyzeMeshData(parent, step, callback)
+
+        self.rootChanged.emit(self)
+
+    def _analyzeMeshData(self, parent: SceneNode, step=None, callback=None):
         mesh_data = parent.getMeshData()
+        self._mesh_data = mesh_data
 
         if mesh_data:
             Logger.log('d', 'Compute interactive mesh from SceneNode {}'.format(parent.getName()))
 
+            # The model hides the faces of other models behind it when picking
+            getScenePicker().prepare([parent])
+
+            proxy_triangles = int(Application.getInstance().getPreferences().getValue(self.selection_proxy_preference) or 0)
+
             if mesh_data.getVertexCount() < 1000:
-                self._interactive_mesh = makeInteractiveMesh(mesh_data)
+                self._interactive_mesh = makeInteractiveMesh(mesh_data, proxy_triangles=proxy_triangles)
                 if step:
                     self.loadStep(step)
                     self.setOrigin()
                 if callback:
                     callback()
             else:
-                job = AnalyzeMeshJob(mesh_data, step, callback)
+                job = AnalyzeMeshJob(mesh_data, step, callback, proxy_triangles)
                 job.finished.connect(self._process_mesh_analysis)
+                job.analysisProgress.connect(self._onMeshAnalysisProgress)
+
+                # Stop the analysis if the model is removed from the scene
+                parent.parentChanged.connect(self._onAncestorChanged)
 
                 self._mesh_analyzing_message = Message(
                     title=i18n_catalog.i18n("Smart Slice"),
@@ -483,11 +512,30 @@ class Root(SceneNode):
                 )
                 self._mesh_analyzing_message.show()
 
+                self._analyze_mesh_job = job
                 job.start()
 
-        self.rootChanged.emit(self)
+    def _onParentMeshDataChanged(self, node: SceneNode):
+        parent = self.getParent()
+
+        # Our own faces change their mesh data all the time, and that bubbles up through the parent
+        if parent is None or node is not parent or parent.getMeshData() is self._mesh_data:
+            return
+
+        Logger.log("d", "Mesh data of {} was replaced, re-analyzing the interactive mesh".format(parent.getName()))
+
+        self.cancelMeshAnalysis()
+        self.clearFaces()
+
+        self._interactive_mesh = None
+
+        self._analyzeMeshData(parent)
 
     def _process_mesh_analysis(self, job : "AnalyzeMeshJob"):
+        if job is not self._analyze_mesh_job or job.canceled:
+            return
+
+        self._analyze_mesh_job = None
         self._interactive_mesh = job.interactive_mesh
         if self._mesh_analyzing_message:
             self._mesh_analyzing_message.hide()
@@ -508,9 +556,68 @@ class Root(SceneNode):
             if job.callback:
                 job.callback()
 
-    def getInteractiveMesh(self) -> pywim.geom.tri.Mesh:
+    def _onMeshAnalysisProgress(self, progress: int):
+        if self._mesh_analyzing_message and self._analyze_mesh_job:
+            self._mesh_analyzing_message.setProgress(progress)
+
+    def _onAncestorChanged(self, node: SceneNode):
+        parent = self.getParent()
+        if parent is None or parent.getParent() is None:
+            self.cancelMeshAnalysis()
+
+    def cancelMeshAnalysis(self):
+        job = self._analyze_mesh_job
+        if job is None:
+            return
+
+        Logger.log("d", "Canceling the mesh analysis of {}".format(job.mesh_data))
+
+        self._analyze_mesh_job = None
+        job.cancel()
+
+        if self._mesh_analyzing_message:
+            self._mesh_analyzing_message.hide()
+
+    def getInteractiveMesh(self) -> CompactMesh:
         return self._interactive_mesh
 
+    def selectFace(self, surface_type: HighlightFace.SurfaceType, triangle_id: int) -> CompactFace:
+        """
+            Returns the face of the given surface type containing the triangle,
+            looked up from the precomputed face regions
+        """
+        # Cura picks triangles on the model, which may have been decimated for selection
+        triangle_id = self._interactive_mesh.proxyTriangle(triangle_id)
+
+        if surface_type == HighlightFace.SurfaceType.Flat:
+            return self._interactive_mesh.select_planar_face(triangle_id)
+        elif surface_type == HighlightFace.SurfaceType.Concave:
+            return self._interactive_mesh.select_concave_face(triangle_id)
+        elif surface_type == HighlightFace.SurfaceType.Convex:
+            return self._interactive_mesh.select_convex_face(triangle_id)
+
+        return CompactFace(self._interactive_mesh, [triangle_id])
+
+    def castRay(self, origin: Vector, direction: Vector) -> Tuple[Optional[int], float]:
+        """
+            Returns the id of the model's triangle hit by the ray (in world coordinates) and the
+            distance along the ray, or (None, inf) if the ray misses the model or it has not been analyzed yet
+        """
+        parent = self.getParent()
+        if self._interactive_mesh is None or parent is None:
+            return None, numpy.inf
+
+        # The interactive mesh is in the model's local coordinates
+        triangle_id, distance = self._interactive_mesh.hit(*localRay(parent, origin, direction))
+        if triangle_id is None:
+            return None, numpy.inf
+
+        if self._interactive_mesh.is_proxy:
+            # Any model triangle of the proxy triangle selects the same face
+            return int(self._interactive_mesh.originalIds([triangle_id])[0]), distance
+
+        return triangle_id, distance
+
     def addFace(self, bc):
         self.addChild(bc)
         self.faceAdded.emit(bc)
@@ -642,19 +749,22 @@ class Root(SceneNode):
         camTool = controller.getCameraTool()
         camTool.setOrigin(self.getParent().getBoundingBox().center)
 
-    def _guessSurfaceTypeFromTriangles(self, face: pywim.geom.tri.Face) -> HighlightFace.SurfaceType:
+    def _guessSurfaceTypeFromTriangles(self, face: CompactFace) -> HighlightFace.SurfaceType:
         """
             Attempts to determine the face type from a pywim face
             Will return Unknown if it cannot determine the type
         """
-        triangle_list = list(face.triangles)
-        if not face.triangles:
+        triangle_count = len(face.triangle_ids)
+        if triangle_count == 0:
             return HighlightFace.SurfaceType.Unknown
-        elif len(self._interactive_mesh.select_planar_face(triangle_list[0]).triangles) == len(face.triangles):
+
+        regions = self._interactive_mesh.regions
+        triangle_id = int(face.triangle_ids[0])
+        if regions.planarSize(triangle_id) == triangle_count:
             return HighlightFace.SurfaceType.Flat
-        elif len(self._interactive_mesh.select_concave_face(triangle_list[0]).triangles) == len(face.triangles):
+        elif regions.concaveSize(triangle_id) == triangle_count:
             return HighlightFace.SurfaceType.Concave
-        elif len(self._interactive_mesh.select_convex_face(triangle_list[0]).triangles) == len(face.triangles):
+        elif regions.convexSize(triangle_id) == triangle_count:
             return HighlightFace.SurfaceType.Convex
 
         return HighlightFace.SurfaceType.Unknown
@@ -667,15 +777,57 @@ class Root(SceneNode):
 
 
 class AnalyzeMeshJob(Job):
-    def __init__(self, mesh_data, step, callback):
+    # Emitted with the progress of the analysis, from 0 to 100
+    analysisProgress = Signal()
+
+    # Share of the progress taken up by the array analysis, the rest is building the interactive mesh
+    ANALYSIS_PROGRESS = 95
+
+    def __init__(self, mesh_data, step, callback, proxy_triangles: int = 0):
         super().__init__()
         self.mesh_data = mesh_data
         self.step = step
         self.callback = callback
+        self.proxy_triangles = proxy_triangles
         self.interactive_mesh = None
 
+        self.canceled = False
+
+        self._process = MeshAnalysisProcess()
+
     def run(self):
-        # Sleep for a second to allow the UI to catch up (hopefully) and display the progress message
-        time.sleep(1)
-        self.interactive_mesh = makeInteractiveMesh(self.mesh_data)
+        self.analysisProgress.emit(0)
+
+        try:
+            self.interactive_mesh = makeInteractiveMesh(self.mesh_data, self._analyze, self.proxy_triangles)
+        except MeshAnalysisProcess.Canceled:
+            Logger.log("d", "Mesh analysis canceled")
+            return
+
+        # Picking faces shouldn't have to build the BVH on the first click
+        self.interactive_mesh.buildBVH()
+
+        self.analysisProgress.emit(100)
+
+    def cancel(self):
+        super().cancel()
+        self.canceled = True
+        self._process.cancel()
+
+    def _analyze(self, vertices: numpy.ndarray, indices: numpy.ndarray, **options):
+        result = self._process.analyze(
+            vertices, indices, lambda fraction: self.analysisProgress.emit(int(self.ANALYSIS_PROGRESS * fraction)), **options
+        )
+
+        if self.canceled:
+            raise MeshAnalysisProcess.Canceled()
+
+        if self._process.fallback_reason:
+            Logger.log("w", "Mesh analysis process could not be started ({}), analyzed in Cura".format(
+                self._process.fallback_reason
+            ))
+
+        self.analysisProgress.emit(self.ANALYSIS_PROGRESS)
+
+        return result
 
@@ -31,7 +31,7 @@ from cura.CuraApplication import CuraApplication
 
 from . import SmartSliceScene
 from ..utils import findChildSceneNode, getPrintableNodes
-from ..utils import getModifierMeshes, intersectingNodes
+from ..utils import getModifierMeshes, getSceneIndex
 
 i18n_catalog = i18nCatalog("smartslice")
 
@@ -51,6 +51,10 @@ class SmartSliceStage(CuraStage):
         app.engineCreatedSignal.connect(self._engineCreated)
         app.activityChanged.connect(self._checkScene)
 
+        app.getPreferences().addPreference(SmartSliceScene.Root.selection_proxy_preference, 0)
+
+        getSceneIndex().intersectionsChanged.connect(self._onIntersectionsChanged)
+
         self._connector = extension
 
         self._previous_view = None
@@ -331,20 +335,41 @@ class SmartSliceStage(CuraStage):
         if not self._parent_prompt:
             self._parent_prompt = Message(
                 title="Smart Slice",
-                text="Modifier meshes without an assigned parent have been added as a child to the intersecting printable model.",
+                text="Modifier meshes without an assigned parent have been added as a child to the intersecting printable model, and modifier meshes which do not intersect their parent have been moved back to the scene.",
                 lifetime=15,
                 dismissable=True
             )
 
         self._parent_prompt.show()
 
+    def _onIntersectionsChanged(self):
+        # Exact intersection tests finish after the stage was entered, which may change the parent
+        # and with it the job
+        if Application.getInstance().getController().getActiveStage() is self and self._changeParent():
+            self._parentAssigned()
+            self._connector.propertyHandler.invalidateJob()
+
     def _changeParent(self) -> bool:
         if len(getModifierMeshes()) == 0:
             return False
 
+        scene_index = getSceneIndex()
+        root = Application.getInstance().getController().getScene().getRoot()
+
         parent_changed = False
         for node in getPrintableNodes():
-            for intersecting_node in intersectingNodes(node):
+            # Modifier meshes whose meshes turned out not to intersect their parent go back to the scene
+            for separated_node in scene_index.separatedChildren(node):
+                Logger.log("d", "Modifier mesh {} does not intersect {}, moving it back to the scene".format(
+                    separated_node.getName(), node.getName()
+                ))
+                transformation = separated_node.getWorldTransformation()
+                separated_node.setParent(root)
+                separated_node.setTransformation(transformation)
+                parent_changed = True
+
+            # Overlapping boxes are not enough to assign a parent, it waits for the exact intersection test
+            for intersecting_node in scene_index.intersectingNodes(node, exact=True):
                 if intersecting_node.getParent() != node:
                     position = intersecting_node.getWorldPosition()
                     intersecting_node.setParent(node)
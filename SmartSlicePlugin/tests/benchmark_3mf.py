@@ -0,0 +1,98 @@
+'''
+    Benchmarks for writing the 3MF package of a Smart Slice job.
+
+    Usage: python3 benchmark_3mf.py [triangle counts...]
+
+    Only NumPy is required, Cura does not need to be running. The per-vertex column
+    serializes the mesh one vertex and triangle at a time, the way 3MF model XML is
+    built element by element. The Savitar column (the library behind Cura's 3MFWriter)
+    is only filled in when Savitar is installed.
+'''
+
+import io
+import os
+import sys
+import time
+import types
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy
+
+# Load the plugin's utils modules without running utils/__init__.py, which needs Cura
+_utils = types.ModuleType("smartslice_utils")
+_utils.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")]
+sys.modules["smartslice_utils"] = _utils
+
+from smartslice_utils import ThreeMFWriter
+
+from benchmark_mesh import makeTestMesh, timed
+
+
+def perVertex3mf(vertices: numpy.ndarray, indices: numpy.ndarray) -> bytes:
+    model = ET.Element("model", unit="millimeter", xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02")
+    mesh = ET.SubElement(ET.SubElement(ET.SubElement(model, "resources"), "object", id="1", type="model"), "mesh")
+
+    vertices_element = ET.SubElement(mesh, "vertices")
+    for x, y, z in vertices:
+        ET.SubElement(vertices_element, "vertex", x=str(x), y=str(y), z=str(z))
+
+    triangles_element = ET.SubElement(mesh, "triangles")
+    for v1, v2, v3 in indices:
+        ET.SubElement(triangles_element, "triangle", v1=str(v1), v2=str(v2), v3=str(v3))
+
+    ET.SubElement(ET.SubElement(model, "build"), "item", objectid="1")
+
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(ThreeMFWriter.MODEL_PATH, ET.tostring(model))
+    return stream.getvalue()
+
+
+def savitar3mf(vertices: numpy.ndarray, indices: numpy.ndarray) -> bytes:
+    import Savitar
+
+    scene = Savitar.Scene()
+    node = Savitar.SceneNode()
+    node.getMeshData().setVerticesFromBytes(vertices.astype(numpy.float32).tobytes())
+    node.getMeshData().setFacesFromBytes(indices.astype(numpy.int32).tobytes())
+    scene.addSceneNode(node)
+
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(ThreeMFWriter.MODEL_PATH, Savitar.ThreeMFParser().sceneToString(scene))
+    return stream.getvalue()
+
+
+def native3mf(vertices: numpy.ndarray, indices: numpy.ndarray) -> bytes:
+    stream = io.BytesIO()
+    ThreeMFWriter.write3mf(stream, [ThreeMFWriter.ThreeMFObject("mesh", vertices, indices)])
+    return stream.getvalue()
+
+
+def run(triangle_counts):
+    try:
+        import Savitar
+    except ImportError:
+        Savitar = None
+
+    print("{:>10} {:>12} {:>12} {:>12}".format("triangles", "per-vertex", "Savitar", "native"))
+
+    for count in triangle_counts:
+        vertices = makeTestMesh(count)
+        indices = numpy.arange(len(vertices), dtype=numpy.int32).reshape(-1, 3)
+
+        _, per_vertex_time = timed(perVertex3mf, vertices, indices)
+        _, native_time = timed(native3mf, vertices, indices)
+
+        if Savitar:
+            savitar_column = "{:>11.3f}s".format(timed(savitar3mf, vertices, indices)[1])
+        else:
+            savitar_column = "{:>12}".format("n/a")
+
+        print("{:>10} {:>11.3f}s {} {:>11.3f}s".format(len(indices), per_vertex_time, savitar_column, native_time))
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+    run(counts)
@@ -0,0 +1,78 @@
+'''
+    Benchmarks for picking triangles with the TriangleBVH, as the select tool does on
+    every click and mouse move.
+
+    Usage: python3 benchmark_bvh.py [triangle counts...]
+
+    Only NumPy is required, Cura does not need to be running. Rays are cast from
+    outside the test cylinder at random points of its surface; a hover moves the
+    mouse along a line of 100 pixels, one pick per pixel.
+'''
+
+import os
+import sys
+import time
+import types
+
+import numpy
+
+# Load the plugin's utils modules without running utils/__init__.py, which needs Cura
+_utils = types.ModuleType("smartslice_utils")
+_utils.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")]
+sys.modules["smartslice_utils"] = _utils
+
+from smartslice_utils.TriangleBVH import TriangleBVH
+
+from benchmark_mesh import makeTestMesh, timed
+
+PICKS = 200
+HOVER_STEPS = 100
+
+
+def rays(count: int, seed: int = 0):
+    # Rays from 100 mm away towards random points on the cylinder's axis
+    random = numpy.random.RandomState(seed)
+    angles = random.uniform(0., 2. * numpy.pi, count)
+    heights = random.uniform(0., 50., count)
+
+    origins = numpy.stack((100. * numpy.cos(angles), 100. * numpy.sin(angles), heights), axis=1)
+    targets = numpy.stack((numpy.zeros(count), numpy.zeros(count), heights), axis=1)
+
+    return origins, targets - origins
+
+
+def pickAll(bvh: TriangleBVH, origins: numpy.ndarray, directions: numpy.ndarray) -> int:
+    hits = 0
+    for origin, direction in zip(origins, directions):
+        triangle_id, _ = bvh.pick(origin, direction)
+        hits += triangle_id is not None
+    return hits
+
+
+def hoverLine() -> tuple:
+    # The ray sweeps a quarter turn around the cylinder at mid height
+    angles = numpy.linspace(0., numpy.pi / 2., HOVER_STEPS)
+    origins = numpy.stack((100. * numpy.cos(angles), 100. * numpy.sin(angles), numpy.full(HOVER_STEPS, 25.)), axis=1)
+    return origins, numpy.stack((-origins[:, 0], -origins[:, 1], numpy.zeros(HOVER_STEPS)), axis=1)
+
+
+def run(triangle_counts):
+    print("{:>10} {:>10} {:>12} {:>12} {:>8}".format("triangles", "build", "pick", "hover step", "hits"))
+
+    for count in triangle_counts:
+        soup = makeTestMesh(count)
+        triangles = numpy.arange(len(soup)).reshape(-1, 3)
+
+        bvh, build = timed(TriangleBVH, soup, triangles)
+
+        hits, picking = timed(pickAll, bvh, *rays(PICKS))
+        _, hovering = timed(pickAll, bvh, *hoverLine())
+
+        print("{:>10} {:>9.3f}s {:>10.3f}ms {:>10.3f}ms {:>5}/{}".format(
+            len(triangles), build, 1000. * picking / PICKS, 1000. * hovering / HOVER_STEPS, hits, PICKS
+        ))
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+    run(counts)
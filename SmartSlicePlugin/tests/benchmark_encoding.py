@@ -0,0 +1,76 @@
+'''
+    Benchmarks for encoding Smart Slice results as JSON and with the compact binary encoding.
+
+    Usage: python3 benchmark_encoding.py [modifier mesh triangle counts...]
+
+    Only NumPy is required, Cura does not need to be running. The result is a stand-in
+    for Result.to_dict() of an optimization with three modifier meshes per analysis.
+'''
+
+import base64
+import json
+import os
+import sys
+import types
+
+import numpy
+
+# Load the plugin's utils modules without running utils/__init__.py, which needs Cura
+_utils = types.ModuleType("smartslice_utils")
+_utils.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")]
+sys.modules["smartslice_utils"] = _utils
+
+from smartslice_utils import CompactEncoding
+
+from benchmark_mesh import makeTestMesh, timed
+
+
+def makeResult(triangle_count: int, analyses: int = 5, modifier_meshes: int = 3) -> dict:
+    vertices = makeTestMesh(triangle_count).astype(numpy.float64)
+    triangles = numpy.arange(len(vertices)).reshape(-1, 3)
+
+    mesh = {
+        "name": "SmartSliceMeshModifier",
+        "transform": numpy.identity(4).tolist(),
+        "vertices": [{"id": i, "x": x, "y": y, "z": z} for i, (x, y, z) in enumerate(vertices.tolist())],
+        "triangles": [{"id": i, "v1": a, "v2": b, "v3": c} for i, (a, b, c) in enumerate(triangles.tolist())],
+        "print_config": {"walls": 3, "top_layers": 5, "bottom_layers": 5, "infill": {"pattern": 1, "density": 40}}
+    }
+
+    return {
+        "analyses": [
+            {
+                "structural": {"min_safety_factor": 2.5, "max_displacement": 0.25},
+                "print_time": 3600 + i,
+                "modifier_meshes": [mesh] * modifier_meshes
+            }
+            for i in range(analyses)
+        ]
+    }
+
+
+def run(triangle_counts):
+    print("{:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "triangles", "JSON MB", "binary MB", "base64 MB", "JSON enc", "JSON dec", "bin enc", "bin dec"
+    ))
+
+    for count in triangle_counts:
+        result = makeResult(count)
+
+        text, json_encode = timed(json.dumps, result)
+        _, json_decode = timed(json.loads, text)
+
+        binary, binary_encode = timed(CompactEncoding.encode, result)
+        decoded, binary_decode = timed(CompactEncoding.decode, binary)
+        assert decoded == result
+
+        print("{:>10} {:>10.2f} {:>10.2f} {:>10.2f} {:>9.3f}s {:>9.3f}s {:>9.3f}s {:>9.3f}s".format(
+            count,
+            len(text) / 1e6, len(binary) / 1e6, len(base64.b64encode(binary)) / 1e6,
+            json_encode, json_decode, binary_encode, binary_decode
+        ))
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [1000, 10000, 50000]
+    run(counts)
@@ -0,0 +1,159 @@
+'''
+    Benchmarks for building the interactive mesh used for face selection.
+
+    Usage: python3 benchmark_mesh.py [triangle counts...]
+
+    Only NumPy is required, Cura does not need to be running. The pywim
+    columns are only filled in when pywim is installed.
+'''
+
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy
+
+# Load the plugin's utils modules without running utils/__init__.py, which needs Cura
+_utils = types.ModuleType("smartslice_utils")
+_utils.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")]
+sys.modules["smartslice_utils"] = _utils
+
+from smartslice_utils import MeshUtils
+from smartslice_utils.CompactMesh import CompactMesh
+
+
+def makeTestMesh(triangle_count: int) -> numpy.ndarray:
+    '''
+        Returns a triangle soup (3 vertices per triangle, like Cura's MeshData
+        for STL files) of a cylinder with roughly triangle_count triangles.
+    '''
+    segments = max(8, int(numpy.sqrt(triangle_count / 2)))
+    rings = max(1, triangle_count // (2 * segments))
+
+    theta = numpy.linspace(0.0, 2.0 * numpy.pi, segments, endpoint=False)
+    z = numpy.linspace(0.0, 50.0, rings + 1)
+
+    grid = numpy.empty((rings + 1, segments, 3), dtype=numpy.float32)
+    grid[:, :, 0] = 20.0 * numpy.cos(theta)
+    grid[:, :, 1] = 20.0 * numpy.sin(theta)
+    grid[:, :, 2] = z[:, None]
+
+    i = numpy.arange(rings)[:, None]
+    j = numpy.arange(segments)[None, :]
+    jn = (j + 1) % segments
+
+    p00 = grid[i, j]
+    p01 = grid[i, jn]
+    p10 = grid[i + 1, j]
+    p11 = grid[i + 1, jn]
+
+    lower = numpy.stack((p00, p01, p11), axis=2).reshape(-1, 3, 3)
+    upper = numpy.stack((p00, p11, p10), axis=2).reshape(-1, 3, 3)
+
+    return numpy.concatenate((lower, upper)).reshape(-1, 3)
+
+
+def perElementInteractiveMesh(verts: numpy.ndarray) -> 'pywim.geom.tri.Mesh':
+    '''
+        The previous implementation of makeInteractiveMesh, for comparison.
+    '''
+    import pywim
+
+    int_mesh = pywim.geom.tri.Mesh()
+
+    for i in range(len(verts)):
+        int_mesh.add_vertex(i, verts[i][0], verts[i][1], verts[i][2])
+
+    for i in range(0, len(int_mesh.vertices), 3):
+        v1 = int_mesh.vertices[i]
+        v2 = int_mesh.vertices[i + 1]
+        v3 = int_mesh.vertices[i + 2]
+
+        int_mesh.add_triangle(i // 3, v1, v2, v3)
+
+    int_mesh.analyze_mesh(remove_degenerate_triangles=False)
+
+    return int_mesh
+
+
+def pywimInteractiveMesh(vertices: numpy.ndarray, triangles: numpy.ndarray) -> 'pywim.geom.tri.Mesh':
+    '''
+        Builds a pywim interactive mesh from welded arrays, the way makeInteractiveMesh
+        did before it switched to CompactMesh.
+    '''
+    import pywim
+
+    int_mesh = pywim.geom.tri.Mesh()
+
+    add_vertex = int_mesh.add_vertex
+    for i, (x, y, z) in enumerate(vertices.tolist()):
+        add_vertex(i, x, y, z)
+
+    mesh_vertices = int_mesh.vertices
+    add_triangle = int_mesh.add_triangle
+    for i, (v1, v2, v3) in enumerate(triangles.tolist()):
+        add_triangle(i, mesh_vertices[v1], mesh_vertices[v2], mesh_vertices[v3])
+
+    int_mesh.analyze_mesh(remove_degenerate_triangles=False)
+
+    return int_mesh
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def retained(func, *args):
+    '''
+        Returns the result of func along with the memory (in MB) it keeps allocated
+    '''
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current / (1024. * 1024.)
+
+
+def run(triangle_counts):
+    try:
+        import pywim
+    except ImportError:
+        pywim = None
+
+    print("{:>10} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "triangles", "per-element", "pywim mesh", "analysis", "compact", "pywim MB", "compact MB"
+    ))
+
+    for count in triangle_counts:
+        verts = makeTestMesh(count)
+
+        analyzed, analysis_time = timed(MeshUtils.analyzeMesh, verts, None)
+        _, compact_time = timed(CompactMesh.fromAnalyzedMesh, analyzed)
+
+        # The analyzed arrays are handed over to the CompactMesh, so they count towards its memory
+        compact_mb = retained(lambda: CompactMesh.fromAnalyzedMesh(MeshUtils.analyzeMesh(verts)))[1]
+
+        if pywim:
+            _, per_element_time = timed(perElementInteractiveMesh, verts)
+            _, pywim_time = timed(pywimInteractiveMesh, analyzed["vertices"], analyzed["triangles"])
+            pywim_mb = retained(pywimInteractiveMesh, analyzed["vertices"], analyzed["triangles"])[1]
+            pywim_columns = "{:>11.3f}s {:>11.3f}s".format(per_element_time, pywim_time)
+            pywim_memory = "{:>12.1f}".format(pywim_mb)
+        else:
+            pywim_columns = "{:>12} {:>12}".format("n/a", "n/a")
+            pywim_memory = "{:>12}".format("n/a")
+
+        print("{:>10} {} {:>11.3f}s {:>11.3f}s {} {:>12.1f}".format(
+            len(analyzed["triangles"]), pywim_columns, analysis_time, compact_time, pywim_memory, compact_mb
+        ))
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+    run(counts)
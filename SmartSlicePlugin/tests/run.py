@@ -52,6 +52,21 @@ class SmartSliceLoads(_SmartSliceTestCase):
         self.assertIsNotNone(path)
 
 from test_API import *
+from test_MeshUtils import *
+from test_MeshAnalysisProcess import *
+from test_BoundingBoxIndex import *
+from test_MeshIntersection import *
+from test_ScenePicker import *
+from test_SmartSliceStage import *
+from test_MaterialDatabase import *
+from test_JobFingerprint import *
+from test_DefinitionDefaults import *
+from test_StreamingPackage import *
+from test_ThreeMFWriter import *
+from test_MeshBlobs import *
+from test_CompactEncoding import *
+from test_RetryPolicy import *
+from test_ConnectivityState import *
 
 if __name__ == "__main__":
     app = cura_app_mock()
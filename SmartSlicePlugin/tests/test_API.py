@@ -36,6 +36,7 @@ class test_API(_SmartSliceTestCase):
         self._api._client._active_connection = True
         self._api._client._subscription = None
         self._api._client._job_test = "finished"
+        self._api.connectivity.invalidate()
 
         self._api._app_preferences.removePreference(self._api._username_preference)
         self._api._app_preferences.addPreference(self._api._username_preference, "old@email.com")
@@ -0,0 +1,40 @@
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_BoundingBoxIndex(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.BoundingBoxIndex import BoundingBoxIndex
+
+        cls.BoundingBoxIndex = BoundingBoxIndex
+
+    def test_query_matches_brute_force(self):
+        random = numpy.random.RandomState(0)
+        lower = random.uniform(0., 100., (200, 3))
+        upper = lower + random.uniform(0., 10., (200, 3))
+
+        index = self.BoundingBoxIndex()
+        for i in range(len(lower)):
+            index.update(i, lower[i], upper[i])
+
+        for i in range(len(lower)):
+            expected = numpy.flatnonzero(numpy.all(upper >= lower[i], axis=1) & numpy.all(lower <= upper[i], axis=1))
+            expected = sorted(set(expected.tolist()) - {i})
+            self.assertEqual(sorted(index.overlapping(i)), expected)
+
+    def test_move_and_remove(self):
+        index = self.BoundingBoxIndex()
+        index.update("part", (0., 0., 0.), (10., 10., 10.))
+        index.update("modifier", (20., 0., 0.), (30., 10., 10.))
+        index.update("other", (5., 5., 5.), (6., 6., 6.))
+
+        self.assertEqual(sorted(index.overlapping("part")), ["other"])
+
+        index.update("modifier", (8., 0., 0.), (18., 10., 10.))
+        self.assertEqual(sorted(index.overlapping("part")), ["modifier", "other"])
+
+        index.remove("other")
+        self.assertEqual(index.overlapping("part"), ["modifier"])
+        self.assertEqual(index.query((100., 100., 100.), (101., 101., 101.)), [])
+        self.assertEqual(len(index), 2)
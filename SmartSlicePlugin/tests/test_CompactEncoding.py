@@ -0,0 +1,67 @@
+import json
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_CompactEncoding(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import CompactEncoding
+
+        cls.CompactEncoding = CompactEncoding
+
+    def _result(self):
+        return {
+            "analyses": [{
+                "structural": {"min_safety_factor": 2.5, "max_displacement": 0.1234567890123},
+                "modifier_meshes": [{
+                    "name": "modifier",
+                    "transform": [[1.0, 0.0, 0.0, 10.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]],
+                    "vertices": [{"id": i, "x": i * 0.5, "y": i * 0.1, "z": -1.0} for i in range(100)],
+                    "triangles": [{"id": i, "v1": i, "v2": i + 1, "v3": 2 ** 40} for i in range(50)],
+                    "flags": [True] * 10,
+                    "mixed": [1, 2.0] * 10
+                }]
+            }],
+            "empty": [],
+            "text": "Smart Slice"
+        }
+
+    def test_roundtrip(self):
+        result = self._result()
+
+        encoded = self.CompactEncoding.encode(result)
+        decoded = self.CompactEncoding.decode(encoded)
+
+        self.assertEqual(decoded, result)
+        self.assertEqual(json.dumps(decoded), json.dumps(result))
+        self.assertLess(len(encoded), len(json.dumps(result)) / 2)
+
+        # Types are kept exactly
+        mesh = decoded["analyses"][0]["modifier_meshes"][0]
+        self.assertIs(type(mesh["vertices"][2]["z"]), float)
+        self.assertIs(type(mesh["triangles"][0]["v3"]), int)
+        self.assertIs(type(mesh["flags"][0]), bool)
+        self.assertIs(type(mesh["mixed"][0]), int)
+
+    def test_storage(self):
+        result = self._result()
+
+        stored = self.CompactEncoding.encodeForStorage(result)
+        self.assertEqual(json.loads(json.dumps(stored)), stored)
+        self.assertEqual(self.CompactEncoding.decodeFromStorage(stored), result)
+
+        # Anything else was stored as plain JSON before
+        self.assertEqual(self.CompactEncoding.decodeFromStorage(result), result)
+        self.assertIsNone(self.CompactEncoding.decodeFromStorage(None))
+
+        with self.assertRaises(ValueError):
+            self.CompactEncoding.decode(json.dumps(result).encode())
+
+    def test_accepted_by(self):
+        encoding = self.CompactEncoding.STORAGE_ENCODING
+
+        self.assertTrue(self.CompactEncoding.acceptedBy({"job_encodings": ["json", encoding]}))
+        self.assertFalse(self.CompactEncoding.acceptedBy({"job_encodings": ["json"]}))
+        self.assertFalse(self.CompactEncoding.acceptedBy({"version": "20.0"}))
+        self.assertFalse(self.CompactEncoding.acceptedBy({"job_encodings": encoding}))
+        self.assertFalse(self.CompactEncoding.acceptedBy(None))
@@ -0,0 +1,81 @@
+import threading
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+class test_ConnectivityState(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.ConnectivityState import ConnectivityState
+
+        cls.ConnectivityState = ConnectivityState
+
+    def test_ttl(self):
+        clock = _Clock()
+        connected = [True]
+        state = self.ConnectivityState(lambda: connected[0], ttl=5., failure_ttl=1., clock=clock)
+
+        self.assertTrue(state.check())
+        clock.now = 4.
+        self.assertTrue(state.check())
+        self.assertEqual(state.probes, 1)
+
+        # Calls that went through keep the state fresh, without probing
+        for _ in range(10):
+            clock.now += 4.
+            state.reportSuccess()
+            self.assertTrue(state.check())
+        self.assertEqual(state.probes, 1)
+
+        # A failed call makes the next check probe again, failures are kept for a shorter time
+        connected[0] = False
+        state.reportFailure()
+        self.assertFalse(state.check())
+        self.assertFalse(state.check())
+        self.assertEqual(state.probes, 2)
+
+        connected[0] = True
+        clock.now += 1.
+        self.assertTrue(state.check())
+        self.assertEqual(state.stats(), {"probes": 3, "cached": 12, "shared": 0})
+
+    def test_single_probe(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def probe():
+            started.set()
+            release.wait()
+            return True
+
+        state = self.ConnectivityState(probe)
+        results = []
+
+        first = threading.Thread(target=lambda: results.append(state.check()))
+        first.start()
+        started.wait()
+
+        others = [threading.Thread(target=lambda: results.append(state.check())) for _ in range(4)]
+        for t in others:
+            t.start()
+
+        release.set()
+        for t in [first] + others:
+            t.join()
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(state.probes, 1)
+        self.assertEqual(state.probes + state.shared + state.cached, 5)
+
+    def test_probe_error(self):
+        def probe():
+            raise Exception("No connection")
+
+        state = self.ConnectivityState(probe)
+        self.assertFalse(state.check())
@@ -0,0 +1,59 @@
+import json
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_DefinitionDefaults(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.DefinitionDefaults import DefinitionDefaults
+
+        cls.DefinitionDefaults = DefinitionDefaults
+
+    def _definition(self, definition_id, settings):
+        from UM.Settings.DefinitionContainer import DefinitionContainer
+
+        definition = DefinitionContainer(definition_id)
+        definition.deserialize(json.dumps({
+            "version": DefinitionContainer.Version,
+            "name": definition_id,
+            "metadata": {},
+            "settings": {
+                "category": {"label": "Category", "description": "", "type": "category", "children": settings}
+            }
+        }))
+        return definition
+
+    def _setting(self, default_value, value=None):
+        setting = {"label": "Setting", "description": "", "type": "float", "default_value": default_value}
+        if value is not None:
+            setting["value"] = value
+        return setting
+
+    def test_constant_defaults_only(self):
+        from UM.Settings.ContainerStack import ContainerStack
+
+        global_stack = ContainerStack("global")
+        global_stack.addContainer(self._definition("machine", {
+            "layer_height": self._setting(0.1),
+            "wall_thickness": self._setting(0.8, "layer_height * 8"),
+            "infill_line_distance": self._setting(6.0, "extruderValue(0, 'layer_height') * 60")
+        }))
+
+        extruder_stack = ContainerStack("extruder")
+        extruder_stack.addContainer(self._definition("machine_extruder", {
+            "machine_nozzle_size": self._setting(0.4)
+        }))
+        extruder_stack.setNextStack(global_stack)
+
+        definition_defaults = self.DefinitionDefaults()
+        defaults, fingerprint = definition_defaults.defaults(extruder_stack)
+
+        self.assertEqual(definition_defaults.definitionIds(extruder_stack), ("machine_extruder", "machine"))
+        self.assertEqual(defaults.get("machine_nozzle_size"), "0.4")
+        self.assertEqual(defaults.get("layer_height"), "0.1")
+
+        # Value functions depend on the live stacks, they are always sent
+        self.assertNotIn("wall_thickness", defaults)
+        self.assertNotIn("infill_line_distance", defaults)
+
+        self.assertEqual(definition_defaults.defaults(extruder_stack), (defaults, fingerprint))
@@ -0,0 +1,69 @@
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_JobFingerprint(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.JobFingerprint import JobFingerprint
+
+        cls.JobFingerprint = JobFingerprint
+
+    def _node(self):
+        from UM.Mesh.MeshData import MeshData
+        from UM.Scene.SceneNode import SceneNode
+
+        vertices = numpy.array([[0., 0., 0.], [1., 0., 0.], [0., 1., 0.], [0., 0., 1.]], dtype=numpy.float32)
+        indices = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]], dtype=numpy.int32)
+
+        node = SceneNode()
+        node.setMeshData(MeshData(vertices=vertices, indices=indices))
+        return node
+
+    def test_fingerprint(self):
+        from UM.Math.Vector import Vector
+
+        fingerprints = self.JobFingerprint()
+        node = self._node()
+        job = {"type": 1, "chop": {"slicer": {"infill": "grid", "layer_height": "0.2"}}}
+
+        first = fingerprints.fingerprint(job, [node])
+
+        # Key order doesn't matter, and the mesh isn't hashed again
+        reordered = {"chop": {"slicer": {"layer_height": "0.2", "infill": "grid"}}, "type": 1}
+        self.assertEqual(fingerprints.fingerprint(reordered, [node]), first)
+        self.assertEqual(fingerprints.fingerprint(job, [self._node()]), first)
+        self.assertEqual(fingerprints.mesh_hashes, 2)
+
+        self.assertNotEqual(fingerprints.fingerprint(dict(job, type=2), [node]), first)
+
+        node.setPosition(Vector(10., 0., 0.))
+        self.assertNotEqual(fingerprints.fingerprint(job, [node]), first)
+        self.assertEqual(fingerprints.mesh_hashes, 2)
+
+    def test_gcode_time_tokens(self):
+        from SmartSlicePlugin.SmartSliceJobHandler import SmartSliceJobHandler
+
+        fingerprints = self.JobFingerprint()
+        node = self._node()
+        gcode = ";Generated {date} {time}\nM104 S{material_print_temperature}"
+
+        def build(time):
+            settings = {"-1": {"time": time, "date": "18-10-2026", "day": "Sun", "material_print_temperature": 200}}
+            expanded, stable = SmartSliceJobHandler.expandGcode(gcode, settings, 0)
+            job = {"chop": {"slicer": {"print_config": {"auxiliary": {"machine_start_gcode": expanded}}}}}
+            return job, {expanded: stable}
+
+        first, first_stable = build("10:00:00")
+        later, later_stable = build("10:00:05")
+
+        self.assertNotEqual(first, later)
+        self.assertIn("M104 S200", first_stable[next(iter(first_stable))])
+        self.assertIn("<time>", later_stable[next(iter(later_stable))])
+
+        # Building the same job again later doesn't change the fingerprint
+        self.assertEqual(
+            fingerprints.fingerprint(first, [node], first_stable),
+            fingerprints.fingerprint(later, [node], later_stable)
+        )
+        self.assertNotEqual(fingerprints.fingerprint(first, [node]), fingerprints.fingerprint(later, [node]))
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_MaterialDatabase(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.MaterialDatabase import MaterialDatabase
+
+        cls.MaterialDatabase = MaterialDatabase
+
+    def _write(self, path, materials, mtime):
+        with open(path, "w") as database_file:
+            json.dump({"materials": materials}, database_file)
+        os.utime(path, (mtime, mtime))
+
+    def test_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "materials.json")
+            self._write(path, [
+                {"name": "PLA", "cura-tested-guid": ["a"], "cura-generic-guid": ["b"]},
+                {"name": "ABS", "cura-tested-guid": ["b", "c"], "cura-generic-guid": []},
+            ], 1000)
+
+            database = self.MaterialDatabase(path)
+
+            material, tested = database.lookup("a")
+            self.assertEqual((material["name"], tested), ("PLA", True))
+
+            # The first material listing a GUID is used
+            material, tested = database.lookup("b")
+            self.assertEqual((material["name"], tested), ("PLA", False))
+
+            self.assertEqual(database.lookup("unknown"), (None, False))
+
+            found = database.lookupMany(["a", "c", "unknown"])
+            self.assertEqual(found["c"][0]["name"], "ABS")
+            self.assertIsNone(found["unknown"][0])
+
+            self.assertEqual(database.loads, 1)
+
+    def test_reload_when_modified(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "materials.json")
+            self._write(path, [{"name": "PLA", "cura-tested-guid": ["a"]}], 1000)
+
+            database = self.MaterialDatabase(path)
+            self.assertIsNotNone(database.lookup("a")[0])
+
+            self._write(path, [{"name": "PETG", "cura-tested-guid": ["d"]}], 2000)
+
+            self.assertIsNone(database.lookup("a")[0])
+            self.assertEqual(database.lookup("d")[0]["name"], "PETG")
+            self.assertEqual(database.loads, 2)
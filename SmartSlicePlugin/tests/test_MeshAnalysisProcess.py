@@ -0,0 +1,51 @@
+from unittest import mock
+
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+from test_MeshUtils import SOUP
+
+class test_MeshAnalysisProcess(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import MeshUtils
+        from SmartSlicePlugin.utils.MeshAnalysisProcess import MeshAnalysisProcess
+
+        cls.MeshUtils = MeshUtils
+        cls.MeshAnalysisProcess = MeshAnalysisProcess
+
+    def tearDown(self):
+        self.MeshAnalysisProcess._unavailable = False
+
+    def _assertAnalysis(self, result):
+        expected = self.MeshUtils.analyzeMesh(SOUP)
+        self.assertEqual(set(result), set(expected))
+        for key in expected:
+            numpy.testing.assert_array_equal(result[key], expected[key])
+
+    def test_analyze_in_child(self):
+        process = self.MeshAnalysisProcess()
+        progress = []
+
+        self._assertAnalysis(process.analyze(SOUP, None, progress.append))
+
+        self.assertIsNone(process.fallback_reason)
+        self.assertEqual(process._process.exitcode, 0)
+        self.assertEqual(progress[-1], 1.)
+
+    def test_falls_back_when_the_child_cannot_start(self):
+        process = self.MeshAnalysisProcess()
+
+        with mock.patch.object(self.MeshAnalysisProcess, "_start", side_effect=OSError("no processes")):
+            self._assertAnalysis(process.analyze(SOUP, None))
+
+        self.assertEqual(process.fallback_reason, "no processes")
+        self.assertFalse(self.MeshAnalysisProcess.isAvailable())
+
+    def test_cancel(self):
+        process = self.MeshAnalysisProcess()
+        process.cancel()
+
+        with self.assertRaises(self.MeshAnalysisProcess.Canceled):
+            process.analyze(SOUP, None)
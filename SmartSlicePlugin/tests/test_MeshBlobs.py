@@ -0,0 +1,109 @@
+import http.server
+import io
+import json
+import threading
+import zipfile
+
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class _BlobHandler(http.server.BaseHTTPRequestHandler):
+    # Stand-in for the blob endpoint of the Smart Slice API
+    def _key(self):
+        prefix = "/smartslice/blobs/"
+        if not self.path.startswith(prefix):
+            return None
+        return self.path[len(prefix):]
+
+    def _respond(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", self._key()))
+
+        if self.headers.get("Authorization") != "Bearer token":
+            self._respond(401)
+        else:
+            self._respond(200 if self._key() in self.server.blobs else 404)
+
+    def do_PUT(self):
+        self.server.requests.append(("PUT", self._key()))
+
+        self.server.blobs[self._key()] = self.rfile.read(int(self.headers["Content-Length"]))
+        self._respond(201)
+
+    def log_message(self, *args):
+        pass
+
+class test_MeshBlobs(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import MeshBlobs
+        from SmartSlicePlugin.utils.ThreeMFWriter import ThreeMFObject
+
+        cls.MeshBlobs = MeshBlobs
+        cls.ThreeMFObject = ThreeMFObject
+
+    def setUp(self):
+        self._server = http.server.HTTPServer(("127.0.0.1", 0), _BlobHandler)
+        self._server.blobs = {}
+        self._server.requests = []
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+        self._address = "http://{}:{}".format(*self._server.server_address)
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _objects(self, transformation):
+        vertices = numpy.random.RandomState(0).uniform(0., 100., (30000, 3)).astype(numpy.float32)
+        return [
+            self.ThreeMFObject("part", vertices, transformation=transformation),
+            self.ThreeMFObject("modifier", vertices[:300], settings={"infill_mesh": "True"})
+        ]
+
+    def test_resubmission_skips_meshes(self):
+        store = self.MeshBlobs.MeshBlobStore(self._address, "token")
+
+        objects = self._objects(numpy.identity(4))
+        uploaded = store.ensure(objects)
+
+        self.assertEqual(len(uploaded), 2)
+        self.assertEqual(set(uploaded), set(self._server.blobs))
+        self.assertGreater(store.uploaded_bytes, 100000)
+
+        with zipfile.ZipFile(io.BytesIO(self._server.blobs[self.MeshBlobs.blobKey(objects[0])])) as blob:
+            self.assertIn("3D/3dmodel.model", blob.namelist())
+
+        # Moving the part only changes the reference package, and the store remembers the blobs
+        transformation = numpy.identity(4)
+        transformation[:3, 3] = (5., 0., 0.)
+        moved = self._objects(transformation)
+
+        request_count = len(self._server.requests)
+        self.assertEqual(store.ensure(moved), [])
+        self.assertEqual(len(self._server.requests), request_count)
+
+        package = io.BytesIO()
+        self.MeshBlobs.writeReferencePackage(package, moved, {"SmartSlice/job.json": "{}"})
+        self.assertLess(len(package.getvalue()), 2048)
+
+        with zipfile.ZipFile(io.BytesIO(package.getvalue())) as archive:
+            meshes = json.loads(archive.read(self.MeshBlobs.MESHES_PATH))["meshes"]
+
+        self.assertEqual([m["blob"] for m in meshes], uploaded)
+        self.assertEqual(meshes[0]["transform"].split()[9:], ["5.0", "0.0", "0.0"])
+        self.assertEqual(meshes[1]["settings"], {"infill_mesh": "True"})
+
+        # A new store asks the server
+        self.assertEqual(self.MeshBlobs.MeshBlobStore(self._address, "token").ensure(moved), [])
+        self.assertEqual(self._server.requests[-1][0], "HEAD")
+
+    def test_errors(self):
+        with self.assertRaises(ConnectionError):
+            self.MeshBlobs.MeshBlobStore(self._address, "wrong").exists("key")
@@ -0,0 +1,50 @@
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+def cube(corner, size):
+    vertices = numpy.array([[x, y, z] for x in (0., 1.) for y in (0., 1.) for z in (0., 1.)]) * size + corner
+    faces = numpy.array([
+        (0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1),
+        (2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)
+    ])
+    return vertices[faces]
+
+class test_MeshIntersection(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import MeshIntersection
+
+        cls.MeshIntersection = MeshIntersection
+
+    def test_meshes_intersect(self):
+        part = cube(numpy.zeros(3), 10.)
+
+        self.assertTrue(self.MeshIntersection.meshesIntersect(part, cube(numpy.array([5., 5., 5.]), 10.)))
+        self.assertTrue(self.MeshIntersection.meshesIntersect(part, cube(numpy.array([10., 0., 0.]), 10.)))
+        self.assertFalse(self.MeshIntersection.meshesIntersect(part, cube(numpy.array([20., 0., 0.]), 10.)))
+
+    def test_contained_meshes_intersect(self):
+        part = cube(numpy.zeros(3), 10.)
+        modifier = cube(numpy.array([2., 2., 2.]), 3.)
+
+        self.assertTrue(self.MeshIntersection.meshesIntersect(part, modifier))
+        self.assertTrue(self.MeshIntersection.meshesIntersect(modifier, part))
+
+    def test_candidate_pairs_match_all_pairs(self):
+        random = numpy.random.RandomState(0)
+        a = random.uniform(0., 10., (60, 3, 3))
+        b = random.uniform(0., 10., (50, 3, 3))
+
+        ia, ib = numpy.meshgrid(numpy.arange(len(a)), numpy.arange(len(b)), indexing='ij')
+        ia, ib = ia.reshape(-1), ib.reshape(-1)
+        hits = self.MeshIntersection.trianglesIntersect(a[ia], b[ib])
+        expected = set(zip(ia[hits].tolist(), ib[hits].tolist()))
+
+        found = set()
+        boxes = self.MeshIntersection.triangleBoxes(a) + self.MeshIntersection.triangleBoxes(b)
+        for pairs_a, pairs_b in self.MeshIntersection.candidatePairs(*boxes, chunk_size=100):
+            hits = self.MeshIntersection.trianglesIntersect(a[pairs_a], b[pairs_b])
+            found.update(zip(pairs_a[hits].tolist(), pairs_b[hits].tolist()))
+
+        self.assertEqual(found, expected)
@@ -0,0 +1,224 @@
+import os
+import tempfile
+
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+# Two triangles sharing an edge plus a third one hanging off of the first,
+# written as a triangle soup like Cura does for STL files
+SOUP = numpy.array([
+    [0., 0., 0.], [1., 0., 0.], [0., 1., 0.],
+    [1., 0., 0.], [1., 1., 0.], [0., 1., 0.],
+    [-0., 0., 0.], [0., 0., 1.], [1., 0., 0.],
+], dtype=numpy.float32)
+
+def revolvedSoup(profile, segments: int) -> numpy.ndarray:
+    # Revolves the closed (r, z) profile (counterclockwise) around the z axis, one quad per profile edge and segment
+    angles = numpy.linspace(0., 2. * numpy.pi, segments + 1)
+    rings = numpy.stack([
+        numpy.stack((r * numpy.cos(angles), r * numpy.sin(angles), numpy.full(segments + 1, z)), axis=1)
+        for r, z in profile
+    ]).astype(numpy.float32)
+    rings[:, -1] = rings[:, 0]
+
+    triangles = []
+    for i in range(len(profile)):
+        j = (i + 1) % len(profile)
+        for k in range(segments):
+            triangles.append((rings[i, k], rings[j, k + 1], rings[j, k]))
+            triangles.append((rings[i, k], rings[i, k + 1], rings[j, k + 1]))
+
+    return numpy.array(triangles, dtype=numpy.float32).reshape(-1, 3)
+
+class test_MeshUtils(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import MeshUtils
+        from SmartSlicePlugin.utils.MeshCache import MeshCache
+        from SmartSlicePlugin.utils.CompactMesh import CompactMesh
+
+        cls.MeshUtils = MeshUtils
+        cls.MeshCache = MeshCache
+        cls.CompactMesh = CompactMesh
+
+    def test_mesh_arrays_welds_vertices(self):
+        vertices, triangles = self.MeshUtils.meshArrays(SOUP)
+
+        self.assertEqual(len(vertices), 5)
+        self.assertEqual(triangles.shape, (3, 3))
+        numpy.testing.assert_array_equal(vertices[triangles].reshape(-1, 3), SOUP)
+
+    def test_mesh_arrays_indexed(self):
+        indices = numpy.array([[0, 1, 2], [1, 4, 2]], dtype=numpy.int32)
+        vertices, triangles = self.MeshUtils.meshArrays(SOUP, indices)
+
+        numpy.testing.assert_array_equal(vertices[triangles], SOUP[indices])
+
+    def test_triangle_adjacency(self):
+        _, triangles = self.MeshUtils.meshArrays(SOUP)
+        offsets, neighbors = self.MeshUtils.triangleAdjacency(triangles)
+
+        self.assertEqual(offsets.tolist(), [0, 2, 3, 4])
+        self.assertEqual(sorted(neighbors[offsets[0]:offsets[1]].tolist()), [1, 2])
+        self.assertEqual(neighbors[offsets[1]:offsets[2]].tolist(), [0])
+        self.assertEqual(neighbors[offsets[2]:offsets[3]].tolist(), [0])
+
+    def test_segment_regions(self):
+        analyzed = self.MeshUtils.analyzeMesh(SOUP)
+        regions = self.MeshUtils.FaceRegions(
+            analyzed["planar_regions"], analyzed["concave_regions"], analyzed["convex_regions"]
+        )
+
+        # The third triangle is at a right angle to the other two
+        self.assertEqual(sorted(regions.planar(1).tolist()), [0, 1])
+        self.assertEqual(regions.planar(2).tolist(), [2])
+        self.assertEqual(regions.convexSize(0), 2)
+        self.assertEqual(regions.concaveSize(2), 1)
+
+    def test_segment_filleted_plate(self):
+        # A round 40 mm plate with a 10 mm hole and a 2 mm fillet around the top edge
+        fillet = [(18. + 2. * numpy.cos(a), 4. + 2. * numpy.sin(a)) for a in numpy.linspace(0., numpy.pi / 2., 5)]
+        profile = [(5., 0.), (20., 0.)] + fillet + [(5., 6.)]
+        segments = 32
+
+        analyzed = self.MeshUtils.analyzeMesh(revolvedSoup(profile, segments))
+        regions = self.MeshUtils.FaceRegions(
+            analyzed["planar_regions"], analyzed["concave_regions"], analyzed["convex_regions"]
+        )
+
+        # Every profile edge is revolved into 2 * segments triangles
+        def band(edge):
+            return list(range(2 * segments * edge, 2 * segments * (edge + 1)))
+
+        bottom, wall, top, hole = band(0), band(1), band(6), band(7)
+        fillet = sum((band(edge) for edge in range(2, 6)), [])
+
+        self.assertEqual(sorted(regions.planar(top[0]).tolist()), top)
+        self.assertEqual(sorted(regions.convex(top[0]).tolist()), top)
+        self.assertEqual(sorted(regions.concave(hole[0]).tolist()), hole)
+
+        # The fillet doesn't swallow the top face, nor the bottom across the wall
+        fillet_region = set(regions.convex(fillet[0]).tolist())
+        self.assertTrue(set(fillet).issubset(fillet_region))
+        self.assertFalse(fillet_region.intersection(top + bottom))
+        self.assertEqual(sorted(regions.convex(bottom[0]).tolist()), bottom)
+
+    def test_planar_regions_do_not_drift(self):
+        # A strip bending by half the planar tolerance at every edge
+        angles = 0.5 * self.MeshUtils.PLANAR_ANGLE_TOLERANCE * numpy.arange(41)
+        profile = numpy.concatenate(([[0., 0.]], numpy.cumsum(numpy.stack((numpy.cos(angles), numpy.sin(angles)), axis=1), axis=0)))
+        soup = numpy.array([
+            [[x0, 0., z0], [x1, 0., z1], [x1, 1., z1], [x0, 0., z0], [x1, 1., z1], [x0, 1., z0]]
+            for (x0, z0), (x1, z1) in zip(profile[:-1], profile[1:])
+        ], dtype=numpy.float32).reshape(-1, 3)
+
+        analyzed = self.MeshUtils.analyzeMesh(soup)
+        normals = analyzed["normals"].astype(numpy.float64)
+        planar_regions = analyzed["planar_regions"]
+
+        self.assertGreater(planar_regions.max(), 0)
+        for region in range(planar_regions.max() + 1):
+            region_normals = normals[planar_regions == region]
+            cosines = region_normals.dot(region_normals.T)
+            self.assertGreaterEqual(cosines.min(), numpy.cos(2. * self.MeshUtils.PLANAR_ANGLE_TOLERANCE) - 1.e-9)
+
+        # It still is one curved surface
+        self.assertEqual(len(numpy.unique(analyzed["concave_regions"])), 1)
+
+    def test_compact_mesh_faces(self):
+        mesh = self.CompactMesh.fromAnalyzedMesh(self.MeshUtils.analyzeMesh(SOUP))
+
+        face = mesh.select_planar_face(0)
+        self.assertEqual(sorted(t.id for t in face.triangles), [0, 1])
+        self.assertEqual(face, mesh.face_from_ids(face.triangle_ids))
+        self.assertEqual(mesh.face_from_ids([2, 5]).triangle_ids.tolist(), [2])
+
+        axis = face.planar_axis()
+        self.assertAlmostEqual(axis.t, 1.)
+        self.assertAlmostEqual(axis.origin.z, 0.)
+
+        self.assertIsNone(face.rotation_axis())
+
+    def test_compact_mesh_pick(self):
+        mesh = self.CompactMesh.fromAnalyzedMesh(self.MeshUtils.analyzeMesh(SOUP))
+
+        self.assertEqual(mesh.pick((0.2, 0.2, 1.), (0., 0., -1.)), 0)
+        self.assertEqual(mesh.pick((0.8, 0.8, -1.), (0., 0., 1.)), 1)
+        self.assertEqual(mesh.pick((0.5, 1., 0.2), (0., -1., 0.)), 2)
+        self.assertIsNone(mesh.pick((2., 2., 1.), (0., 0., -1.)))
+        self.assertIsNone(mesh.pick((0.2, 0.2, 1.), (0., 0., 1.)))
+
+    def test_proxy_mesh_maps_to_original_ids(self):
+        # A flat 20 x 20 grid, decimated to about 50 triangles
+        x, y = numpy.meshgrid(numpy.arange(21.), numpy.arange(21.))
+        grid = numpy.stack((x, y, numpy.zeros_like(x)), axis=2).astype(numpy.float32)
+        lower = numpy.stack((grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:]), axis=2)
+        upper = numpy.stack((grid[:-1, :-1], grid[1:, 1:], grid[1:, :-1]), axis=2)
+        soup = numpy.concatenate((lower.reshape(-1, 3), upper.reshape(-1, 3)))
+
+        analyzed = self.MeshUtils.analyzeMesh(soup, proxy_triangles=50)
+        mesh = self.CompactMesh.fromAnalyzedMesh(analyzed)
+
+        self.assertTrue(mesh.is_proxy)
+        self.assertLess(mesh.triangle_count, 800)
+        self.assertEqual(len(mesh.proxy_of), 800)
+
+        face = mesh.select_planar_face(mesh.proxyTriangle(123))
+        self.assertEqual(face.original_ids.tolist(), list(range(800)))
+
+        saved = mesh.face_from_ids([5, 6, 7])
+        self.assertEqual(saved.original_ids.tolist(), [5, 6, 7])
+
+    def test_mesh_cache_hit_and_miss(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = self.MeshCache(directory)
+            key = cache.key(SOUP, None)
+
+            self.assertIsNone(cache.load(key))
+
+            cache.store(key, self.MeshUtils.analyzeMesh(SOUP))
+            arrays = cache.load(key)
+
+            self.assertIsNotNone(arrays)
+            self.assertEqual(len(arrays["vertices"]), 5)
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(cache.misses, 1)
+
+    def test_mesh_cache_corrupt_entry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = self.MeshCache(directory)
+            key = cache.key(SOUP, None)
+            path = os.path.join(directory, key + cache.EXTENSION)
+
+            cache.store(key, self.MeshUtils.analyzeMesh(SOUP))
+            with open(path, "rb") as f:
+                data = f.read()
+
+            for corrupt in (data[:len(data) // 2], b"\0" * len(data), data.replace(b"vertices.npy", b"vertices.npz", 1)):
+                with open(path, "wb") as f:
+                    f.write(corrupt)
+
+                self.assertIsNone(cache.load(key))
+                self.assertFalse(os.path.exists(path))
+
+            self.assertEqual(cache.misses, 3)
+            self.assertEqual(cache.hits, 0)
+
+            cache.store(key, self.MeshUtils.analyzeMesh(SOUP))
+            self.assertIsNotNone(cache.load(key))
+
+    def test_mesh_cache_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = self.MeshCache(directory, max_bytes=1)
+
+            first = cache.key(SOUP, None)
+            second = cache.key(SOUP[::-1].copy(), None)
+
+            cache.store(first, self.MeshUtils.analyzeMesh(SOUP))
+            os.utime(os.path.join(directory, first + cache.EXTENSION), (0, 0))
+            cache.store(second, self.MeshUtils.analyzeMesh(SOUP))
+
+            self.assertIsNone(cache.load(first))
+            self.assertIsNotNone(cache.load(second))
+            self.assertEqual(cache.evictions, 1)
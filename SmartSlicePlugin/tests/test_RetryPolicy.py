@@ -0,0 +1,82 @@
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+class test_RetryPolicy(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.RetryPolicy import RetryPolicy
+
+        cls.RetryPolicy = RetryPolicy
+
+    def _delays(self, backoff, clock):
+        delays = []
+        while True:
+            delay = backoff.nextDelay()
+            if delay is None:
+                return delays
+            delays.append(delay)
+            clock.now += delay
+
+    def test_exponential_backoff(self):
+        clock = _Clock()
+        policy = self.RetryPolicy(
+            "test", max_attempts=6, initial_delay=1., max_delay=5., jitter=0.5, deadline=None,
+            clock=clock, random_fraction=lambda: 0.
+        )
+
+        self.assertEqual(self._delays(policy.backoff(), clock), [1., 2., 4., 5., 5.])
+
+        # Jitter takes off up to half of the delay
+        policy._random_fraction = lambda: 1.
+        self.assertEqual(self._delays(policy.backoff(), clock), [0.5, 1., 2., 2.5, 2.5])
+
+        self.assertEqual(policy.stats(), {"calls": 2, "retries": 10, "failures": 2, "backoff_time": 25.5})
+
+    def test_deadline(self):
+        clock = _Clock()
+        policy = self.RetryPolicy(
+            "test", max_attempts=100, initial_delay=1., max_delay=4., jitter=0., deadline=10., clock=clock
+        )
+
+        # 1 + 2 + 4 = 7 seconds, another 4 would end after the deadline
+        self.assertEqual(self._delays(policy.backoff(), clock), [1., 2., 4.])
+
+        backoff = policy.backoff()
+        self.assertEqual(backoff.nextDelay(), 1.)
+        backoff.succeeded()
+
+        self.assertEqual(policy.stats()["calls"], 2)
+        self.assertEqual(policy.stats()["failures"], 1)
+        self.assertEqual(policy.stats()["retries"], 4)
+
+    def test_deadline_counts_from_failure(self):
+        clock = _Clock()
+        policy = self.RetryPolicy(
+            "test", max_attempts=4, initial_delay=1., max_delay=4., jitter=0., deadline=10., clock=clock
+        )
+
+        # A long poll fails after running for longer than the deadline, it is still retried
+        backoff = policy.backoff()
+        clock.now += 300.
+        self.assertEqual(backoff.nextDelay(), 1.)
+        clock.now += 1.
+
+        # The retry polls for a few more minutes before the connection drops again, the retries start over
+        clock.now += 200.
+        self.assertEqual(self._delays(backoff, clock), [1., 2., 4.])
+        self.assertEqual(backoff.retries, 4)
+
+        # Failing quickly again and again runs into the deadline
+        backoff = policy.backoff()
+        clock.now += 300.
+        self.assertEqual(backoff.nextDelay(), 1.)
+        clock.now += 1. + 6.
+        self.assertEqual(backoff.nextDelay(), 2.)
+        clock.now += 2.
+        self.assertIsNone(backoff.nextDelay())
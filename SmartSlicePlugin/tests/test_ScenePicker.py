@@ -0,0 +1,90 @@
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class test_ScenePicker(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.ScenePicker import ScenePicker
+
+        cls.ScenePicker = ScenePicker
+
+    def _cube(self, x, z):
+        from UM.Math.Vector import Vector
+        from UM.Mesh.MeshData import MeshData
+        from UM.Scene.SceneNode import SceneNode
+
+        # A 10 mm cube around the origin, moved to (x, 0, z)
+        vertices = numpy.array(
+            [[i, j, k] for i in (-5., 5.) for j in (-5., 5.) for k in (-5., 5.)], dtype=numpy.float32
+        )
+        indices = numpy.array([
+            [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],
+            [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],
+            [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]
+        ], dtype=numpy.int32)
+
+        node = SceneNode()
+        node.setMeshData(MeshData(vertices=vertices, indices=indices))
+        node.setPosition(Vector(x, 0., z))
+        return node
+
+    def test_nearest_hit(self):
+        from UM.Math.Vector import Vector
+
+        picker = self.ScenePicker()
+        front = self._cube(0., 20.)
+        back = self._cube(0., 0.)
+        aside = self._cube(100., 20.)
+
+        origin = Vector(0., 0., 100.)
+        direction = Vector(0., 0., -1.)
+
+        node, triangle_id, distance = picker.nearestHit([back, aside, front], origin, direction)
+        self.assertIs(node, front)
+        self.assertAlmostEqual(distance, 75.)
+        self.assertIn(triangle_id, (10, 11))
+
+        # The back cube is behind the front cube's hit, so its box rules it out without a BVH
+        self.assertEqual(picker.bvh_builds, 1)
+
+        # A hit on the back cube at 95 is hidden by the front cube, but not by the one aside
+        self.assertIs(picker.nearestHit([front, aside], origin, direction, 95.)[0], front)
+        self.assertIsNone(picker.nearestHit([aside], origin, direction, 95.)[0])
+        self.assertIsNone(picker.nearestHit([front], origin, direction, 70.)[0])
+
+        # Moving the front cube out of the way uncovers the back cube, the BVH is kept
+        front.setPosition(Vector(50., 0., 20.))
+        node, _, distance = picker.nearestHit([back, front], origin, direction)
+        self.assertIs(node, back)
+        self.assertAlmostEqual(distance, 95.)
+        self.assertEqual(picker.bvh_builds, 2)
+
+    def test_hover_does_not_build(self):
+        from unittest import mock
+
+        from UM.Math.Vector import Vector
+
+        from SmartSlicePlugin.utils.ScenePicker import BuildBVHJob
+
+        picker = self.ScenePicker()
+        front = self._cube(0., 20.)
+
+        origin = Vector(0., 0., 100.)
+        direction = Vector(0., 0., -1.)
+
+        # Without its BVH the cube is skipped, and the BVH is built on a worker instead
+        with mock.patch.object(BuildBVHJob, "start") as start:
+            self.assertIsNone(picker.nearestHit([front], origin, direction, build=False)[0])
+            self.assertEqual(picker.bvh_builds, 0)
+            start.assert_called_once()
+
+            # The build is already underway
+            self.assertIsNone(picker.prepare([front]))
+
+        # Run the job as the worker would
+        BuildBVHJob(picker, [front]).run()
+
+        self.assertIs(picker.nearestHit([front], origin, direction, build=False)[0], front)
+        self.assertEqual(picker.bvh_builds, 1)
+        self.assertIsNone(picker.prepare([front]))
@@ -0,0 +1,117 @@
+from unittest import mock
+
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+from test_MeshIntersection import cube
+
+class test_SmartSliceStage(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from UM.Scene.SceneNodeDecorator import SceneNodeDecorator
+        from UM.Signal import Signal
+
+        from SmartSlicePlugin.stage.SmartSliceStage import SmartSliceStage
+
+        class Stack:
+            propertyChanged = Signal()
+
+            def __init__(self, infill_mesh):
+                self._infill_mesh = infill_mesh
+
+            def getProperty(self, key, property_name):
+                return self._infill_mesh if key == "infill_mesh" else False
+
+        class Decorator(SceneNodeDecorator):
+            def __init__(self, infill_mesh):
+                super().__init__()
+                self._stack = Stack(infill_mesh)
+
+            def isSliceable(self):
+                return True
+
+            def getStack(self):
+                return self._stack
+
+        cls.Decorator = Decorator
+        cls._stage = SmartSliceStage(mock.MagicMock())
+
+    def setUp(self):
+        from cura.CuraApplication import CuraApplication
+
+        self._root = CuraApplication.getInstance().getController().getScene().getRoot()
+        self._nodes = []
+
+    def tearDown(self):
+        for node in self._nodes:
+            node.setParent(None)
+
+    def _node(self, corners, infill_mesh, parent=None):
+        from UM.Mesh.MeshData import MeshData
+        from UM.Scene.SceneNode import SceneNode
+
+        node = SceneNode()
+        node.addDecorator(self.Decorator(infill_mesh))
+        node.setMeshData(MeshData(
+            vertices=corners.reshape(-1, 3).astype(numpy.float32),
+            indices=numpy.arange(len(corners) * 3, dtype=numpy.int32).reshape(-1, 3)
+        ))
+        node.setParent(parent if parent is not None else self._root)
+
+        self._nodes.append(node)
+        return node
+
+    def test_modifier_parents(self):
+        from SmartSlicePlugin.utils.SceneIndex import IntersectionJob
+
+        # Two blocks in one model, the box of the model covers the gap between them
+        part = self._node(numpy.concatenate((cube(numpy.zeros(3), 10.), cube(numpy.array([30., 0., 0.]), 10.))), False)
+
+        # The modifier in the gap was made a child of the part as the boxes overlap
+        outside = self._node(cube(numpy.array([18., 4., 4.]), 2.), True, part)
+        inside = self._node(cube(numpy.array([2., 2., 2.]), 3.), True)
+
+        position = outside.getWorldPosition()
+
+        def run(job):
+            job.run()
+            job.finished.emit(job)
+
+        with mock.patch.object(IntersectionJob, "start", run):
+            self.assertTrue(self._stage._changeParent())
+
+            self.assertIs(outside.getParent(), self._root)
+            self.assertEqual(outside.getWorldPosition(), position)
+            self.assertIs(inside.getParent(), part)
+
+            # Nothing changes once the parents are right
+            self.assertFalse(self._stage._changeParent())
+            self.assertIs(outside.getParent(), self._root)
+
+    def test_separated_modifier_changes_parent(self):
+        from SmartSlicePlugin.utils.SceneIndex import IntersectionJob
+
+        part = self._node(cube(numpy.zeros(3), 10.), False)
+        outside = self._node(cube(numpy.array([12., 4., 4.]), 2.), True, part)
+
+        def run(job):
+            job.run()
+            job.finished.emit(job)
+
+        # Moving the modifier back to the scene changes the job as much as parenting it
+        with mock.patch.object(IntersectionJob, "start", run):
+            self.assertTrue(self._stage._changeParent())
+            self.assertIs(outside.getParent(), self._root)
+
+            self.assertFalse(self._stage._changeParent())
+
+    def test_untested_modifiers_are_not_parented(self):
+        part = self._node(cube(numpy.zeros(3), 10.), False)
+        inside = self._node(cube(numpy.array([2., 2., 2.]), 3.), True)
+
+        # The intersection job hasn't finished, the overlapping boxes are not enough
+        with mock.patch("SmartSlicePlugin.utils.SceneIndex.IntersectionJob.start"):
+            self.assertFalse(self._stage._changeParent())
+
+        self.assertIs(inside.getParent(), self._root)
@@ -0,0 +1,93 @@
+import http.client
+import http.server
+import io
+import os
+import threading
+import zipfile
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+class _UploadHandler(http.server.BaseHTTPRequestHandler):
+    # Stand-in for the Smart Slice API, reading a body with chunked transfer encoding
+    def do_POST(self):
+        self.server.transfer_encoding = self.headers.get("Transfer-Encoding")
+
+        body = bytearray()
+        chunks = 0
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                break
+            body += self.rfile.read(size)
+            self.rfile.readline()
+            chunks += 1
+
+        self.server.body = bytes(body)
+        self.server.chunks = chunks
+
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class test_StreamingPackage(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils.StreamingPackage import StreamingPackage
+
+        cls.StreamingPackage = StreamingPackage
+
+    def setUp(self):
+        self._server = http.server.HTTPServer(("127.0.0.1", 0), _UploadHandler)
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _writeArchive(stream):
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("3D/3dmodel.model", os.urandom(1024 * 1024))
+            archive.writestr("SmartSlice/job.json", b'{"type": 1}')
+
+    def _upload(self, package):
+        connection = http.client.HTTPConnection(*self._server.server_address)
+        try:
+            connection.request("POST", "/smartslice", body=iter(package), encode_chunked=True)
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    def test_upload(self):
+        package = self.StreamingPackage(self._writeArchive, chunk_size=64 * 1024, max_queued_chunks=2)
+
+        self.assertEqual(self._upload(package), 200)
+        self.assertEqual(self._server.transfer_encoding, "chunked")
+        self.assertGreater(self._server.chunks, 1)
+        self.assertEqual(package.size, len(self._server.body))
+
+        with zipfile.ZipFile(io.BytesIO(self._server.body)) as archive:
+            self.assertEqual(archive.read("SmartSlice/job.json"), b'{"type": 1}')
+            self.assertEqual(len(archive.read("3D/3dmodel.model")), 1024 * 1024)
+
+        # The package is written again for a retry
+        self.assertEqual(self._upload(package), 200)
+        self.assertEqual(package.size, len(self._server.body))
+
+    def test_errors_and_cancel(self):
+        def fail(stream):
+            stream.write(b"partial")
+            raise ValueError("writer failed")
+
+        with self.assertRaises(ValueError):
+            list(self.StreamingPackage(fail))
+
+        # Stopping early stops the writer as well
+        chunks = iter(self.StreamingPackage(self._writeArchive, chunk_size=1024, max_queued_chunks=1))
+        next(chunks)
+        chunks.close()
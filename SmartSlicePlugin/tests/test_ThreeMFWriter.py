@@ -0,0 +1,59 @@
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy
+
+from SmartSliceTestCase import _SmartSliceTestCase
+
+_NAMESPACE = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+
+class test_ThreeMFWriter(_SmartSliceTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from SmartSlicePlugin.utils import ThreeMFWriter
+
+        cls.ThreeMFWriter = ThreeMFWriter
+
+    def test_write3mf(self):
+        vertices = numpy.array([[0., 0., 0.], [1., 0., 0.], [0., 1., 0.], [0., 0., 1.5]], dtype=numpy.float32)
+        indices = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]], dtype=numpy.int32)
+
+        transformation = numpy.identity(4)
+        transformation[:3, 3] = (10., 20., 30.)
+
+        objects = [
+            self.ThreeMFWriter.ThreeMFObject("part <1>", vertices, indices, transformation),
+            self.ThreeMFWriter.ThreeMFObject("modifier", vertices[indices].reshape(-1, 3), settings={"infill_mesh": "True"})
+        ]
+
+        stream = io.BytesIO()
+        self.ThreeMFWriter.write3mf(stream, objects, {"SmartSlice/job.json": '{"type": 1}'}, block_size=3)
+
+        with zipfile.ZipFile(io.BytesIO(stream.getvalue())) as archive:
+            self.assertEqual(archive.read("SmartSlice/job.json"), b'{"type": 1}')
+            self.assertIn("[Content_Types].xml", archive.namelist())
+            model = ET.fromstring(archive.read(self.ThreeMFWriter.MODEL_PATH))
+
+        part, modifier = model.findall("m:resources/m:object", _NAMESPACE)
+        self.assertEqual(part.get("name"), "part <1>")
+
+        part_vertices = numpy.array([
+            [float(v.get(axis)) for axis in "xyz"] for v in part.findall("m:mesh/m:vertices/m:vertex", _NAMESPACE)
+        ])
+        part_triangles = numpy.array([
+            [int(t.get(v)) for v in ("v1", "v2", "v3")] for t in part.findall("m:mesh/m:triangles/m:triangle", _NAMESPACE)
+        ])
+        numpy.testing.assert_allclose(part_vertices, vertices)
+        numpy.testing.assert_array_equal(part_triangles, indices)
+
+        # Without indices, every three vertices are a triangle
+        self.assertEqual(len(modifier.findall("m:mesh/m:vertices/m:vertex", _NAMESPACE)), 12)
+        self.assertEqual(modifier.find("m:mesh/m:triangles/m:triangle[4]", _NAMESPACE).get("v3"), "11")
+
+        setting = modifier.find("m:metadatagroup/m:metadata", _NAMESPACE)
+        self.assertEqual((setting.get("name"), setting.text), ("cura:infill_mesh", "True"))
+
+        items = model.findall("m:build/m:item", _NAMESPACE)
+        self.assertEqual(items[0].get("transform").split(), ["1.0", "0.0", "0.0", "0.0", "1.0", "0.0", "0.0", "0.0", "1.0", "10.0", "20.0", "30.0"])
+        self.assertEqual(items[1].get("objectid"), "2")
@@ -0,0 +1,115 @@
+'''
+    Sweep and prune index of axis aligned bounding boxes.
+
+    The boxes are kept in flat arrays, together with their order along the x axis.
+    A query only has to look at the boxes that start before the query box ends
+    (found with a binary search) and tests the other axes on that slice at once.
+    Moving a box only changes its row; the order is sorted again on the next query,
+    which is cheap as it is still nearly sorted.
+'''
+
+from typing import Dict, Hashable, List, Tuple
+
+import numpy
+
+
+class BoundingBoxIndex:
+    def __init__(self):
+        self._keys = []
+        self._rows = {}  # type: Dict[Hashable, int]
+
+        self._lower = numpy.zeros((0, 3))
+        self._upper = numpy.zeros((0, 3))
+
+        # Rows sorted by the lower x coordinate of their box, and those coordinates
+        self._order = numpy.zeros(0, dtype=numpy.int64)
+        self._sorted_lower_x = numpy.zeros(0)
+        self._sorted = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rows
+
+    def keys(self) -> List[Hashable]:
+        return list(self._keys)
+
+    def clear(self):
+        self.__init__()
+
+    def update(self, key: Hashable, lower, upper):
+        '''
+            Adds the box of the key to the index, or moves it if it is already in there
+        '''
+        row = self._rows.get(key)
+
+        if row is None:
+            row = len(self._keys)
+            self._rows[key] = row
+            self._keys.append(key)
+
+            if row == len(self._lower):
+                capacity = max(8, 2 * row)
+                self._lower = numpy.resize(self._lower, (capacity, 3))
+                self._upper = numpy.resize(self._upper, (capacity, 3))
+
+        self._lower[row] = lower
+        self._upper[row] = upper
+        self._sorted = False
+
+    def remove(self, key: Hashable):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+
+        # Move the last box into the row of the removed one
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+            self._lower[row] = self._lower[last]
+            self._upper[row] = self._upper[last]
+
+        self._keys.pop()
+        self._sorted = False
+
+    def box(self, key: Hashable) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        row = self._rows[key]
+        return self._lower[row].copy(), self._upper[row].copy()
+
+    def query(self, lower, upper) -> List[Hashable]:
+        '''
+            Returns the keys of all boxes which overlap (or touch) the given box
+        '''
+        if len(self._keys) == 0:
+            return []
+
+        self._sort()
+
+        lower = numpy.asarray(lower, dtype=numpy.float64)
+        upper = numpy.asarray(upper, dtype=numpy.float64)
+
+        # Only the boxes starting before the query box ends can overlap it
+        candidates = self._order[:numpy.searchsorted(self._sorted_lower_x, upper[0], side="right")]
+
+        overlap = numpy.all(self._upper[candidates] >= lower, axis=1) & \
+            numpy.all(self._lower[candidates, 1:] <= upper[1:], axis=1)
+
+        return [self._keys[row] for row in candidates[overlap].tolist()]
+
+    def overlapping(self, key: Hashable) -> List[Hashable]:
+        '''
+            Returns the keys of all other boxes which overlap the box of the key
+        '''
+        return [k for k in self.query(*self.box(key)) if k != key]
+
+    def _sort(self):
+        if self._sorted:
+            return
+
+        count = len(self._keys)
+        self._order = numpy.argsort(self._lower[:count, 0], kind="stable")
+        self._sorted_lower_x = self._lower[self._order, 0]
+        self._sorted = True
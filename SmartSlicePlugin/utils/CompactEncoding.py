@@ -0,0 +1,176 @@
+'''
+    Compact binary encoding of the dictionaries of Smart Slice jobs and results.
+
+    Long lists of numbers, and long lists of dictionaries with the same numeric keys
+    (such as the vertices and triangles of meshes), are stored as columns of raw
+    little-endian arrays after a JSON skeleton of everything else. Floats are stored
+    as float32 when that doesn't change any of them, and integers as int32 when they
+    fit, so decoding gives back exactly the dictionary that was encoded.
+
+    The layout is MAGIC, the length of the skeleton (uint32), the skeleton, padding
+    to 8 bytes and then the arrays, each starting at an offset relative to the first.
+'''
+
+from typing import Any, List, Tuple, Union
+
+import base64
+import json
+import struct
+
+import numpy
+
+MAGIC = b"SSBIN\x01"
+
+# Name of the encoding in the workspace (see encodeForStorage) and in the server's info (see acceptedBy)
+STORAGE_ENCODING = "smartslice-binary-1"
+
+# Lists shorter than this are kept in the skeleton
+MIN_ARRAY_LENGTH = 8
+
+_TABLE = "__smartslice_table__"
+_ARRAY = "__smartslice_array__"
+
+
+def encode(data: Any) -> bytes:
+    buffers = []
+    size = 0
+
+    def addArray(values: List[Union[int, float]]) -> Tuple[str, int, int]:
+        nonlocal size
+
+        array = _compactArray(values)
+        offset = size
+
+        buffers.append(array.tobytes())
+        buffers.append(b"\0" * (-array.nbytes % 8))
+        size += array.nbytes + len(buffers[-1])
+
+        return array.dtype.str, offset, len(array)
+
+    def skeleton(value):
+        if isinstance(value, dict):
+            return {key: skeleton(v) for key, v in value.items()}
+
+        if isinstance(value, list):
+            if len(value) >= MIN_ARRAY_LENGTH:
+                if _isColumn(value):
+                    return {_ARRAY: addArray(value)}
+
+                keys = _tableKeys(value)
+                if keys is not None:
+                    return {_TABLE: [[key] + list(addArray([row[key] for row in value])) for key in keys]}
+
+            return [skeleton(v) for v in value]
+
+        return value
+
+    header = json.dumps(skeleton(data), separators=(",", ":")).encode()
+    padding = b"\0" * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header, padding] + buffers)
+
+
+def decode(data: bytes) -> Any:
+    if not isBinary(data):
+        raise ValueError("Not a Smart Slice binary encoding")
+
+    header_length = struct.unpack_from("<I", data, len(MAGIC))[0]
+    header_end = len(MAGIC) + 4 + header_length
+    header = json.loads(bytes(data[len(MAGIC) + 4:header_end]).decode())
+
+    buffers = memoryview(data)[header_end + (-header_end % 8):]
+
+    def array(dtype: str, offset: int, count: int) -> list:
+        return numpy.frombuffer(buffers, dtype=dtype, count=count, offset=offset).tolist()
+
+    def build(value):
+        if isinstance(value, dict):
+            if _ARRAY in value and len(value) == 1:
+                return array(*value[_ARRAY])
+
+            if _TABLE in value and len(value) == 1:
+                keys = [column[0] for column in value[_TABLE]]
+                columns = [array(*column[1:]) for column in value[_TABLE]]
+                return [dict(zip(keys, row)) for row in zip(*columns)]
+
+            return {key: build(v) for key, v in value.items()}
+
+        if isinstance(value, list):
+            return [build(v) for v in value]
+
+        return value
+
+    return build(header)
+
+
+def isBinary(data) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def encodeForStorage(data: Any) -> dict:
+    '''
+        Returns the encoding of data in a form that can be stored as JSON, such as in a workspace
+    '''
+    return {"encoding": STORAGE_ENCODING, "data": base64.b64encode(encode(data)).decode("ascii")}
+
+
+def decodeFromStorage(stored: Any) -> Any:
+    '''
+        Returns the data stored by encodeForStorage. Anything else was stored as is, and is returned as is.
+    '''
+    if isinstance(stored, dict) and stored.get("encoding") == STORAGE_ENCODING and len(stored) == 2:
+        return decode(base64.b64decode(stored["data"]))
+    return stored
+
+
+def acceptedBy(server_info: Any) -> bool:
+    '''
+        Returns whether the server accepts jobs with this encoding, given its info. The info
+        lists the job encodings the server accepts as "job_encodings"; without it, only JSON is.
+    '''
+    encodings = server_info.get("job_encodings") if isinstance(server_info, dict) else None
+    return isinstance(encodings, list) and STORAGE_ENCODING in encodings
+
+
+def _isColumn(values: list) -> bool:
+    # Only lists of either floats or integers (no bools) are stored as arrays, so they come back the same
+    value_type = type(values[0])
+
+    if value_type is float:
+        return all(type(v) is float for v in values)
+
+    if value_type is int:
+        return all(type(v) is int for v in values) and -2 ** 63 <= min(values) and max(values) < 2 ** 63
+
+    return False
+
+
+def _tableKeys(rows: list):
+    first = rows[0]
+    if not isinstance(first, dict) or len(first) == 0:
+        return None
+
+    keys = list(first.keys())
+    for row in rows:
+        if not isinstance(row, dict) or list(row.keys()) != keys:
+            return None
+
+    if not all(_isColumn([row[key] for row in rows]) for key in keys):
+        return None
+
+    return keys
+
+
+def _compactArray(values: List[Union[int, float]]) -> numpy.ndarray:
+    if type(values[0]) is int:
+        array = numpy.array(values, dtype="<i8")
+        if array.min() >= -2 ** 31 and array.max() < 2 ** 31:
+            return array.astype("<i4")
+        return array
+
+    array = numpy.array(values, dtype="<f8")
+    single = array.astype("<f4")
+    widened = single.astype("<f8")
+    if numpy.all((widened == array) | (numpy.isnan(widened) & numpy.isnan(array))):
+        return single
+    return array
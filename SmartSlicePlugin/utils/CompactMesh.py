@@ -0,0 +1,332 @@
+'''
+    Array backed interactive mesh used for face selection.
+
+    CompactMesh keeps the analyzed mesh (see MeshUtils.analyzeMesh) as a handful of
+    NumPy arrays instead of one Python object per vertex and triangle, and provides
+    the part of the pywim.geom.tri.Mesh API the plugin relies on. Triangle and vertex
+    objects are only created for the faces that are actually selected.
+'''
+
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy
+
+from .MeshUtils import FaceRegions, triangleNormals
+from .TriangleBVH import TriangleBVH
+
+
+class CompactTriangle:
+    '''
+        A view of one triangle of a CompactMesh
+    '''
+
+    __slots__ = ("id", "_mesh")
+
+    def __init__(self, mesh: "CompactMesh", triangle_id: int):
+        self.id = triangle_id
+        self._mesh = mesh
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompactTriangle) and self.id == other.id and self._mesh is other._mesh
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def _vertex(self, corner: int) -> "pywim.geom.Vertex":
+        import pywim
+
+        x, y, z = self._mesh.vertices[self._mesh.triangles[self.id, corner]].tolist()
+        return pywim.geom.Vertex(x, y, z)
+
+    @property
+    def v1(self) -> "pywim.geom.Vertex":
+        return self._vertex(0)
+
+    @property
+    def v2(self) -> "pywim.geom.Vertex":
+        return self._vertex(1)
+
+    @property
+    def v3(self) -> "pywim.geom.Vertex":
+        return self._vertex(2)
+
+    @property
+    def normal(self) -> numpy.ndarray:
+        return self._mesh.normals[self.id]
+
+
+class CompactFace:
+    '''
+        A set of triangles of a CompactMesh, in the order they were selected.
+
+        triangle_ids are ids in the CompactMesh, original_ids the matching ids in
+        the model's mesh data. They only differ when the CompactMesh is a proxy.
+    '''
+
+    def __init__(
+        self,
+        mesh: "CompactMesh" = None,
+        triangle_ids: Iterable[int] = (),
+        original_ids: Iterable[int] = None
+    ):
+        self.mesh = mesh
+        self.triangle_ids = numpy.asarray(triangle_ids, dtype=numpy.int32).reshape(-1)
+        self._original_ids = None
+        if original_ids is not None:
+            self._original_ids = numpy.asarray(original_ids, dtype=numpy.int32).reshape(-1)
+        self._triangles = None
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompactFace) and self.mesh is other.mesh and \
+            numpy.array_equal(self.triangle_ids, other.triangle_ids)
+
+    def __hash__(self) -> int:
+        return hash(self.triangle_ids.tobytes())
+
+    @property
+    def original_ids(self) -> numpy.ndarray:
+        if self._original_ids is None:
+            if self.mesh is None:
+                self._original_ids = self.triangle_ids
+            else:
+                self._original_ids = self.mesh.originalIds(self.triangle_ids)
+        return self._original_ids
+
+    @property
+    def triangles(self) -> List[CompactTriangle]:
+        if self._triangles is None:
+            self._triangles = [CompactTriangle(self.mesh, i) for i in self.triangle_ids.tolist()]
+        return self._triangles
+
+    def vertices(self) -> numpy.ndarray:
+        '''
+            Returns the corners of all triangles as a (N, 3, 3) array
+        '''
+        if self.mesh is None:
+            return numpy.zeros((0, 3, 3), dtype=numpy.float32)
+        return self.mesh.vertices[self.mesh.triangles[self.triangle_ids]]
+
+    def planar_axis(self) -> Optional["pywim.geom.Vector"]:
+        '''
+            Returns the (area weighted) average normal of the face, starting at its centroid
+        '''
+        if len(self.triangle_ids) == 0:
+            return None
+
+        corners = self.vertices().astype(numpy.float64)
+        cross = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        areas = 0.5 * numpy.linalg.norm(cross, axis=1)
+
+        normal = cross.sum(axis=0)
+        length = numpy.linalg.norm(normal)
+        if length == 0.0:
+            return None
+
+        centroids = corners.mean(axis=1)
+        if areas.sum() > 0.0:
+            origin = numpy.average(centroids, axis=0, weights=areas)
+        else:
+            origin = centroids.mean(axis=0)
+
+        return self._vector(normal / length, origin)
+
+    def rotation_axis(self) -> Optional["pywim.geom.Vector"]:
+        '''
+            Returns the axis of a cylindrical face, starting at the point on the axis
+            level with the middle of the face. Returns None for (nearly) flat faces,
+            which don't have a well defined axis of rotation.
+        '''
+        if len(self.triangle_ids) < 2:
+            return None
+
+        corners = self.vertices().astype(numpy.float64)
+        cross = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        weights = 0.5 * numpy.linalg.norm(cross, axis=1)
+
+        valid = weights > 0.0
+        if valid.sum() < 2:
+            return None
+
+        weights = weights[valid]
+        normals = cross[valid] / (2.0 * weights[:, None])
+        centroids = corners[valid].mean(axis=1)
+
+        # The normals of a cylinder are all perpendicular to its axis, so the axis
+        # is the direction the normals spread the least in
+        scatter = numpy.einsum('i,ij,ik->jk', weights, normals, normals)
+        eigenvalues, eigenvectors = numpy.linalg.eigh(scatter)
+        if eigenvalues[1] < 1.e-6 * eigenvalues[2]:
+            return None
+
+        # Eigenvectors have no preferred sign, so point the axis along its largest positive component
+        axis = eigenvectors[:, 0]
+        if axis[numpy.argmax(numpy.abs(axis))] < 0.0:
+            axis = -axis
+
+        # Least squares point closest to all normal lines, pinned axially to the face's mean centroid
+        identity = numpy.eye(3)
+        projectors = identity[None, :, :] - normals[:, :, None] * normals[:, None, :]
+        total = weights.sum()
+        mean_centroid = numpy.average(centroids, axis=0, weights=weights)
+
+        axial = numpy.outer(axis, axis) * total
+        a = numpy.einsum('i,ijk->jk', weights, projectors) + axial
+        b = numpy.einsum('i,ijk,ik->j', weights, projectors, centroids) + axial.dot(mean_centroid)
+
+        try:
+            origin = numpy.linalg.solve(a, b)
+        except numpy.linalg.LinAlgError:
+            return None
+
+        return self._vector(axis, origin)
+
+    @staticmethod
+    def _vector(direction: numpy.ndarray, origin: numpy.ndarray) -> "pywim.geom.Vector":
+        import pywim
+
+        r, s, t = direction.tolist()
+        x, y, z = origin.tolist()
+
+        vector = pywim.geom.Vector(r, s, t)
+        vector.origin = pywim.geom.Vertex(x, y, z)
+
+        return vector
+
+
+class CompactMesh:
+    '''
+        Struct of arrays interactive mesh:
+
+        vertices: float32 (V, 3) welded vertices
+        triangles: int32 (T, 3) vertex indices, in Cura's face id order
+        neighbor_offsets, neighbors: CSR triangle adjacency
+        normals: float32 (T, 3) unit triangle normals
+        regions: planar / concave / convex face regions
+        proxy_of: int32 mapping of the model's triangle ids to the triangles
+            of this mesh, if this is a decimated proxy of the model
+    '''
+
+    def __init__(
+        self,
+        vertices: numpy.ndarray,
+        triangles: numpy.ndarray,
+        neighbor_offsets: numpy.ndarray,
+        neighbors: numpy.ndarray,
+        regions: FaceRegions,
+        normals: numpy.ndarray = None,
+        proxy_of: numpy.ndarray = None
+    ):
+        self.vertices = vertices
+        self.triangles = triangles
+        self.neighbor_offsets = neighbor_offsets
+        self.neighbors = neighbors
+        self.regions = regions
+        self.normals = normals if normals is not None else triangleNormals(vertices, triangles)
+        self.proxy_of = proxy_of
+
+        self._bvh = None
+
+    @classmethod
+    def fromAnalyzedMesh(cls, analyzed: Dict[str, numpy.ndarray]) -> "CompactMesh":
+        '''
+            Creates the mesh from the arrays returned by MeshUtils.analyzeMesh
+        '''
+        regions = FaceRegions(analyzed["planar_regions"], analyzed["concave_regions"], analyzed["convex_regions"])
+
+        return cls(
+            analyzed["vertices"],
+            analyzed["triangles"],
+            analyzed["neighbor_offsets"],
+            analyzed["neighbors"],
+            regions,
+            analyzed["normals"],
+            analyzed.get("proxy_of")
+        )
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.triangles)
+
+    @property
+    def is_proxy(self) -> bool:
+        return self.proxy_of is not None
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.vertices, self.triangles, self.neighbor_offsets, self.neighbors, self.normals)
+        proxy_bytes = self.proxy_of.nbytes if self.is_proxy else 0
+        return sum(a.nbytes for a in arrays) + self.regions.nbytes + proxy_bytes
+
+    def proxyTriangle(self, original_id: int) -> int:
+        '''
+            Returns the id of the triangle in this mesh for a triangle id of the model
+        '''
+        if not self.is_proxy:
+            return int(original_id)
+        return int(self.proxy_of[original_id])
+
+    def originalIds(self, triangle_ids: numpy.ndarray) -> numpy.ndarray:
+        '''
+            Returns all triangle ids of the model that make up the given triangles of this mesh
+        '''
+        if not self.is_proxy:
+            return numpy.asarray(triangle_ids, dtype=numpy.int32)
+        return numpy.flatnonzero(numpy.isin(self.proxy_of, triangle_ids)).astype(numpy.int32)
+
+    def neighbors_of(self, triangle_id: int) -> numpy.ndarray:
+        return self.neighbors[self.neighbor_offsets[triangle_id]:self.neighbor_offsets[triangle_id + 1]]
+
+    def pick(self, origin: numpy.ndarray, direction: numpy.ndarray) -> Optional[int]:
+        '''
+            Returns the id of the first triangle of this mesh hit by the ray (in the
+            mesh's local coordinates), or None. The BVH is built on the first pick, unless
+            buildBVH was called before.
+        '''
+        triangle_id, _ = self.hit(origin, direction)
+        return triangle_id
+
+    def hit(self, origin: numpy.ndarray, direction: numpy.ndarray) -> Tuple[Optional[int], float]:
+        '''
+            Returns the id of the first triangle hit by the ray and the distance along the ray
+            (in units of direction), or (None, inf)
+        '''
+        return self.buildBVH().pick(origin, direction)
+
+    def buildBVH(self) -> TriangleBVH:
+        '''
+            Returns the BVH used for picking, building it if needed
+        '''
+        if self._bvh is None:
+            self._bvh = TriangleBVH(self.vertices, self.triangles)
+
+        return self._bvh
+
+    def face_from_ids(self, ids: Iterable[int]) -> CompactFace:
+        '''
+            Returns the face made up of the given triangle ids of the model
+        '''
+        ids = numpy.fromiter(ids, dtype=numpy.int64)
+
+        if not self.is_proxy:
+            ids = ids[(ids >= 0) & (ids < self.triangle_count)]
+            return CompactFace(self, ids)
+
+        ids = ids[(ids >= 0) & (ids < len(self.proxy_of))]
+        proxy_ids = self.proxy_of[ids]
+
+        # Keep the proxy triangles in the order their first model triangle was given
+        _, first = numpy.unique(proxy_ids, return_index=True)
+        return CompactFace(self, proxy_ids[numpy.sort(first)], ids)
+
+    def select_planar_face(self, triangle: Union[int, CompactTriangle]) -> CompactFace:
+        return CompactFace(self, self.regions.planar(self._triangleId(triangle)))
+
+    def select_concave_face(self, triangle: Union[int, CompactTriangle]) -> CompactFace:
+        return CompactFace(self, self.regions.concave(self._triangleId(triangle)))
+
+    def select_convex_face(self, triangle: Union[int, CompactTriangle]) -> CompactFace:
+        return CompactFace(self, self.regions.convex(self._triangleId(triangle)))
+
+    @staticmethod
+    def _triangleId(triangle: Union[int, CompactTriangle]) -> int:
+        return int(getattr(triangle, "id", triangle))
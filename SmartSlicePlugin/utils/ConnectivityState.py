@@ -0,0 +1,103 @@
+'''
+    Whether the Smart Slice API can be reached, without asking it before every call.
+
+    The result of a probe is kept for a short time (ttl, or failure_ttl after a failed
+    probe), and the outcomes of real API calls keep it up to date: a call that went
+    through shows that the API can be reached, a call that failed to connect makes the
+    next check probe again. Callers that need a probe at the same time wait for the one
+    that is already running instead of starting their own.
+'''
+
+from typing import Callable, Dict, Optional
+
+import threading
+import time
+
+
+class ConnectivityState:
+    def __init__(
+        self,
+        probe: Callable[[], bool],
+        ttl: float = 5.,
+        failure_ttl: float = 1.,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+
+        self._probe = probe
+        self._clock = clock
+
+        self._connected = False
+        self._checked = None  # type: Optional[float]
+        self._probing = None  # type: Optional[threading.Event]
+        self._lock = threading.Lock()
+
+        self.probes = 0
+        self.cached = 0
+        self.shared = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"probes": self.probes, "cached": self.cached, "shared": self.shared}
+
+    def check(self) -> bool:
+        '''
+            Returns whether the API can be reached, probing it if the last result is too old
+        '''
+        with self._lock:
+            if self._isFresh():
+                self.cached += 1
+                return self._connected
+
+            probing = self._probing
+            if probing is None:
+                self._probing = threading.Event()
+
+        if probing is not None:
+            probing.wait()
+            with self._lock:
+                self.shared += 1
+                return self._connected
+
+        try:
+            connected = bool(self._probe())
+        except Exception:
+            connected = False
+
+        with self._lock:
+            self._set(connected)
+            self.probes += 1
+
+            probing, self._probing = self._probing, None
+
+        probing.set()
+
+        return connected
+
+    def reportSuccess(self):
+        '''
+            An API call went through
+        '''
+        with self._lock:
+            self._set(True)
+
+    def reportFailure(self):
+        '''
+            An API call failed to connect, so the next check probes again
+        '''
+        with self._lock:
+            self._connected = False
+            self._checked = None
+
+    def invalidate(self):
+        self.reportFailure()
+
+    def _set(self, connected: bool):
+        self._connected = connected
+        self._checked = self._clock()
+
+    def _isFresh(self) -> bool:
+        if self._checked is None:
+            return False
+        ttl = self.ttl if self._connected else self.failure_ttl
+        return self._clock() - self._checked < ttl
@@ -0,0 +1,86 @@
+'''
+    The setting values the machine and extruder definitions give on their own.
+
+    Settings which have the same value as the definition don't have to be sent with
+    a job: the definition, identified by its id and a fingerprint of these values,
+    is enough to rebuild them. Values are compared as the strings they are sent as.
+
+    Only settings whose definition value is a constant have a default. A value function
+    is evaluated against the live stacks (other settings, extruderValue, resolveOrValue
+    and the like), so its result depends on more than the definition.
+'''
+
+from typing import Any, Dict, Optional, Tuple
+
+import hashlib
+
+from UM.Logger import Logger
+from UM.Settings.ContainerStack import ContainerStack
+from UM.Settings.SettingFunction import SettingFunction
+
+
+class DefinitionDefaults:
+    def __init__(self):
+        # Definition ids -> (values, fingerprint)
+        self._defaults = {}  # type: Dict[Tuple[str, ...], Tuple[Dict[str, str], str]]
+
+    def definitionIds(self, stack: ContainerStack) -> Tuple[str, ...]:
+        '''
+            Returns the ids of the definitions of the stack, and of the stacks it falls back to
+        '''
+        return tuple(s.getBottom().getId() for s in self._chain(stack))
+
+    def defaults(self, stack: ContainerStack) -> Tuple[Dict[str, str], str]:
+        '''
+            Returns the values of all settings of the stack as given by its definitions
+            alone, and a fingerprint of the definitions and these values
+        '''
+        ids = self.definitionIds(stack)
+
+        defaults = self._defaults.get(ids)
+        if defaults is None:
+            defaults = self._evaluate(stack, ids)
+            self._defaults[ids] = defaults
+
+        return defaults
+
+    def _evaluate(self, stack: ContainerStack, ids: Tuple[str, ...]) -> Tuple[Dict[str, str], str]:
+        definitions = [s.getBottom() for s in self._chain(stack)]
+
+        values = {}
+        computed = 0
+        for key in stack.getAllKeys():
+            value = self._definitionValue(definitions, key)
+            if value is None or isinstance(value, SettingFunction):
+                # Without a constant default, the setting is always sent
+                computed += 1
+                continue
+
+            values[key] = str(value)
+
+        if computed > 0:
+            Logger.log("d", "{} settings of {} have no constant definition default".format(computed, "/".join(ids)))
+
+        fingerprint = hashlib.sha256()
+        fingerprint.update("/".join(ids).encode())
+        for key in sorted(values):
+            fingerprint.update("\n{}={}".format(key, values[key]).encode())
+
+        return values, fingerprint.hexdigest()
+
+    @staticmethod
+    def _definitionValue(definitions, key: str) -> Optional[Any]:
+        # The value of the first definition with the setting, which is its default_value if it has no value
+        for definition in definitions:
+            value = definition.getProperty(key, "value")
+            if value is not None:
+                return value
+        return None
+
+    @staticmethod
+    def _chain(stack: ContainerStack):
+        stacks = []
+        while stack is not None:
+            stacks.append(stack)
+            stack = stack.getNextStack()
+        return stacks
@@ -0,0 +1,84 @@
+'''
+    Content hash of everything that affects the result of a Smart Slice job: the mesh
+    buffers and world transformations of the nodes, and the job itself with its
+    settings, boundary conditions, materials and requirements.
+
+    Hashing the mesh buffers is the expensive part, so their digests are kept per node
+    and only computed again when the node gets new mesh data. A node's transformation
+    is hashed as a matrix, which fixes the mesh after the transformation just as well.
+
+    Values of the job which change without the job changing, such as start g-code with
+    the time of the build in it, are replaced by their stable form before hashing.
+'''
+
+from typing import Dict, Iterable, Optional
+
+import hashlib
+import json
+import threading
+import weakref
+
+import numpy
+
+from .MeshCache import MeshCache
+
+
+class JobFingerprint:
+    VERSION = 2
+
+    def __init__(self):
+        # Node -> (mesh data, digest of its buffers)
+        self._mesh_digests = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        self.mesh_hashes = 0
+
+    def fingerprint(self, job_dict: dict, nodes: Iterable, stable_values: Optional[Dict[str, str]] = None) -> str:
+        '''
+            Returns the fingerprint of the job (as given by its to_dict()) for the mesh nodes.
+            String values of the job found in stable_values are hashed as the value they map to.
+        '''
+        digest = hashlib.sha256()
+        digest.update("smartslice-job-v{}".format(self.VERSION).encode())
+
+        for node in nodes:
+            digest.update(self.meshDigest(node).encode())
+
+            transformation = numpy.ascontiguousarray(node.getWorldTransformation().getData(), dtype=numpy.float64)
+            digest.update(transformation.tobytes())
+
+        if stable_values:
+            job_dict = self._stable(job_dict, stable_values)
+
+        digest.update(json.dumps(job_dict, sort_keys=True, separators=(",", ":")).encode())
+
+        return digest.hexdigest()
+
+    @classmethod
+    def _stable(cls, value, stable_values: Dict[str, str]):
+        if isinstance(value, str):
+            return stable_values.get(value, value)
+        if isinstance(value, dict):
+            return {key: cls._stable(item, stable_values) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [cls._stable(item, stable_values) for item in value]
+        return value
+
+    def meshDigest(self, node) -> str:
+        mesh_data = node.getMeshData()
+
+        with self._lock:
+            cached = self._mesh_digests.get(node)
+            if cached is not None and cached[0] is mesh_data:
+                return cached[1]
+
+        if mesh_data is None:
+            mesh_digest = MeshCache.key(numpy.zeros((0, 3), dtype=numpy.float32), None)
+        else:
+            mesh_digest = MeshCache.key(mesh_data.getVertices(), mesh_data.getIndices())
+
+        with self._lock:
+            self._mesh_digests[node] = (mesh_data, mesh_digest)
+            self.mesh_hashes += 1
+
+        return mesh_digest
@@ -0,0 +1,72 @@
+'''
+    The Smart Slice material database (data/POC_material_database.json), indexed by the
+    GUIDs of the Cura materials each entry is used for.
+
+    The file is read once and read again only when its modification time changes.
+'''
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import json
+import os
+import threading
+
+
+class MaterialDatabase:
+    # Lists of Cura material GUIDs in a database entry, and whether the material is tested.
+    # The lists are checked in this order. "cura-guid" is the old name of "cura-tested-guid".
+    GUID_KEYS = (
+        ("cura-tested-guid", True),
+        ("cura-generic-guid", False),
+        ("cura-guid", True)
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self.loads = 0
+
+        self._index = {}  # type: Dict[str, Tuple[dict, bool]]
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def lookup(self, guid: str) -> Tuple[Optional[dict], bool]:
+        '''
+            Returns the material definition for the GUID and whether the material is tested.
+            The material is None if it is not supported.
+        '''
+        return self._currentIndex().get(guid, (None, False))
+
+    def lookupMany(self, guids: Iterable[str]) -> Dict[str, Tuple[Optional[dict], bool]]:
+        '''
+            Returns (material, tested) for each of the GUIDs, as lookup() does
+        '''
+        index = self._currentIndex()
+        return {guid: index.get(guid, (None, False)) for guid in guids}
+
+    def _currentIndex(self) -> Dict[str, Tuple[dict, bool]]:
+        mtime = os.stat(self.path).st_mtime_ns
+
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path) as database_file:
+                    self._index = self._buildIndex(json.load(database_file))
+                self._mtime = mtime
+                self.loads += 1
+
+            return self._index
+
+    @classmethod
+    def _buildIndex(cls, database: dict) -> Dict[str, Tuple[dict, bool]]:
+        # The first entry listing a GUID wins, as it did when the entries were searched in order
+        index = {}
+
+        for material in database["materials"]:
+            for key, tested in cls.GUID_KEYS:
+                guids = material.get(key, ())
+                if isinstance(guids, str):
+                    guids = (guids,)
+
+                for guid in guids:
+                    index.setdefault(guid, (material, tested))
+
+        return index
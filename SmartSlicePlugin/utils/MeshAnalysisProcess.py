@@ -0,0 +1,178 @@
+'''
+    Runs the array part of the mesh analysis (MeshUtils.analyzeMesh) in a child
+    process, so large meshes are analyzed without holding Cura's GIL.
+
+    Only NumPy work happens in the child - the result is sent back over a pipe
+    as plain arrays. The child is spawned, not forked, as forking a process with
+    Qt and its threads running is not safe, and spawning works on every platform.
+    It runs MeshAnalysisWorker by path, which imports nothing but NumPy and
+    MeshUtils.
+
+    If the child can't be started, or doesn't report back in time (a frozen Cura
+    may not be able to run it), the analysis runs in the calling thread instead,
+    and so does every later analysis.
+'''
+
+from typing import Callable, Dict
+
+import multiprocessing
+import os
+import runpy
+import sys
+import threading
+import types
+
+import numpy
+
+from . import MeshUtils
+from . import MeshAnalysisWorker
+
+
+class MeshAnalysisProcess:
+    class Canceled(Exception):
+        pass
+
+    # How long the child may take to start and import NumPy, in seconds
+    START_TIMEOUT = 20.
+
+    # Set once a child process failed to start, to not try again
+    _unavailable = False
+    _start_lock = threading.Lock()
+
+    def __init__(self):
+        self.canceled = False
+
+        # Why the analysis ran in the calling thread, if it did because the child couldn't start
+        self.fallback_reason = None
+
+        self._process = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        return not cls._unavailable and "spawn" in multiprocessing.get_all_start_methods()
+
+    def analyze(
+        self,
+        vertices: numpy.ndarray,
+        indices: numpy.ndarray,
+        progress: Callable[[float], None] = None,
+        **options
+    ) -> Dict[str, numpy.ndarray]:
+        '''
+            Returns the result of MeshUtils.analyzeMesh, which is passed any extra options.
+            Raises MeshAnalysisProcess.Canceled if cancel() is called before the analysis completes.
+        '''
+        if progress is None:
+            progress = lambda fraction: None
+
+        if not self.isAvailable():
+            return self._analyzeInThread(vertices, indices, progress, **options)
+
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+
+        with self._lock:
+            if self.canceled:
+                raise self.Canceled()
+
+            self._process = context.Process(
+                target=runpy.run_path,
+                args=(os.path.abspath(MeshAnalysisWorker.__file__),),
+                kwargs={
+                    "init_globals": {
+                        "arguments": {"connection": sender, "vertices": vertices, "indices": indices, "options": options}
+                    },
+                    "run_name": MeshAnalysisWorker.RUN_NAME
+                },
+                name="SmartSliceMeshAnalysis",
+                daemon=True
+            )
+
+            try:
+                self._start(self._process)
+                start_error = None
+            except Exception as error:
+                start_error = error
+
+        if start_error is not None:
+            sender.close()
+            receiver.close()
+            return self._fallBack(start_error, vertices, indices, progress, **options)
+
+        # Only the child writes to the pipe, so closing our end lets us see when it exits
+        sender.close()
+
+        try:
+            if not self._waitUntilReady(receiver):
+                return self._fallBack("no response", vertices, indices, progress, **options)
+
+            while True:
+                try:
+                    kind, value = receiver.recv()
+                except EOFError:
+                    if self.canceled:
+                        raise self.Canceled()
+                    raise RuntimeError("Mesh analysis process exited with code {}".format(self._process.exitcode))
+
+                if kind == "progress":
+                    progress(value)
+                elif kind == "error":
+                    raise RuntimeError("Mesh analysis process failed:\n{}".format(value))
+                else:
+                    return value
+        finally:
+            receiver.close()
+            self._process.join()
+
+    def cancel(self):
+        with self._lock:
+            self.canceled = True
+
+            if self._process and self._process.is_alive():
+                self._process.terminate()
+
+    @classmethod
+    def _start(cls, process):
+        # A spawned child imports the parent's __main__ again, which for Cura is the script that
+        # starts the application. Without a main module to rebuild, the child only runs the worker.
+        with cls._start_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                process.start()
+            finally:
+                sys.modules["__main__"] = main
+
+    def _waitUntilReady(self, receiver) -> bool:
+        try:
+            if receiver.poll(self.START_TIMEOUT):
+                kind, _ = receiver.recv()
+                return kind == "ready"
+        except EOFError:
+            pass
+
+        if self.canceled:
+            raise self.Canceled()
+
+        return False
+
+    def _fallBack(self, reason, vertices: numpy.ndarray, indices: numpy.ndarray, progress, **options):
+        self.fallback_reason = str(reason)
+
+        MeshAnalysisProcess._unavailable = True
+        if self._process.is_alive():
+            self._process.terminate()
+
+        return self._analyzeInThread(vertices, indices, progress, **options)
+
+    def _analyzeInThread(self, vertices: numpy.ndarray, indices: numpy.ndarray, progress, **options):
+        return MeshUtils.analyzeMesh(
+            vertices, indices, lambda fraction: self._inThreadProgress(progress, fraction), **options
+        )
+
+    def _inThreadProgress(self, progress: Callable[[float], None], fraction: float):
+        # Without a child process, the analysis can only be stopped between its stages
+        if self.canceled:
+            raise self.Canceled()
+        progress(fraction)
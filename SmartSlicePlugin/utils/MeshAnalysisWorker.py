@@ -0,0 +1,37 @@
+'''
+    Entry point of the mesh analysis child process (see MeshAnalysisProcess).
+
+    The child is a freshly spawned interpreter which runs this file by its path, so
+    it doesn't import Cura, Qt or the plugin package - only NumPy and MeshUtils, which
+    is imported from next to this file. The parent passes the arguments of analyze()
+    as the globals of the run.
+'''
+
+import os
+import sys
+import traceback
+
+RUN_NAME = "__smartslice_mesh_analysis__"
+
+
+def analyze(connection, vertices, indices, options: dict):
+    # The parent waits for this before it trusts the process to run the analysis
+    connection.send(("ready", None))
+
+    try:
+        result = MeshUtils.analyzeMesh(
+            vertices, indices, lambda fraction: connection.send(("progress", fraction)), **options
+        )
+        connection.send(("result", result))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+if __name__ == RUN_NAME:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import MeshUtils
+
+    analyze(**arguments)
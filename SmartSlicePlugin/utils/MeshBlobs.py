@@ -0,0 +1,157 @@
+'''
+    Content addressed mesh blobs, so a job whose meshes the server already has is
+    submitted without them.
+
+    Every mesh is stored on the server as a blob: a 3MF package holding only that
+    mesh, without transformation or settings. The blob is addressed by the SHA-256
+    of the mesh's vertex and index buffers, so it doesn't have to be written to find
+    out whether the server has it. The job is then submitted as a reference package:
+    job.json and SmartSlice/meshes.json, which lists the blob, name, transformation
+    and settings of every object.
+
+    Blobs are looked up with HEAD <address>/smartslice/blobs/<key> (200 if the server
+    has it, 404 if not) and uploaded with PUT to the same URL.
+'''
+
+from typing import BinaryIO, Dict, Iterable, List, Optional, Union
+
+import hashlib
+import http.client
+import io
+import json
+import threading
+import zipfile
+
+from urllib.parse import urlparse
+
+import numpy
+
+from . import ThreeMFWriter
+
+MESHES_PATH = "SmartSlice/meshes.json"
+
+
+def blobKey(threemf_object: ThreeMFWriter.ThreeMFObject) -> str:
+    '''
+        Returns the address of the blob of the object's mesh
+    '''
+    digest = hashlib.sha256()
+
+    for buffer in (threemf_object.vertices, threemf_object.triangles()):
+        buffer = numpy.ascontiguousarray(buffer)
+        digest.update("{}{}".format(buffer.dtype.str, buffer.shape).encode())
+        digest.update(memoryview(buffer).cast("B"))
+
+    return digest.hexdigest()
+
+
+def blobData(threemf_object: ThreeMFWriter.ThreeMFObject) -> bytes:
+    '''
+        Returns the blob of the object's mesh
+    '''
+    stream = io.BytesIO()
+    ThreeMFWriter.write3mf(stream, [
+        ThreeMFWriter.ThreeMFObject(threemf_object.name, threemf_object.vertices, threemf_object.indices)
+    ])
+    return stream.getvalue()
+
+
+def writeReferencePackage(
+    stream: BinaryIO,
+    objects: Iterable[ThreeMFWriter.ThreeMFObject],
+    files: Optional[Dict[str, Union[str, bytes]]] = None
+):
+    '''
+        Writes the package which refers to the blobs of the objects instead of holding their meshes
+    '''
+    meshes = [
+        {
+            "blob": blobKey(threemf_object),
+            "name": threemf_object.name,
+            "transform": ThreeMFWriter.transformString(threemf_object.transformation),
+            "settings": threemf_object.settings
+        }
+        for threemf_object in objects
+    ]
+
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MESHES_PATH, json.dumps({"meshes": meshes}))
+
+        for path, contents in (files or {}).items():
+            archive.writestr(path, contents)
+
+
+class MeshBlobStore:
+    def __init__(self, address: str, token: Optional[str] = None, timeout: float = 60.):
+        url = urlparse(address)
+
+        self._connection_type = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.netloc
+        self._path = url.path.rstrip("/") + "/smartslice/blobs/"
+        self._headers = {"Authorization": "Bearer {}".format(token)} if token else {}
+        self._timeout = timeout
+
+        # Blobs the server is known to have
+        self._known = set()
+        self._lock = threading.Lock()
+
+        self.uploads = 0
+        self.uploaded_bytes = 0
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            if key in self._known:
+                return True
+
+        status = self._request("HEAD", key)
+        if status == 404:
+            return False
+        if status != 200:
+            raise ConnectionError("Unable to look up mesh blob {}: HTTP {}".format(key, status))
+
+        with self._lock:
+            self._known.add(key)
+
+        return True
+
+    def upload(self, key: str, data: bytes):
+        status = self._request("PUT", key, data)
+        if status not in (200, 201, 204):
+            raise ConnectionError("Unable to upload mesh blob {}: HTTP {}".format(key, status))
+
+        with self._lock:
+            self._known.add(key)
+            self.uploads += 1
+            self.uploaded_bytes += len(data)
+
+    def ensure(self, objects: Iterable[ThreeMFWriter.ThreeMFObject]) -> List[str]:
+        '''
+            Uploads the blobs of the objects the server doesn't have yet, and returns their keys
+        '''
+        uploaded = []
+
+        for threemf_object in objects:
+            key = blobKey(threemf_object)
+            if self.exists(key):
+                continue
+
+            self.upload(key, blobData(threemf_object))
+            uploaded.append(key)
+
+        return uploaded
+
+    def _request(self, method: str, key: str, body: Optional[bytes] = None) -> int:
+        connection = self._connection_type(self._host, timeout=self._timeout)
+        try:
+            headers = dict(self._headers)
+            if body is not None:
+                headers["Content-Type"] = "model/3mf"
+
+            connection.request(method, self._path + key, body=body, headers=headers)
+
+            response = connection.getresponse()
+            response.read()
+
+            return response.status
+        finally:
+            connection.close()
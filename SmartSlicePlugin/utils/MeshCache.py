@@ -0,0 +1,145 @@
+'''
+    Persistent, content addressed cache of analyzed interactive mesh arrays.
+
+    Entries are keyed by a hash of the MeshData vertex/index buffers and stored
+    as .npz files. The least recently used entries are evicted once the cache
+    grows beyond its size limit.
+'''
+
+from typing import Dict, Optional
+
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+
+import numpy
+
+
+class MeshCache:
+    # Bump this whenever the contents of an analyzed mesh change
+    VERSION = 4
+
+    EXTENSION = ".npz"
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def key(cls, vertices: numpy.ndarray, indices: Optional[numpy.ndarray], variant: str = "") -> str:
+        '''
+            Returns the cache key for the given MeshData buffers. The variant
+            distinguishes analyses of the same mesh with different options.
+        '''
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update("v{}{}".format(cls.VERSION, variant).encode())
+
+        for buffer in (vertices, indices):
+            if buffer is None:
+                digest.update(b"none")
+                continue
+
+            buffer = numpy.ascontiguousarray(buffer)
+            digest.update("{}{}".format(buffer.dtype.str, buffer.shape).encode())
+            digest.update(memoryview(buffer).cast("B"))
+
+        return digest.hexdigest()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": sum(size for _, _, size in self._entries())
+        }
+
+    def load(self, key: str) -> Optional[Dict[str, numpy.ndarray]]:
+        path = self._path(key)
+
+        with self._lock:
+            try:
+                with numpy.load(path, allow_pickle=False) as npz:
+                    arrays = {name: npz[name] for name in npz.files}
+
+                # Touch the entry so it becomes the most recently used
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+                # A truncated or corrupt entry is a miss as well, and is removed so it gets stored again
+                self.misses += 1
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                return None
+
+            self.hits += 1
+
+        return arrays
+
+    def store(self, key: str, arrays: Dict[str, numpy.ndarray]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # Write to a temporary file first so a crash never leaves a partial entry behind
+            fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    numpy.savez(f, **arrays)
+                os.replace(temp_path, self._path(key))
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                os.remove(path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.EXTENSION)
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+
+        # Always keep the newest entry, even if it is larger than the limit on its own
+        for path, _, size in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
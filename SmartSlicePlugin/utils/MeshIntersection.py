@@ -0,0 +1,154 @@
+'''
+    Exact intersection test between two triangle meshes, on (N, 3, 3) arrays of
+    triangle corners in a common coordinate system.
+
+    Candidate triangle pairs are found by sweep and prune over the triangle bounding
+    boxes and then tested with the separating axis theorem, in chunks, so the test
+    stops at the first chunk with an intersecting pair. Meshes whose surfaces don't
+    intersect still intersect if one of them is inside of the other.
+'''
+
+from typing import Iterator, Tuple
+
+import numpy
+
+# Upper limit of the number of triangle pairs tested at once
+PAIR_CHUNK_SIZE = 50000
+
+# An irrational direction, so rays for the inside test are unlikely to hit edges or vertices
+_INSIDE_RAY_DIRECTION = numpy.array([0.5773502, 0.5773513, 0.5773488])
+
+
+def triangleBoxes(corners: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    return corners.min(axis=1), corners.max(axis=1)
+
+
+def candidatePairs(
+    lower_a: numpy.ndarray,
+    upper_a: numpy.ndarray,
+    lower_b: numpy.ndarray,
+    upper_b: numpy.ndarray,
+    chunk_size: int = PAIR_CHUNK_SIZE
+) -> Iterator[Tuple[numpy.ndarray, numpy.ndarray]]:
+    '''
+        Yields chunks of (indices into a, indices into b) of the boxes that overlap
+    '''
+    if len(lower_a) == 0 or len(lower_b) == 0:
+        return
+
+    # Sweep along x: every box of a can only overlap the boxes of b starting
+    # between its own start (less the longest box of b) and its end
+    order = numpy.argsort(lower_b[:, 0], kind='stable')
+    sorted_lower = lower_b[order, 0]
+    longest = (upper_b[:, 0] - lower_b[:, 0]).max()
+
+    start = numpy.searchsorted(sorted_lower, lower_a[:, 0] - longest, side='left')
+    end = numpy.searchsorted(sorted_lower, upper_a[:, 0], side='right')
+    counts = end - start
+
+    # Split a into runs of boxes with about chunk_size candidates in total
+    totals = numpy.cumsum(counts)
+    bounds = numpy.searchsorted(totals, numpy.arange(chunk_size, totals[-1], chunk_size), side='left')
+    bounds = numpy.unique(numpy.concatenate(([0], bounds, [len(counts)])))
+
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        run_counts = counts[first:last]
+        total = int(run_counts.sum())
+        if total == 0:
+            continue
+
+        a = numpy.repeat(numpy.arange(first, last), run_counts)
+        offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(run_counts) - run_counts, run_counts)
+        b = order[numpy.repeat(start[first:last], run_counts) + offsets]
+
+        overlap = numpy.all(upper_a[a] >= lower_b[b], axis=1) & numpy.all(upper_b[b] >= lower_a[a], axis=1)
+
+        if overlap.any():
+            yield a[overlap], b[overlap]
+
+
+def trianglesIntersect(a: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+    '''
+        Returns whether each pair of triangles a[i], b[i] intersects (touching counts).
+        a and b are (P, 3, 3) arrays of triangle corners.
+    '''
+    edges_a = a[:, [1, 2, 0]] - a
+    edges_b = b[:, [1, 2, 0]] - b
+
+    normal_a = numpy.cross(edges_a[:, 0], edges_a[:, 1])
+    normal_b = numpy.cross(edges_b[:, 0], edges_b[:, 1])
+
+    # Candidate separating axes: both normals, the cross products of all edge pairs and,
+    # for coplanar triangles, the in-plane normals of every edge. Axes that come out as
+    # zero project both triangles to the same point and never separate them.
+    axes = numpy.concatenate((
+        normal_a[:, None],
+        normal_b[:, None],
+        numpy.cross(edges_a[:, :, None], edges_b[:, None, :]).reshape(-1, 9, 3),
+        numpy.cross(normal_a[:, None], edges_a),
+        numpy.cross(normal_b[:, None], edges_b)
+    ), axis=1)
+
+    projected_a = numpy.einsum('pkd,pvd->pkv', axes, a)
+    projected_b = numpy.einsum('pkd,pvd->pkv', axes, b)
+
+    separated = (projected_a.max(axis=2) < projected_b.min(axis=2)) | \
+        (projected_b.max(axis=2) < projected_a.min(axis=2))
+
+    return ~separated.any(axis=1)
+
+
+def pointInsideMesh(point: numpy.ndarray, corners: numpy.ndarray) -> bool:
+    '''
+        Returns whether the point is inside the closed mesh, by counting the triangles a ray crosses
+    '''
+    direction = _INSIDE_RAY_DIRECTION
+
+    edge1 = corners[:, 1] - corners[:, 0]
+    edge2 = corners[:, 2] - corners[:, 0]
+
+    p = numpy.cross(direction, edge2)
+    determinant = numpy.einsum('ij,ij->i', edge1, p)
+    valid = numpy.abs(determinant) > 1.e-12
+    inverse_determinant = numpy.where(valid, 1.0 / numpy.where(valid, determinant, 1.0), 0.0)
+
+    s = point - corners[:, 0]
+    u = numpy.einsum('ij,ij->i', s, p) * inverse_determinant
+    q = numpy.cross(s, edge1)
+    v = numpy.dot(q, direction) * inverse_determinant
+    t = numpy.einsum('ij,ij->i', edge2, q) * inverse_determinant
+
+    crossings = valid & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > 0.0)
+
+    return bool(numpy.count_nonzero(crossings) % 2)
+
+
+def meshesIntersect(a: numpy.ndarray, b: numpy.ndarray, chunk_size: int = PAIR_CHUNK_SIZE) -> bool:
+    '''
+        Returns whether the meshes with the triangle corners a and b intersect, or one contains the other
+    '''
+    if len(a) == 0 or len(b) == 0:
+        return False
+
+    a = numpy.asarray(a, dtype=numpy.float64)
+    b = numpy.asarray(b, dtype=numpy.float64)
+
+    lower_a, upper_a = triangleBoxes(a)
+    lower_b, upper_b = triangleBoxes(b)
+
+    overlap_lower = numpy.maximum(lower_a.min(axis=0), lower_b.min(axis=0))
+    overlap_upper = numpy.minimum(upper_a.max(axis=0), upper_b.max(axis=0))
+    if numpy.any(overlap_lower > overlap_upper):
+        return False
+
+    # Only triangles within the overlap of both meshes' boxes can intersect
+    near_a = numpy.flatnonzero(numpy.all(upper_a >= overlap_lower, axis=1) & numpy.all(lower_a <= overlap_upper, axis=1))
+    near_b = numpy.flatnonzero(numpy.all(upper_b >= overlap_lower, axis=1) & numpy.all(lower_b <= overlap_upper, axis=1))
+
+    pairs = candidatePairs(lower_a[near_a], upper_a[near_a], lower_b[near_b], upper_b[near_b], chunk_size)
+    for pairs_a, pairs_b in pairs:
+        if trianglesIntersect(a[near_a[pairs_a]], b[near_b[pairs_b]]).any():
+            return True
+
+    # No surfaces intersect, so either mesh is completely inside of the other one, or outside
+    return pointInsideMesh(a[0].mean(axis=0), b) or pointInsideMesh(b[0].mean(axis=0), a)
@@ -0,0 +1,463 @@
+'''
+    Array based helpers for building the interactive mesh used for face selection.
+
+    Nothing in here depends on Cura or pywim, so the functions can be used from
+    benchmarks and worker processes with only NumPy available.
+'''
+
+from typing import Callable, Dict, Tuple
+
+import numpy
+
+
+def meshArrays(vertices: numpy.ndarray, indices: numpy.ndarray = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+        Converts the MeshData vertex/index buffers into a welded vertex array and a
+        triangle array. Vertices with identical coordinates are merged, but the triangle
+        order is untouched so triangle ids still match Cura's face ids.
+    '''
+    vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32).reshape(-1, 3)
+
+    if indices is None:
+        # Cura keeps non-indexed meshes as a triangle soup - 3 vertices per triangle
+        triangle_count = len(vertices) // 3
+        triangles = numpy.arange(triangle_count * 3, dtype=numpy.int64).reshape(-1, 3)
+    else:
+        triangles = numpy.asarray(indices, dtype=numpy.int64).reshape(-1, 3)
+
+    if len(vertices) == 0:
+        return vertices, triangles.astype(numpy.int32)
+
+    # Adding 0 turns -0.0 into 0.0 so the bit-wise comparison below welds them together
+    bits = numpy.ascontiguousarray(vertices + numpy.float32(0.0)).view(numpy.uint32)
+
+    order = numpy.lexsort((bits[:, 2], bits[:, 1], bits[:, 0]))
+    sorted_bits = bits[order]
+
+    is_new = numpy.ones(len(order), dtype=bool)
+    is_new[1:] = numpy.any(sorted_bits[1:] != sorted_bits[:-1], axis=1)
+
+    first = order[is_new]
+    inverse = numpy.empty(len(order), dtype=numpy.int64)
+    inverse[order] = numpy.cumsum(is_new) - 1
+
+    welded_vertices = vertices[first]
+    welded_triangles = inverse[triangles].astype(numpy.int32)
+
+    return welded_vertices, welded_triangles
+
+
+def triangleAdjacency(triangles: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+        Computes the edge adjacency of the triangles in compressed sparse row form.
+        The neighbors of triangle i are neighbors[offsets[i]:offsets[i + 1]].
+        Triangles must reference welded vertices (see meshArrays).
+    '''
+    triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+    triangle_count = len(triangles)
+
+    edges = numpy.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+    edges.sort(axis=1)
+    owners = numpy.tile(numpy.arange(triangle_count, dtype=numpy.int64), 3)
+
+    # Degenerate triangles can contain a collapsed edge - it doesn't connect anything
+    valid = edges[:, 0] != edges[:, 1]
+    edges = edges[valid]
+    owners = owners[valid]
+
+    vertex_count = int(triangles.max()) + 1 if triangle_count > 0 else 0
+    keys = edges[:, 0] * vertex_count + edges[:, 1]
+
+    order = numpy.argsort(keys, kind='stable')
+    keys = keys[order]
+    owners = owners[order]
+
+    # Pair up every occurrence of an edge with the other occurrences of the same edge.
+    # Manifold edges have exactly two owners, but non-manifold edges can have more.
+    first_owners = []
+    second_owners = []
+    shift = 1
+    while shift < len(keys):
+        same_edge = keys[shift:] == keys[:-shift]
+        if not same_edge.any():
+            break
+        first_owners.append(owners[:-shift][same_edge])
+        second_owners.append(owners[shift:][same_edge])
+        shift += 1
+
+    if first_owners:
+        a = numpy.concatenate(first_owners)
+        b = numpy.concatenate(second_owners)
+        sources = numpy.concatenate((a, b))
+        targets = numpy.concatenate((b, a))
+        # Sorting on a combined key groups the pairs by source triangle and drops
+        # duplicates from triangles sharing more than one edge
+        pair_keys = numpy.sort(sources[sources != targets] * triangle_count + targets[sources != targets])
+        is_new = numpy.ones(len(pair_keys), dtype=bool)
+        is_new[1:] = pair_keys[1:] != pair_keys[:-1]
+        pair_keys = pair_keys[is_new]
+    else:
+        pair_keys = numpy.zeros(0, dtype=numpy.int64)
+
+    offsets = numpy.zeros(triangle_count + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(pair_keys // max(triangle_count, 1), minlength=triangle_count), out=offsets[1:])
+
+    return offsets, (pair_keys % max(triangle_count, 1)).astype(numpy.int32)
+
+
+def triangleNormals(vertices: numpy.ndarray, triangles: numpy.ndarray) -> numpy.ndarray:
+    '''
+        Returns the unit normal of every triangle. Degenerate triangles get a zero normal.
+    '''
+    corners = vertices[triangles]
+    normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+    lengths = numpy.linalg.norm(normals, axis=1)
+    nonzero = lengths > 0.0
+    normals[nonzero] /= lengths[nonzero, None]
+    normals[~nonzero] = 0.0
+
+    return normals.astype(numpy.float32)
+
+
+def connectedComponents(node_count: int, a: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+    '''
+        Labels the connected components of the graph with the edges (a[i], b[i]).
+        Component ids are numbered 0..N-1 in the order of their lowest node.
+    '''
+    labels = numpy.arange(node_count, dtype=numpy.int64)
+
+    while len(a) > 0:
+        la = labels[a]
+        lb = labels[b]
+
+        unmerged = la != lb
+        if not unmerged.any():
+            break
+
+        # Hook the root of the larger label onto the smaller one...
+        la = la[unmerged]
+        lb = lb[unmerged]
+        low = numpy.minimum(la, lb)
+        numpy.minimum.at(labels, numpy.maximum(la, lb), low)
+
+        # ...and then flatten the trees so every node points directly at its root
+        while True:
+            jumped = labels[labels]
+            if numpy.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+        a = a[unmerged]
+        b = b[unmerged]
+
+    is_root = labels == numpy.arange(node_count)
+    component_ids = numpy.cumsum(is_root) - 1
+
+    return component_ids[labels].astype(numpy.int32)
+
+
+# Triangles of a planar region are within this angle (radians) of the normal of its seed triangle
+PLANAR_ANGLE_TOLERANCE = 1.e-3
+
+# Neighboring triangles on a curved surface can't be bent more than this angle (radians)
+CURVED_ANGLE_LIMIT = numpy.radians(30.)
+
+# The facets of a curved surface are about the same size. A flat face next to a fillet is
+# much larger than the fillet's facets, so curved regions don't grow across to planar
+# regions more than this many times larger (or smaller) in area.
+CURVED_AREA_RATIO = 4.
+
+
+def segmentRegions(
+    vertices: numpy.ndarray,
+    triangles: numpy.ndarray,
+    neighbor_offsets: numpy.ndarray,
+    neighbors: numpy.ndarray,
+    normals: numpy.ndarray = None
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    '''
+        Segments the mesh into planar, concave and convex regions. Returns one array per
+        surface type, mapping every triangle id to the id of the region it belongs to.
+
+        Planar regions are grown across coplanar edges, but only as far as the triangles
+        stay coplanar with the region's seed (its lowest triangle id), so a gently curved
+        surface doesn't chain into a single face.
+
+        Concave (convex) regions join planar regions of about the same size across edges
+        that bend inwards (outwards) by a small angle. A planar region is never merged
+        into a curved region whose facets are a lot smaller, such as the fillet along it.
+    '''
+    triangle_count = len(triangles)
+
+    if normals is None:
+        normals = triangleNormals(vertices, triangles)
+    normals = normals.astype(numpy.float64)
+    corners = vertices[triangles].astype(numpy.float64)
+    centroids = corners.mean(axis=1)
+    areas = 0.5 * numpy.linalg.norm(numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+
+    # Every edge of the adjacency graph once
+    sources = numpy.repeat(numpy.arange(triangle_count, dtype=numpy.int64), numpy.diff(neighbor_offsets))
+    targets = neighbors.astype(numpy.int64)
+    once = sources < targets
+    sources = sources[once]
+    targets = targets[once]
+
+    degenerate = ~numpy.any(normals != 0.0, axis=1)
+    valid = ~(degenerate[sources] | degenerate[targets])
+    sources = sources[valid]
+    targets = targets[valid]
+
+    cosines = numpy.einsum('ij,ij->i', normals[sources], normals[targets])
+    coplanar = cosines >= numpy.cos(PLANAR_ANGLE_TOLERANCE)
+
+    planar_regions = _seedBoundedComponents(triangle_count, sources[coplanar], targets[coplanar], normals)
+
+    # Edges between two planar regions which bend by a small angle
+    crossing = planar_regions[sources] != planar_regions[targets]
+    curved = crossing & (cosines >= numpy.cos(CURVED_ANGLE_LIMIT))
+
+    region_areas = numpy.bincount(planar_regions, weights=areas)
+    source_areas = region_areas[planar_regions[sources]]
+    target_areas = region_areas[planar_regions[targets]]
+    curved &= numpy.maximum(source_areas, target_areas) <= CURVED_AREA_RATIO * numpy.minimum(source_areas, target_areas)
+
+    # The neighbor sits below the plane of the triangle on a convex edge, and above it on a concave edge
+    heights = numpy.einsum('ij,ij->i', centroids[targets] - centroids[sources], normals[sources])
+    concave = ~crossing | (curved & (heights > 0.0))
+    convex = ~crossing | (curved & (heights < 0.0))
+
+    return (
+        planar_regions,
+        connectedComponents(triangle_count, sources[concave], targets[concave]),
+        connectedComponents(triangle_count, sources[convex], targets[convex])
+    )
+
+
+def _seedBoundedComponents(node_count: int, a: numpy.ndarray, b: numpy.ndarray, normals: numpy.ndarray) -> numpy.ndarray:
+    # Connected components, split until every triangle is within the planar tolerance of its component's seed.
+    # Each round the triangles out of tolerance are cut off from the triangles in tolerance, and become
+    # components with seeds of their own in the next round.
+    min_cosine = numpy.cos(PLANAR_ANGLE_TOLERANCE)
+
+    while True:
+        labels = connectedComponents(node_count, a, b)
+
+        seeds = numpy.full(labels.max() + 1 if node_count > 0 else 0, node_count, dtype=numpy.int64)
+        numpy.minimum.at(seeds, labels, numpy.arange(node_count))
+
+        in_tolerance = numpy.einsum('ij,ij->i', normals, normals[seeds[labels]]) >= min_cosine
+
+        cut = in_tolerance[a] != in_tolerance[b]
+        if not cut.any():
+            return labels
+
+        a = a[~cut]
+        b = b[~cut]
+
+
+def decimateMesh(
+    vertices: numpy.ndarray,
+    triangles: numpy.ndarray,
+    neighbor_offsets: numpy.ndarray,
+    neighbors: numpy.ndarray,
+    target_triangles: int
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    '''
+        Simplifies the mesh to roughly target_triangles triangles by vertex clustering.
+
+        Returns the proxy vertices and triangles, plus an array mapping every original
+        triangle id to the proxy triangle it was merged into. Every original triangle
+        maps to exactly one proxy triangle, so a selection on the proxy can always be
+        turned back into original triangle ids.
+    '''
+    triangle_count = len(triangles)
+    if triangle_count == 0:
+        return vertices, triangles, numpy.zeros(0, dtype=numpy.int32)
+
+    corners = vertices[triangles].astype(numpy.float64)
+    area = 0.5 * numpy.linalg.norm(numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1).sum()
+    lower = vertices.min(axis=0).astype(numpy.float64)
+
+    # Every grid cell covers about cell_size^2 of the surface and ends up as ~2 triangles
+    cell_size = max(numpy.sqrt(2.0 * area / max(target_triangles, 1)), 1.e-6)
+
+    for _ in range(8):
+        clusters, cluster_count = _clusterVertices(vertices, lower, cell_size)
+        proxy_corners = clusters[triangles]
+        kept = (proxy_corners[:, 0] != proxy_corners[:, 1]) & \
+            (proxy_corners[:, 1] != proxy_corners[:, 2]) & \
+            (proxy_corners[:, 2] != proxy_corners[:, 0])
+
+        # Triangles collapsing onto the same cluster triangle (in either orientation) become one
+        keys = numpy.sort(proxy_corners[kept], axis=1)
+        order = numpy.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+        is_new = numpy.ones(len(order), dtype=bool)
+        is_new[1:] = numpy.any(keys[order][1:] != keys[order][:-1], axis=1)
+
+        if is_new.sum() <= 1.5 * target_triangles:
+            break
+
+        cell_size *= numpy.sqrt(is_new.sum() / target_triangles)
+
+    # Cluster positions are the average of their vertices
+    cluster_vertices = numpy.empty((cluster_count, 3), dtype=numpy.float32)
+    counts = numpy.bincount(clusters, minlength=cluster_count)
+    for axis in range(3):
+        cluster_vertices[:, axis] = numpy.bincount(clusters, weights=vertices[:, axis], minlength=cluster_count) / counts
+
+    proxy_of = numpy.full(triangle_count, -1, dtype=numpy.int64)
+    kept_ids = numpy.flatnonzero(kept)
+    unique_index = numpy.empty(len(order), dtype=numpy.int64)
+    unique_index[order] = numpy.cumsum(is_new) - 1
+    proxy_of[kept_ids] = unique_index
+    proxy_triangles = numpy.empty((int(is_new.sum()), 3), dtype=numpy.int32)
+    proxy_triangles[unique_index] = proxy_corners[kept_ids]
+
+    # Collapsed triangles join a proxy triangle touching the same cluster...
+    incident = numpy.full(cluster_count, -1, dtype=numpy.int64)
+    for corner in range(3):
+        incident[proxy_triangles[:, corner]] = numpy.arange(len(proxy_triangles))
+    collapsed = numpy.flatnonzero(proxy_of < 0)
+    proxy_of[collapsed] = incident[proxy_corners[collapsed, 0]]
+
+    # ...or else the proxy triangle of an original neighbor
+    sources = numpy.repeat(numpy.arange(triangle_count, dtype=numpy.int64), numpy.diff(neighbor_offsets))
+    targets = neighbors.astype(numpy.int64)
+    while True:
+        open_edges = (proxy_of[sources] < 0) & (proxy_of[targets] >= 0)
+        if not open_edges.any():
+            break
+        proxy_of[sources[open_edges]] = proxy_of[targets[open_edges]]
+
+    # Whole components that collapsed are kept as (degenerate) proxy triangles of their own
+    leftover = numpy.flatnonzero(proxy_of < 0)
+    if len(leftover) > 0:
+        proxy_of[leftover] = len(proxy_triangles) + numpy.arange(len(leftover))
+        proxy_triangles = numpy.concatenate((proxy_triangles, proxy_corners[leftover].astype(numpy.int32)))
+
+    return cluster_vertices, proxy_triangles, proxy_of.astype(numpy.int32)
+
+
+def _clusterVertices(vertices: numpy.ndarray, lower: numpy.ndarray, cell_size: float) -> Tuple[numpy.ndarray, int]:
+    cells = numpy.floor((vertices - lower) / cell_size).astype(numpy.int64)
+
+    order = numpy.lexsort((cells[:, 2], cells[:, 1], cells[:, 0]))
+    sorted_cells = cells[order]
+
+    is_new = numpy.ones(len(order), dtype=bool)
+    is_new[1:] = numpy.any(sorted_cells[1:] != sorted_cells[:-1], axis=1)
+
+    clusters = numpy.empty(len(order), dtype=numpy.int64)
+    clusters[order] = numpy.cumsum(is_new) - 1
+
+    return clusters, int(is_new.sum())
+
+
+class FaceRegions:
+    '''
+        Lookup from a triangle id to all triangles of the planar, concave or convex
+        region it belongs to, built from the labels returned by segmentRegions.
+    '''
+
+    def __init__(self, planar: numpy.ndarray, concave: numpy.ndarray, convex: numpy.ndarray):
+        self._planar = self._index(planar)
+        self._concave = self._index(concave)
+        self._convex = self._index(convex)
+
+    @staticmethod
+    def _index(labels: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        order = numpy.argsort(labels, kind='stable').astype(numpy.int32)
+        offsets = numpy.zeros(int(labels.max()) + 2 if len(labels) > 0 else 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(labels), out=offsets[1:])
+        return labels, order, offsets
+
+    @staticmethod
+    def _region(index, triangle_id: int) -> numpy.ndarray:
+        labels, order, offsets = index
+        region = labels[triangle_id]
+        return order[offsets[region]:offsets[region + 1]]
+
+    @staticmethod
+    def _size(index, triangle_id: int) -> int:
+        labels, _, offsets = index
+        region = labels[triangle_id]
+        return int(offsets[region + 1] - offsets[region])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for index in (self._planar, self._concave, self._convex) for a in index)
+
+    def planar(self, triangle_id: int) -> numpy.ndarray:
+        return self._region(self._planar, triangle_id)
+
+    def concave(self, triangle_id: int) -> numpy.ndarray:
+        return self._region(self._concave, triangle_id)
+
+    def convex(self, triangle_id: int) -> numpy.ndarray:
+        return self._region(self._convex, triangle_id)
+
+    def planarSize(self, triangle_id: int) -> int:
+        return self._size(self._planar, triangle_id)
+
+    def concaveSize(self, triangle_id: int) -> int:
+        return self._size(self._concave, triangle_id)
+
+    def convexSize(self, triangle_id: int) -> int:
+        return self._size(self._convex, triangle_id)
+
+
+def analyzeMesh(
+    vertices: numpy.ndarray,
+    indices: numpy.ndarray = None,
+    progress: Callable[[float], None] = None,
+    proxy_triangles: int = 0
+) -> Dict[str, numpy.ndarray]:
+    '''
+        Runs the array part of the mesh analysis. The returned arrays are everything
+        needed to build the interactive mesh, and are what gets cached on disk.
+        The optional progress callback is called with the completed fraction (0 - 1).
+
+        If proxy_triangles is set and the mesh has more triangles than that, the mesh is
+        decimated and the analysis describes the proxy mesh instead. "proxy_of" then maps
+        the original triangle ids to proxy triangle ids.
+    '''
+    if progress is None:
+        progress = lambda fraction: None
+
+    progress(0.)
+    welded_vertices, triangles = meshArrays(vertices, indices)
+    progress(0.3)
+    neighbor_offsets, neighbors = triangleAdjacency(triangles)
+    progress(0.6)
+
+    proxy_of = None
+    if 0 < proxy_triangles < len(triangles):
+        welded_vertices, triangles, proxy_of = decimateMesh(
+            welded_vertices, triangles, neighbor_offsets, neighbors, proxy_triangles
+        )
+        neighbor_offsets, neighbors = triangleAdjacency(triangles)
+        progress(0.7)
+
+    normals = triangleNormals(welded_vertices, triangles)
+    planar_regions, concave_regions, convex_regions = segmentRegions(
+        welded_vertices, triangles, neighbor_offsets, neighbors, normals
+    )
+    progress(1.)
+
+    analyzed = {
+        "vertices": welded_vertices,
+        "triangles": triangles,
+        "neighbor_offsets": neighbor_offsets,
+        "neighbors": neighbors,
+        "normals": normals,
+        "planar_regions": planar_regions,
+        "concave_regions": concave_regions,
+        "convex_regions": convex_regions
+    }
+
+    if proxy_of is not None:
+        analyzed["proxy_of"] = proxy_of
+
+    return analyzed
@@ -0,0 +1,132 @@
+'''
+    Exponential backoff with jitter and an overall deadline for retrying API calls.
+
+    The delay before the n-th retry is initial_delay * multiplier ** (n - 1), capped at
+    max_delay, of which up to the jitter fraction is taken off at random so clients
+    which failed together don't retry together. A call is given up once it used all
+    of its attempts, or once the next retry would start after its deadline.
+
+    The deadline counts from the first failure, not from the start of the call, as a
+    call may run for minutes (a long poll, an upload) before the connection drops. An
+    attempt which ran for longer than the whole deadline before it failed was making
+    progress, so the attempts and the deadline start over from its failure.
+'''
+
+from typing import Callable, Dict, Optional
+
+import random
+import threading
+import time
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 10,
+        initial_delay: float = 0.5,
+        max_delay: float = 8.,
+        multiplier: float = 2.,
+        jitter: float = 0.5,
+        deadline: Optional[float] = 60.,
+        clock: Callable[[], float] = time.monotonic,
+        random_fraction: Callable[[], float] = random.random
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+
+        self._clock = clock
+        self._random_fraction = random_fraction
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.backoff_time = 0.
+
+    def backoff(self) -> "Backoff":
+        '''
+            Returns the backoff for a new call
+        '''
+        return Backoff(self)
+
+    def delay(self, retry: int) -> float:
+        '''
+            Returns the delay before the retry (counting from 1), including the jitter
+        '''
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (retry - 1))
+        return delay * (1. - self.jitter * self._random_fraction())
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "backoff_time": self.backoff_time
+            }
+
+    def _record(self, backoff: "Backoff", failed: bool):
+        with self._lock:
+            self.calls += 1
+            self.retries += backoff.retries
+            self.failures += int(failed)
+            self.backoff_time += backoff.waited
+
+
+class Backoff:
+    '''
+        The retries of one call under a RetryPolicy
+    '''
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.start = None  # type: Optional[float]
+        self.retries = 0
+        self.waited = 0.
+        self._done = False
+
+        # The attempts since the failures started, and when the last retry was sent
+        self._attempts = 0
+        self._retried_at = 0.
+
+    def nextDelay(self) -> Optional[float]:
+        '''
+            Returns how long to wait before retrying, or None if the call should be given up
+        '''
+        policy = self.policy
+        now = policy._clock()
+
+        progressed = policy.deadline is not None and now - self._retried_at > policy.deadline
+        if self.start is None or progressed:
+            self.start = now
+            self._attempts = 1
+
+        if self._attempts >= policy.max_attempts:
+            return self._finish(True)
+
+        delay = policy.delay(self._attempts)
+
+        if policy.deadline is not None and now + delay - self.start > policy.deadline:
+            return self._finish(True)
+
+        self._attempts += 1
+        self._retried_at = now + delay
+        self.retries += 1
+        self.waited += delay
+
+        return delay
+
+    def succeeded(self):
+        self._finish(False)
+
+    def _finish(self, failed: bool):
+        if not self._done:
+            self._done = True
+            self.policy._record(self, failed)
+        return None
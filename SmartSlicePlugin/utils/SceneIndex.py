@@ -0,0 +1,381 @@
+'''
+    Event driven index of how the nodes in the scene are classified.
+
+    Finding the printable nodes and modifier meshes walks the whole scene and reads
+    settings from every node's stack. The classification only changes when nodes are
+    added, removed or re-parented, when their decorators change, or when one of the
+    mesh type settings changes on their stack, so the index keeps the result of the
+    last walk and only marks itself dirty on those signals.
+
+    The bounding boxes of the printable nodes and modifier meshes are kept in a
+    BoundingBoxIndex each, so intersecting nodes are found without comparing every
+    printable node against every modifier mesh. Boxes of nodes that moved are
+    updated on the next query.
+
+    Overlapping boxes are only a first guess. The meshes of those pairs are tested
+    for an exact intersection in an IntersectionJob, so moving a modifier mesh never
+    waits for it. Until a result is in, the overlapping boxes decide (unless only
+    exact results are asked for), and intersectionsChanged is emitted once new
+    results are in.
+'''
+
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import threading
+
+import numpy
+
+from UM.Job import Job
+from UM.Logger import Logger
+from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
+from UM.Scene.SceneNode import SceneNode
+from UM.Signal import Signal
+
+from .BoundingBoxIndex import BoundingBoxIndex
+from .MeshIntersection import meshesIntersect
+
+
+class SceneNodeIndex:
+    # Emitted when exact intersection results came in, which may change the result of intersectingNodes
+    # and separatedChildren
+    intersectionsChanged = Signal()
+
+    # Per object settings that decide whether (and how) a mesh is printed
+    MESH_TYPE_SETTINGS = ("support_mesh", "infill_mesh", "cutting_mesh", "anti_overhang_mesh")
+
+    def __init__(self, scene: "UM.Scene.Scene"):
+        self._scene = scene
+        self._root = None
+
+        # (node, is_sliceable, is_printing, is_support, is_infill_mesh) for every node in the scene
+        self._entries = []
+        self._printable_nodes = []
+        self._modifier_meshes = []
+
+        # Position of every node in the scene walk, so intersecting nodes are returned in scene order
+        self._positions = {}
+
+        self._printable_boxes = BoundingBoxIndex()
+        self._modifier_boxes = BoundingBoxIndex()
+        self._box_indices = {}  # type: Dict[SceneNode, BoundingBoxIndex]
+        self._moved_nodes = set()
+
+        # Exact intersection results of (printable node, modifier mesh) pairs, and the pairs being tested.
+        # The version of a node goes up whenever it moves, which makes results for older versions stale.
+        self._intersections = {}  # type: Dict[Tuple[SceneNode, SceneNode], bool]
+        self._testing = set()  # type: Set[Tuple[SceneNode, SceneNode, int, int]]
+        self._versions = {}  # type: Dict[SceneNode, int]
+
+        # Nodes and stacks we are listening to, so we can disconnect from them again
+        self._nodes = []
+        self._stacks = []
+
+        self._dirty = True
+        self._lock = threading.RLock()
+
+        self.traversals = 0
+        self.saved_traversals = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "traversals": self.traversals,
+            "saved_traversals": self.saved_traversals,
+            "nodes": len(self._entries)
+        }
+
+    def invalidate(self, *args):
+        self._dirty = True
+
+    def printableNodes(self) -> List[SceneNode]:
+        '''
+            Returns the sliceable nodes which are printed as normal meshes
+        '''
+        with self._lock:
+            self._update()
+            return list(self._printable_nodes)
+
+    def modifierMeshes(self) -> List[SceneNode]:
+        '''
+            Returns the infill meshes (modifier meshes)
+        '''
+        with self._lock:
+            self._update()
+            return list(self._modifier_meshes)
+
+    def nodes(self, func: Callable[[bool, bool, bool, bool], bool]) -> List[SceneNode]:
+        '''
+            Returns the nodes for which func(isSliceable, isPrinting, isSupport, isInfillMesh) is true
+        '''
+        with self._lock:
+            self._update()
+            return [entry[0] for entry in self._entries if func(*entry[1:])]
+
+    def intersectingNodes(self, node: SceneNode, exact: bool = False) -> List[SceneNode]:
+        '''
+            Returns the modifier meshes whose bounding box overlaps the node if it is a printable
+            node (leaving out the ones which already are its children), or the printable nodes
+            whose bounding box overlaps the node if it is a modifier mesh. Nodes whose meshes
+            were found not to intersect the node are left out, and if exact is set, so are the
+            nodes whose meshes have not been tested yet.
+        '''
+        with self._lock:
+            self._update()
+            self._updateMovedBoxes()
+
+            if node in self._printable_boxes:
+                children = node.getChildren()
+                pairs = [
+                    (node, n) for n in self._modifier_boxes.query(*self._printable_boxes.box(node)) if n not in children
+                ]
+                intersecting = [modifier for printable, modifier in self._exactIntersections(pairs, not exact)]
+            elif node in self._modifier_boxes:
+                pairs = [(n, node) for n in self._printable_boxes.query(*self._modifier_boxes.box(node))]
+                intersecting = [printable for printable, modifier in self._exactIntersections(pairs, not exact)]
+            else:
+                return []
+
+            return sorted(intersecting, key=self._positions.get)
+
+    def separatedChildren(self, node: SceneNode) -> List[SceneNode]:
+        '''
+            Returns the modifier meshes below the printable node whose meshes were found not to intersect it
+        '''
+        with self._lock:
+            self._update()
+            self._updateMovedBoxes()
+
+            if node not in self._printable_boxes:
+                return []
+
+            # The box of a node includes its children, so only the exact test can tell
+            pairs = [(node, child) for child in node.getChildren() if child in self._modifier_boxes]
+            intersecting = self._exactIntersections(pairs, True)
+
+            return [modifier for printable, modifier in pairs if (printable, modifier) not in intersecting]
+
+    def _exactIntersections(
+        self, pairs: List[Tuple[SceneNode, SceneNode]], untested_intersect: bool
+    ) -> List[Tuple[SceneNode, SceneNode]]:
+        # Returns the pairs which intersect, starting a test for pairs without a result
+        untested = [pair for pair in pairs if pair not in self._intersections]
+
+        if untested:
+            self._startIntersectionJob(untested)
+
+        return [pair for pair in pairs if self._intersections.get(pair, untested_intersect)]
+
+    def _startIntersectionJob(self, pairs: List[Tuple[SceneNode, SceneNode]]):
+        tests = []
+        for printable, modifier in pairs:
+            test = (printable, modifier, self._versions.get(printable, 0), self._versions.get(modifier, 0))
+            if test not in self._testing:
+                tests.append(test)
+
+        if not tests:
+            return
+
+        self._testing.update(tests)
+
+        job = IntersectionJob(tests)
+        job.finished.connect(self._onIntersectionJobFinished)
+        job.start()
+
+    def _onIntersectionJobFinished(self, job: "IntersectionJob"):
+        with self._lock:
+            self._testing.difference_update(job.tests)
+
+            new_results = False
+            for test in job.tests:
+                printable, modifier, printable_version, modifier_version = test
+
+                # Leave out the results of nodes which moved while they were tested
+                if printable_version != self._versions.get(printable, 0) or \
+                        modifier_version != self._versions.get(modifier, 0):
+                    continue
+
+                # If the test failed, the boxes decide
+                intersects = job.results.get(test, True)
+
+                self._intersections[(printable, modifier)] = intersects
+                new_results = True
+
+        if job.getError():
+            Logger.log("e", "Unable to test the meshes for intersections: {}".format(job.getError()))
+
+        if new_results:
+            self.intersectionsChanged.emit()
+
+    def _update(self):
+        root = self._scene.getRoot()
+
+        if root is not self._root:
+            if self._root is not None:
+                self._root.childrenChanged.disconnect(self.invalidate)
+                self._root.transformationChanged.disconnect(self._onNodeMoved)
+                self._root.meshDataChanged.disconnect(self._onNodeMoved)
+            self._root = root
+            self._root.childrenChanged.connect(self.invalidate)
+            self._root.transformationChanged.connect(self._onNodeMoved)
+            self._root.meshDataChanged.connect(self._onNodeMoved)
+            self._dirty = True
+
+        if not self._dirty:
+            self.saved_traversals += 1
+            return
+
+        # Clear the flag first, so a change while we walk the scene is picked up by the next call
+        self._dirty = False
+        self.traversals += 1
+
+        self._disconnectNodes()
+
+        entries = []
+        for node in DepthFirstIterator(root):
+            entries.append(self._classify(node))
+
+            node.decoratorsChanged.connect(self.invalidate)
+            self._nodes.append(node)
+
+            stack = node.callDecoration("getStack")
+            if stack:
+                stack.propertyChanged.connect(self._onStackPropertyChanged)
+                self._stacks.append(stack)
+
+        self._entries = entries
+        self._printable_nodes = [
+            node for node, is_sliceable, is_printing, is_support, is_infill_mesh in entries
+            if is_sliceable and is_printing and not is_support and not is_infill_mesh
+        ]
+        self._modifier_meshes = [
+            node for node, is_sliceable, is_printing, is_support, is_infill_mesh in entries
+            if is_sliceable and not is_support and is_infill_mesh
+        ]
+
+        self._positions = {entry[0]: position for position, entry in enumerate(entries)}
+
+        self._printable_boxes.clear()
+        self._modifier_boxes.clear()
+        self._box_indices = dict(
+            [(node, self._printable_boxes) for node in self._printable_nodes] +
+            [(node, self._modifier_boxes) for node in self._modifier_meshes]
+        )
+        self._moved_nodes = set(self._box_indices)
+
+        self._intersections = {
+            pair: intersects for pair, intersects in self._intersections.items()
+            if pair[0] in self._box_indices and pair[1] in self._box_indices
+        }
+        self._versions = {node: version for node, version in self._versions.items() if node in self._positions}
+
+        Logger.log("d", "Smart Slice scene index: {}".format(self.stats()))
+
+    def _disconnectNodes(self):
+        for node in self._nodes:
+            node.decoratorsChanged.disconnect(self.invalidate)
+        for stack in self._stacks:
+            stack.propertyChanged.disconnect(self._onStackPropertyChanged)
+
+        self._nodes = []
+        self._stacks = []
+
+    def _onNodeMoved(self, node: SceneNode):
+        # Transformation and mesh changes bubble up to the root, from the node that changed.
+        # Moving a node also moves the nodes below it, such as the modifier meshes of a model.
+        if node in self._positions:
+            with self._lock:
+                moved = [node] + node.getAllChildren()
+                self._moved_nodes.update(moved)
+
+                for moved_node in moved:
+                    self._versions[moved_node] = self._versions.get(moved_node, 0) + 1
+
+    def _updateMovedBoxes(self):
+        for node in self._moved_nodes:
+            boxes = self._box_indices.get(node)
+            if boxes is None:
+                continue
+
+            box = self._box(node)
+            if box is None:
+                boxes.remove(node)
+            else:
+                boxes.update(node, *box)
+
+        if self._moved_nodes:
+            self._intersections = {
+                pair: intersects for pair, intersects in self._intersections.items()
+                if pair[0] not in self._moved_nodes and pair[1] not in self._moved_nodes
+            }
+
+        self._moved_nodes = set()
+
+    @staticmethod
+    def _box(node: SceneNode) -> Optional[Tuple[numpy.ndarray, numpy.ndarray]]:
+        aabb = node.getBoundingBox()
+        if aabb is None or not aabb.isValid():
+            return None
+        return aabb.minimum.getData(), aabb.maximum.getData()
+
+    def _onStackPropertyChanged(self, key: str, property_name: str):
+        if property_name == "value" and key in self.MESH_TYPE_SETTINGS:
+            self._dirty = True
+
+    @staticmethod
+    def _classify(node: SceneNode) -> Tuple[SceneNode, bool, bool, bool, bool]:
+        is_sliceable = node.callDecoration("isSliceable")
+        is_printing = not node.callDecoration("isNonPrintingMesh")
+        is_support = False
+        is_infill_mesh = False
+
+        stack = node.callDecoration("getStack")
+
+        if stack:
+            is_support = stack.getProperty("support_mesh", "value")
+            is_infill_mesh = stack.getProperty("infill_mesh", "value")
+
+        return node, is_sliceable, is_printing, is_support, is_infill_mesh
+
+
+class IntersectionJob(Job):
+    """
+        Tests pairs of nodes for an exact intersection of their meshes (see MeshIntersection).
+        Each test is (printable node, modifier mesh, version of the printable, version of the modifier),
+        results maps each test to whether the meshes intersect.
+    """
+
+    def __init__(self, tests: List[Tuple[SceneNode, SceneNode, int, int]]):
+        super().__init__()
+        self.tests = tests
+        self.results = {}
+
+        # The nodes' mesh data and world transformation, taken from the calling thread
+        self._meshes = {}
+        for printable, modifier, _, _ in tests:
+            for node in (printable, modifier):
+                if node not in self._meshes:
+                    self._meshes[node] = (node.getMeshData(), node.getWorldTransformation().getData().copy())
+
+    def run(self):
+        corners = {}
+
+        for test in self.tests:
+            printable, modifier = test[0], test[1]
+
+            for node in (printable, modifier):
+                if node not in corners:
+                    corners[node] = self._worldCorners(*self._meshes[node])
+
+            self.results[test] = meshesIntersect(corners[printable], corners[modifier])
+
+    @staticmethod
+    def _worldCorners(mesh_data, transformation: numpy.ndarray) -> numpy.ndarray:
+        if mesh_data is None:
+            return numpy.zeros((0, 3, 3))
+
+        vertices = mesh_data.getVertices().astype(numpy.float64)
+        vertices = vertices.dot(transformation[:3, :3].T) + transformation[:3, 3]
+
+        indices = mesh_data.getIndices()
+        if indices is None:
+            return vertices.reshape(-1, 3, 3)
+        return vertices[indices]
@@ -0,0 +1,189 @@
+'''
+    Casting rays against the meshes of scene nodes on the CPU, for picking and hovering
+    faces the way the selection render pass does, including occlusion by other models.
+
+    A node is first tested against its world bounding box, and only if the ray enters
+    the box closer than the best hit so far against a TriangleBVH over its mesh data.
+    The BVH of a node is kept as long as the node's mesh data is not replaced.
+
+    Building the BVH of a large mesh takes about a second, so BVHs are built ahead of
+    time on a worker (see prepare). Rays cast while the mouse moves don't build any, and
+    skip the nodes whose BVH isn't there yet.
+'''
+
+from typing import Iterable, List, Optional, Tuple
+
+import threading
+import weakref
+
+import numpy
+
+from UM.Job import Job
+from UM.Math.Vector import Vector
+from UM.Scene.SceneNode import SceneNode
+
+from .TriangleBVH import TriangleBVH
+
+
+def localRay(node: SceneNode, origin: Vector, direction: Vector) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+        Returns the ray (in world coordinates) in the node's local coordinates. Distances
+        along the ray, in units of its direction, are the same in both.
+    '''
+    inverse = node.getWorldTransformation().getInverse().getData()
+    local_origin = inverse[:3, :3].dot(origin.getData()) + inverse[:3, 3]
+    local_direction = inverse[:3, :3].dot(direction.getData())
+    return local_origin, local_direction
+
+
+def rayBoxDistance(lower: numpy.ndarray, upper: numpy.ndarray, origin: numpy.ndarray, direction: numpy.ndarray) -> float:
+    '''
+        Returns the distance along the ray at which it enters the box (0 if it starts inside), or inf if it misses
+    '''
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t1 = (lower - origin) / direction
+        t2 = (upper - origin) / direction
+
+    # A ray parallel to a slab misses the box unless it starts between the planes
+    parallel = direction == 0.
+    inside = (origin >= lower) & (origin <= upper)
+    if numpy.any(parallel & ~inside):
+        return numpy.inf
+
+    near = numpy.where(parallel, -numpy.inf, numpy.minimum(t1, t2)).max()
+    far = numpy.where(parallel, numpy.inf, numpy.maximum(t1, t2)).min()
+
+    if near > far or far < 0.:
+        return numpy.inf
+
+    return max(float(near), 0.)
+
+
+class ScenePicker:
+    def __init__(self):
+        self._bvhs = weakref.WeakKeyDictionary()
+        self._pending = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+        self.bvh_builds = 0
+
+    def bvh(self, node: SceneNode, build: bool = True) -> Optional[TriangleBVH]:
+        '''
+            Returns the BVH over the node's mesh data (in local coordinates), or None if it has
+            none. If build is False, None is returned as well while the BVH isn't built yet.
+        '''
+        mesh_data = node.getMeshData()
+        if mesh_data is None:
+            return None
+
+        with self._lock:
+            cached = self._bvhs.get(node)
+            if cached is not None and cached[0] is mesh_data:
+                return cached[1]
+
+        if not build:
+            return None
+
+        vertices = mesh_data.getVertices()
+        indices = mesh_data.getIndices()
+        if indices is None:
+            indices = numpy.arange(len(vertices)).reshape(-1, 3)
+
+        bvh = TriangleBVH(vertices, indices)
+
+        with self._lock:
+            self._bvhs[node] = (mesh_data, bvh)
+            self.bvh_builds += 1
+
+        return bvh
+
+    def prepare(self, nodes: Iterable[SceneNode]) -> Optional["BuildBVHJob"]:
+        '''
+            Starts building the BVHs the nodes don't have yet on a worker, and returns the job
+            (None if there is nothing to build)
+        '''
+        with self._lock:
+            missing = []
+            for node in nodes:
+                mesh_data = node.getMeshData()
+                cached = self._bvhs.get(node)
+                if mesh_data is None or node in self._pending or (cached is not None and cached[0] is mesh_data):
+                    continue
+                self._pending.add(node)
+                missing.append(node)
+
+        if not missing:
+            return None
+
+        job = BuildBVHJob(self, missing)
+        job.start()
+        return job
+
+    def nearestHit(
+        self,
+        nodes: Iterable[SceneNode],
+        origin: Vector,
+        direction: Vector,
+        max_distance: float = numpy.inf,
+        build: bool = True
+    ) -> Tuple[Optional[SceneNode], Optional[int], float]:
+        '''
+            Returns the node, triangle id and distance of the nearest hit of the ray (in world
+            coordinates) closer than max_distance, or (None, None, inf) if there is none.
+            If build is False, nodes without a BVH are skipped and their BVHs are prepared.
+        '''
+        world_origin = numpy.asarray(origin.getData(), dtype=numpy.float64)
+        world_direction = numpy.asarray(direction.getData(), dtype=numpy.float64)
+
+        # Test the nodes in the order the ray enters their boxes, so far away nodes are skipped by their box
+        candidates = []
+        for node in nodes:
+            aabb = node.getBoundingBox()
+            if aabb is None or not aabb.isValid():
+                continue
+
+            entry = rayBoxDistance(aabb.minimum.getData(), aabb.maximum.getData(), world_origin, world_direction)
+            if entry < max_distance:
+                candidates.append((entry, id(node), node))
+
+        candidates.sort(key=lambda candidate: candidate[:2])
+
+        best = (None, None, numpy.inf)
+        unbuilt = []
+        for entry, _, node in candidates:
+            if entry >= min(best[2], max_distance):
+                break
+
+            bvh = self.bvh(node, build)
+            if bvh is None:
+                unbuilt.append(node)
+                continue
+
+            triangle_id, distance = bvh.pick(*localRay(node, origin, direction))
+            if triangle_id is not None and distance < min(best[2], max_distance):
+                best = (node, triangle_id, distance)
+
+        if unbuilt and not build:
+            self.prepare(unbuilt)
+
+        return best
+
+
+class BuildBVHJob(Job):
+    '''
+        Builds the BVHs of the nodes for a ScenePicker
+    '''
+
+    def __init__(self, picker: ScenePicker, nodes: List[SceneNode]):
+        super().__init__()
+        self._picker = picker
+        self._nodes = nodes
+
+    def run(self):
+        try:
+            for node in self._nodes:
+                self._picker.bvh(node)
+        finally:
+            with self._picker._lock:
+                for node in self._nodes:
+                    self._picker._pending.discard(node)
@@ -0,0 +1,128 @@
+'''
+    A package (such as a 3MF zip archive) which is written while it is being uploaded.
+
+    Iterating over a StreamingPackage runs its write function in a thread, on a stream
+    which cuts everything written to it into chunks. The chunks are handed over through
+    a bounded queue, so the writer waits while the upload falls behind and no more than
+    MAX_QUEUED_CHUNKS chunks are held in memory. An iterable without a length is sent
+    with chunked transfer encoding by the HTTP client, which lets compressing the later
+    entries of the archive overlap with sending the earlier ones.
+
+    Every iteration writes the package again, so a failed upload can be retried.
+'''
+
+from typing import BinaryIO, Callable, Iterator
+
+import io
+import queue
+import threading
+
+# Size in bytes of the chunks handed to the upload
+CHUNK_SIZE = 256 * 1024
+
+# Upper limit of the number of written chunks waiting for the upload
+MAX_QUEUED_CHUNKS = 16
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _ChunkStream(io.RawIOBase):
+    # Write only, unseekable stream, passing every full chunk to put
+    def __init__(self, put: Callable[[bytes], None], chunk_size: int):
+        super().__init__()
+        self._put = put
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        size = len(data)
+
+        self._buffer += data
+        self._position += size
+
+        while len(self._buffer) >= self._chunk_size:
+            self._put(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+
+        return size
+
+    def close(self):
+        if not self.closed and self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer = bytearray()
+        super().close()
+
+
+class StreamingPackage:
+    _END = object()
+
+    def __init__(
+        self,
+        write: Callable[[BinaryIO], None],
+        chunk_size: int = CHUNK_SIZE,
+        max_queued_chunks: int = MAX_QUEUED_CHUNKS
+    ):
+        self._write = write
+        self.chunk_size = chunk_size
+        self.max_queued_chunks = max_queued_chunks
+
+        # Size in bytes of the package, once it was written completely
+        self.size = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        chunks = queue.Queue(self.max_queued_chunks)
+        cancelled = threading.Event()
+
+        writer = threading.Thread(target=self._writePackage, args=(chunks, cancelled), daemon=True)
+        writer.start()
+
+        size = 0
+        try:
+            while True:
+                chunk = chunks.get()
+
+                if chunk is self._END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                size += len(chunk)
+                yield chunk
+
+            self.size = size
+        finally:
+            # Stops the writer if the upload ended early
+            cancelled.set()
+            writer.join()
+
+    def _writePackage(self, chunks: queue.Queue, cancelled: threading.Event):
+        def put(item):
+            while not cancelled.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            raise _Cancelled()
+
+        try:
+            stream = _ChunkStream(put, self.chunk_size)
+            self._write(stream)
+            stream.close()
+            put(self._END)
+        except _Cancelled:
+            pass
+        except Exception as exc:
+            try:
+                put(exc)
+            except _Cancelled:
+                pass
@@ -0,0 +1,150 @@
+'''
+    Writes 3MF packages straight from NumPy mesh buffers.
+
+    The model XML is formatted in blocks of vertices and triangles, with one string
+    formatting operation per block instead of one per vertex, and streamed into the
+    zip archive as it is formatted. Objects are placed in the build with their
+    transformation, and settings are stored as metadata of their object, the way
+    Cura stores per object settings ("cura:<key>").
+'''
+
+from typing import Dict, Iterable, Optional, Union
+
+import zipfile
+
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy
+
+MODEL_PATH = "3D/3dmodel.model"
+
+# Number of vertices or triangles formatted at once
+BLOCK_SIZE = 65536
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>'
+)
+
+_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Target="/' + MODEL_PATH + '" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>'
+)
+
+_MODEL_START = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<model unit="millimeter" xml:lang="en-US" '
+    'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02" '
+    'xmlns:cura="http://software.ultimaker.com/xml/cura/3mf/2015/10">\n'
+    '<resources>\n'
+)
+
+_VERTEX = '<vertex x="%.6f" y="%.6f" z="%.6f"/>\n'
+_TRIANGLE = '<triangle v1="%d" v2="%d" v3="%d"/>\n'
+
+
+class ThreeMFObject:
+    def __init__(
+        self,
+        name: str,
+        vertices: numpy.ndarray,
+        indices: Optional[numpy.ndarray] = None,
+        transformation: Optional[numpy.ndarray] = None,
+        settings: Optional[Dict[str, str]] = None
+    ):
+        '''
+            A mesh in the 3MF package. Without indices, every three vertices make a triangle.
+            The transformation is a 4x4 matrix, settings are stored as cura:<key> metadata.
+        '''
+        self.name = name
+        self.vertices = vertices
+        self.indices = indices
+        self.transformation = numpy.identity(4) if transformation is None else transformation
+        self.settings = settings or {}
+
+    def triangles(self) -> numpy.ndarray:
+        if self.indices is None:
+            return numpy.arange(len(self.vertices)).reshape(-1, 3)
+        return self.indices.reshape(-1, 3)
+
+
+def transformString(transformation: numpy.ndarray) -> str:
+    '''
+        Returns the 3MF transform attribute of a 4x4 matrix
+    '''
+    return " ".join(repr(float(v)) for v in numpy.asarray(transformation)[:3, :].T.ravel())
+
+
+def formatRows(template: str, rows: numpy.ndarray, block_size: int = BLOCK_SIZE) -> Iterable[str]:
+    '''
+        Yields blocks of the rows formatted with the template, one line per row
+    '''
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        yield (template * len(block)) % tuple(block.ravel().tolist())
+
+
+def writeModel(model_file, objects: Iterable[ThreeMFObject], block_size: int = BLOCK_SIZE):
+    '''
+        Writes the 3MF model XML of the objects to the binary file
+    '''
+    model_file.write(_MODEL_START.encode())
+
+    build = []
+    for object_id, threemf_object in enumerate(objects, 1):
+        model_file.write('<object id="{}" name={} type="model">\n'.format(
+            object_id, quoteattr(threemf_object.name)
+        ).encode())
+
+        if threemf_object.settings:
+            model_file.write(b"<metadatagroup>\n")
+            for key, value in sorted(threemf_object.settings.items()):
+                model_file.write('<metadata name={} preserve="true" type="xs:string">{}</metadata>\n'.format(
+                    quoteattr("cura:" + key), escape(str(value))
+                ).encode())
+            model_file.write(b"</metadatagroup>\n")
+
+        model_file.write(b"<mesh>\n<vertices>\n")
+        vertices = numpy.asarray(threemf_object.vertices, dtype=numpy.float64).reshape(-1, 3)
+        for block in formatRows(_VERTEX, vertices, block_size):
+            model_file.write(block.encode())
+
+        model_file.write(b"</vertices>\n<triangles>\n")
+        for block in formatRows(_TRIANGLE, threemf_object.triangles(), block_size):
+            model_file.write(block.encode())
+
+        model_file.write(b"</triangles>\n</mesh>\n</object>\n")
+
+        build.append('<item objectid="{}" transform="{}"/>\n'.format(
+            object_id, transformString(threemf_object.transformation)
+        ))
+
+    model_file.write("</resources>\n<build>\n{}</build>\n</model>\n".format("".join(build)).encode())
+
+
+def write3mf(
+    stream,
+    objects: Iterable[ThreeMFObject],
+    files: Optional[Dict[str, Union[str, bytes]]] = None,
+    block_size: int = BLOCK_SIZE
+):
+    '''
+        Writes a 3MF package of the objects to the binary stream (which does not have to be seekable),
+        with the additional files (path in the archive -> contents)
+    '''
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _RELATIONSHIPS)
+
+        # The size of the model isn't known up front, so allow for more than 2 GiB
+        with archive.open(MODEL_PATH, "w", force_zip64=True) as model_file:
+            writeModel(model_file, objects, block_size)
+
+        for path, contents in (files or {}).items():
+            archive.writestr(path, contents)
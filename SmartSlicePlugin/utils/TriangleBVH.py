@@ -0,0 +1,165 @@
+'''
+    Bounding volume hierarchy for picking triangles with a ray on the CPU.
+
+    The hierarchy is a linear BVH: triangles are sorted along a Morton curve, packed
+    into leaves of LEAF_SIZE triangles and the boxes are merged pairwise up to the
+    root. The tree is complete, so it is stored as flat arrays in heap order (the
+    children of node i are 2i + 1 and 2i + 2) and both building and traversal work
+    on whole tree levels at a time with NumPy.
+'''
+
+from typing import Optional, Tuple
+
+import numpy
+
+
+def _expandBits(values: numpy.ndarray) -> numpy.ndarray:
+    # Spreads the lower 10 bits of every value out to every third bit
+    values = values.astype(numpy.uint64) & numpy.uint64(0x3FF)
+    values = (values | (values << numpy.uint64(16))) & numpy.uint64(0x030000FF)
+    values = (values | (values << numpy.uint64(8))) & numpy.uint64(0x0300F00F)
+    values = (values | (values << numpy.uint64(4))) & numpy.uint64(0x030C30C3)
+    values = (values | (values << numpy.uint64(2))) & numpy.uint64(0x09249249)
+    return values
+
+
+def mortonCodes(points: numpy.ndarray) -> numpy.ndarray:
+    '''
+        Returns the 30 bit Morton code of every point, relative to the bounds of all points
+    '''
+    lower = points.min(axis=0)
+    extent = numpy.maximum(points.max(axis=0) - lower, 1.e-12)
+    cells = numpy.clip(((points - lower) / extent * 1023.0).astype(numpy.int64), 0, 1023)
+
+    return (_expandBits(cells[:, 0]) << numpy.uint64(2)) | \
+        (_expandBits(cells[:, 1]) << numpy.uint64(1)) | \
+        _expandBits(cells[:, 2])
+
+
+class TriangleBVH:
+    LEAF_SIZE = 8
+
+    # Rays hitting closer than this (in mesh units) are ignored
+    EPSILON = 1.e-9
+
+    def __init__(self, vertices: numpy.ndarray, triangles: numpy.ndarray):
+        corners = vertices[triangles].astype(numpy.float64)
+        triangle_count = len(triangles)
+
+        leaf_count = 1
+        while leaf_count * self.LEAF_SIZE < triangle_count:
+            leaf_count *= 2
+
+        self.depth = int(numpy.log2(leaf_count))
+        self.leaf_count = leaf_count
+
+        # Sort the triangles along the Morton curve and pad them out to full leaves. Padding slots hold -1.
+        if triangle_count > 0:
+            order = numpy.argsort(mortonCodes(corners.mean(axis=1)), kind='stable')
+        else:
+            order = numpy.zeros(0, dtype=numpy.int64)
+        self.leaf_triangles = numpy.full(leaf_count * self.LEAF_SIZE, -1, dtype=numpy.int64)
+        self.leaf_triangles[:triangle_count] = order
+        self.leaf_triangles = self.leaf_triangles.reshape(leaf_count, self.LEAF_SIZE)
+
+        # Triangle corners in leaf order, so a leaf test is a single slice
+        self.v0 = numpy.zeros((leaf_count * self.LEAF_SIZE, 3), dtype=numpy.float32)
+        self.edge1 = numpy.zeros((leaf_count * self.LEAF_SIZE, 3), dtype=numpy.float32)
+        self.edge2 = numpy.zeros((leaf_count * self.LEAF_SIZE, 3), dtype=numpy.float32)
+        sorted_corners = corners[order]
+        self.v0[:triangle_count] = sorted_corners[:, 0]
+        self.edge1[:triangle_count] = sorted_corners[:, 1] - sorted_corners[:, 0]
+        self.edge2[:triangle_count] = sorted_corners[:, 2] - sorted_corners[:, 0]
+
+        # Leaf boxes; empty padding leaves get an inverted box no ray can hit
+        leaf_lower = numpy.full((leaf_count * self.LEAF_SIZE, 3), numpy.inf)
+        leaf_upper = numpy.full((leaf_count * self.LEAF_SIZE, 3), -numpy.inf)
+        leaf_lower[:triangle_count] = sorted_corners.min(axis=1)
+        leaf_upper[:triangle_count] = sorted_corners.max(axis=1)
+        leaf_lower = leaf_lower.reshape(leaf_count, self.LEAF_SIZE, 3).min(axis=1)
+        leaf_upper = leaf_upper.reshape(leaf_count, self.LEAF_SIZE, 3).max(axis=1)
+
+        # Merge the boxes level by level up to the root
+        node_count = 2 * leaf_count - 1
+        self.lower = numpy.empty((node_count, 3))
+        self.upper = numpy.empty((node_count, 3))
+        self.lower[leaf_count - 1:] = leaf_lower
+        self.upper[leaf_count - 1:] = leaf_upper
+
+        first = leaf_count - 1
+        while first > 0:
+            parent_first = (first - 1) // 2
+            children_lower = self.lower[first:2 * first + 1].reshape(-1, 2, 3)
+            children_upper = self.upper[first:2 * first + 1].reshape(-1, 2, 3)
+            self.lower[parent_first:first] = children_lower.min(axis=1)
+            self.upper[parent_first:first] = children_upper.max(axis=1)
+            first = parent_first
+
+    def pick(self, origin: numpy.ndarray, direction: numpy.ndarray) -> Tuple[Optional[int], float]:
+        '''
+            Returns the id of the first triangle the ray hits and the distance along
+            the ray (in units of direction), or (None, inf) if it misses the mesh.
+        '''
+        origin = numpy.asarray(origin, dtype=numpy.float64)
+        direction = numpy.asarray(direction, dtype=numpy.float64)
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            inverse_direction = 1.0 / direction
+
+        # Walk down the tree one level at a time, keeping every node the ray passes through
+        nodes = numpy.zeros(1, dtype=numpy.int64)
+        for _ in range(self.depth + 1):
+            nodes = nodes[self._hitsBoxes(nodes, origin, inverse_direction)]
+            if len(nodes) == 0:
+                return None, numpy.inf
+            if nodes[0] >= self.leaf_count - 1:
+                break
+            nodes = numpy.stack((2 * nodes + 1, 2 * nodes + 2), axis=1).reshape(-1)
+
+        leaves = nodes - (self.leaf_count - 1)
+        slots = (leaves[:, None] * self.LEAF_SIZE + numpy.arange(self.LEAF_SIZE)).reshape(-1)
+        slots = slots[self.leaf_triangles.reshape(-1)[slots] >= 0]
+
+        distances = self._intersect(slots, origin, direction)
+        if len(distances) == 0 or not numpy.isfinite(distances.min()):
+            return None, numpy.inf
+
+        closest = int(numpy.argmin(distances))
+        return int(self.leaf_triangles.reshape(-1)[slots[closest]]), float(distances[closest])
+
+    def _hitsBoxes(self, nodes: numpy.ndarray, origin: numpy.ndarray, inverse_direction: numpy.ndarray) -> numpy.ndarray:
+        # Slab test against the boxes of the given nodes
+        with numpy.errstate(invalid='ignore'):
+            t1 = (self.lower[nodes] - origin) * inverse_direction
+            t2 = (self.upper[nodes] - origin) * inverse_direction
+
+        # A ray parallel to (and on the edge of) a slab gives nan, which must not reject the box
+        parallel = numpy.isnan(t1) | numpy.isnan(t2)
+        near = numpy.where(parallel, -numpy.inf, numpy.minimum(t1, t2)).max(axis=1)
+        far = numpy.where(parallel, numpy.inf, numpy.maximum(t1, t2)).min(axis=1)
+
+        # Empty (padding) nodes have inverted boxes
+        non_empty = self.lower[nodes, 0] <= self.upper[nodes, 0]
+
+        return non_empty & (near <= far) & (far >= 0.0)
+
+    def _intersect(self, slots: numpy.ndarray, origin: numpy.ndarray, direction: numpy.ndarray) -> numpy.ndarray:
+        # Moller-Trumbore against all triangles in the given slots, inf where the ray misses
+        edge1 = self.edge1[slots].astype(numpy.float64)
+        edge2 = self.edge2[slots].astype(numpy.float64)
+
+        p = numpy.cross(direction, edge2)
+        determinant = numpy.einsum('ij,ij->i', edge1, p)
+        valid = numpy.abs(determinant) > 1.e-12
+        inverse_determinant = numpy.where(valid, 1.0 / numpy.where(valid, determinant, 1.0), 0.0)
+
+        s = origin - self.v0[slots].astype(numpy.float64)
+        u = numpy.einsum('ij,ij->i', s, p) * inverse_determinant
+
+        q = numpy.cross(s, edge1)
+        v = numpy.dot(q, direction) * inverse_determinant
+        t = numpy.einsum('ij,ij->i', edge2, q) * inverse_determinant
+
+        hit = valid & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > self.EPSILON)
+
+        return numpy.where(hit, t, numpy.inf)
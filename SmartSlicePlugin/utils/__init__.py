@@ -1,9 +1,12 @@
-from typing import Optional, List
+from typing import Callable, Optional, List
+import os
 import numpy
 
+from PyQt5.QtCore import QStandardPaths
+
+from UM.Logger import Logger
 from UM.Math.Vector import Vector
 from UM.Mesh.MeshData import MeshData
-from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Scene.SceneNode import SceneNode
 
 from cura.CuraApplication import CuraApplication
@@ -11,77 +14,113 @@ from cura.Settings.ExtruderStack import ExtruderStack
 from cura.Scene.CuraSceneNode import CuraSceneNode
 from UM.Scene.SceneNode import SceneNode
 
+from . import MeshUtils
+from .CompactMesh import CompactMesh
+from .MeshCache import MeshCache
+from .MaterialDatabase import MaterialDatabase
+from .JobFingerprint import JobFingerprint
+from .SceneIndex import SceneNodeIndex
+from .ScenePicker import ScenePicker
 
-def makeInteractiveMesh(mesh_data: MeshData) -> 'pywim.geom.tri.Mesh':
-    import pywim
+_mesh_cache = None
+_scene_index = None
+_material_database = None
+_job_fingerprint = None
+_scene_picker = None
 
-    int_mesh = pywim.geom.tri.Mesh()
 
-    verts = mesh_data.getVertices()
+def getMeshCache() -> MeshCache:
+    global _mesh_cache
 
-    for i in range(mesh_data.getVertexCount()):
-        int_mesh.add_vertex(i, verts[i][0], verts[i][1], verts[i][2])
+    if _mesh_cache is None:
+        cache_path = os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.GenericConfigLocation), "smartslice", "mesh_cache"
+        )
+        _mesh_cache = MeshCache(cache_path)
 
-    faces = mesh_data.getIndices()
+    return _mesh_cache
 
-    if faces is not None:
-        for i in range(mesh_data.getFaceCount()):
-            v1 = int_mesh.vertices[faces[i][0]]
-            v2 = int_mesh.vertices[faces[i][1]]
-            v3 = int_mesh.vertices[faces[i][2]]
 
-            int_mesh.add_triangle(i, v1, v2, v3)
-    else:
-        for i in range(0, len(int_mesh.vertices), 3):
-            v1 = int_mesh.vertices[i]
-            v2 = int_mesh.vertices[i + 1]
-            v3 = int_mesh.vertices[i + 2]
+def getMaterialDatabase() -> MaterialDatabase:
+    global _material_database
 
-            int_mesh.add_triangle(i // 3, v1, v2, v3)
+    if _material_database is None:
+        _material_database = MaterialDatabase(
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "POC_material_database.json")
+        )
 
-    # Cura keeps around degenerate triangles, so we need to as well
-    # so we don't end up with a mismatch in triangle ids
-    int_mesh.analyze_mesh(remove_degenerate_triangles=False)
+    return _material_database
 
-    return int_mesh
 
+def getJobFingerprint() -> JobFingerprint:
+    global _job_fingerprint
 
-def getNodes(func):
-    scene = CuraApplication.getInstance().getController().getScene()
-    root = scene.getRoot()
+    if _job_fingerprint is None:
+        _job_fingerprint = JobFingerprint()
+
+    return _job_fingerprint
+
+
+def getScenePicker() -> ScenePicker:
+    global _scene_picker
+
+    if _scene_picker is None:
+        _scene_picker = ScenePicker()
+
+    return _scene_picker
+
+
+def makeInteractiveMesh(
+    mesh_data: MeshData,
+    analyze: Callable[..., dict] = MeshUtils.analyzeMesh,
+    proxy_triangles: int = 0
+) -> CompactMesh:
+    '''
+        Returns the interactive mesh used for face selection. The arrays are
+        analyzed by the given function when they are not in the mesh cache yet.
 
-    nodes = []
+        If proxy_triangles is set, meshes with more triangles are decimated to
+        about that many triangles for selection (see MeshUtils.decimateMesh).
+    '''
+    vertices = mesh_data.getVertices()
+    indices = mesh_data.getIndices()
+
+    cache = getMeshCache()
+    key = cache.key(vertices, indices, "proxy{}".format(proxy_triangles) if proxy_triangles > 0 else "")
+
+    analyzed = cache.load(key)
 
-    for node in DepthFirstIterator(root):
-        isSliceable = node.callDecoration("isSliceable")
-        isPrinting = not node.callDecoration("isNonPrintingMesh")
-        isSupport = False
-        isInfillMesh = False
+    if analyzed is None:
+        analyzed = analyze(vertices, indices, proxy_triangles=proxy_triangles)
+        try:
+            cache.store(key, analyzed)
+        except OSError as exc:
+            Logger.log("w", "Unable to store the analyzed mesh in the cache: {}".format(exc))
 
-        stack = node.callDecoration("getStack")
+    Logger.log("d", "Smart Slice mesh cache: {}".format(cache.stats()))
 
-        if stack:
-            isSupport = stack.getProperty("support_mesh", "value")
-            isInfillMesh = stack.getProperty("infill_mesh", "value")
+    return CompactMesh.fromAnalyzedMesh(analyzed)
 
-        if func(isSliceable, isPrinting, isSupport, isInfillMesh):
-            nodes.append(node)
 
-    return nodes
+def getSceneIndex() -> SceneNodeIndex:
+    global _scene_index
+
+    if _scene_index is None:
+        _scene_index = SceneNodeIndex(CuraApplication.getInstance().getController().getScene())
+
+    return _scene_index
+
+
+def getNodes(func):
+    return getSceneIndex().nodes(func)
 
 
 def getPrintableNodes():
-    return getNodes(
-        lambda isSliceable, isPrinting, isSupport, isInfillMesh: \
-            isSliceable and isPrinting and not isSupport and not isInfillMesh
-    )
+    return getSceneIndex().printableNodes()
 
 
 def getModifierMeshes():
-    return getNodes(
-        lambda isSliceable, isPrinting, isSupport, isInfillMesh: \
-            isSliceable and not isSupport and isInfillMesh
-    )
+    return getSceneIndex().modifierMeshes()
 
 
 def findChildSceneNode(node: SceneNode, node_type: type) -> Optional[SceneNode]:
@@ -126,18 +165,4 @@ def intersectingNodes(node: CuraSceneNode) -> List[CuraSceneNode]:
         Returns a list of CuraSceneNodes which intersect the node in question, depending on if the
         node is a printable node, or a modifier mesh
     '''
-    intersecting_nodes = []
-
-    if node in getPrintableNodes():
-        for n in getModifierMeshes():
-            collision = node.collidesWithBbox(n.getBoundingBox()) or n.collidesWithBbox(node.getBoundingBox())
-            if collision and n not in node.getChildren():
-                intersecting_nodes.append(n)
-
-    elif node in getModifierMeshes():
-        for n in getPrintableNodes():
-            collision = node.collidesWithBbox(n.getBoundingBox()) or n.collidesWithBbox(node.getBoundingBox())
-            if collision:
-                intersecting_nodes.append(n)
-
-    return intersecting_nodes
+    return getSceneIndex().intersectingNodes(node)